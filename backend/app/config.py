@@ -2,7 +2,7 @@
 Application configuration
 """
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import List, Optional
 
 
 class Settings(BaseSettings):
@@ -21,6 +21,47 @@ class Settings(BaseSettings):
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
 
+    # Sales tax. Rules are compiled into lookup tables at startup.
+    # tax_rate is the base rate; tax_jurisdiction_rates overrides it per
+    # jurisdiction ("US-CA:0.0725,US-OR:0"). tax_category_rates sets
+    # category rates for every jurisdiction ("Holiday:0.05") or for one
+    # ("US-CA/Holiday:0.06"); tax_exempt_categories lists categories taxed
+    # at 0, in the same form.
+    tax_rate: float = 0.085
+    tax_jurisdiction: str = "default"
+    tax_jurisdiction_rates: str = ""
+    tax_category_rates: str = ""
+    tax_exempt_categories: str = ""
+
+    # Product cache
+    product_cache_size: int = 10000
+    product_cache_ttl_seconds: float = 60.0
+
+    # Stock decrements: "atomic" (conditional UPDATE) or "locking" (SELECT ... FOR UPDATE)
+    inventory_mode: str = "atomic"
+
+    # Server-side cart sessions (per worker)
+    cart_session_max_entries: int = 5000
+    cart_session_ttl_seconds: float = 1800.0
+
+    # Seconds a cart's stock reservations survive without activity (per
+    # worker). Defaults to the cart session TTL and is never shorter, so a
+    # live cart never loses its holds.
+    reservation_ttl_seconds: Optional[float] = None
+
+    # Order numbers reserved per database round trip (per worker)
+    order_number_block_size: int = 20
+
+    # Idempotency-Key response store (per worker)
+    idempotency_max_entries: int = 10000
+    idempotency_ttl_seconds: float = 86400.0
+
+    # Group commit: queue checkout/return writes to one writer thread
+    group_commit_enabled: bool = False
+    group_commit_max_batch: int = 32
+    group_commit_max_wait_ms: float = 2.0
+    group_commit_timeout_seconds: float = 30.0
+
     # CORS
     cors_origins: str = "http://localhost:3000,http://localhost:5173"
 
@@ -28,6 +69,11 @@ class Settings(BaseSettings):
     host: str = "0.0.0.0"
     port: int = 8000
 
+    @property
+    def reservation_ttl(self) -> float:
+        """Effective reservation TTL (at least the cart session TTL)"""
+        return max(self.reservation_ttl_seconds or 0.0, self.cart_session_ttl_seconds)
+
     @property
     def cors_origins_list(self) -> List[str]:
         """Parse CORS origins string into list"""
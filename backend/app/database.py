@@ -38,12 +38,38 @@ def get_db() -> Generator[Session, None, None]:
         db.close()
 
 
+def begin_transaction(db: Session) -> None:
+    """
+    Make sure the session's database transaction has begun
+
+    pysqlite only emits BEGIN before DML, so a SAVEPOINT as the first
+    statement would open (and RELEASE would commit) its own transaction,
+    out of reach of the session's rollback. Call this before a unit of work
+    that starts with begin_nested(). A no-op on other databases and inside
+    a transaction that has already begun.
+
+    Args:
+        db: Database session
+    """
+    connection = db.connection()
+    if connection.dialect.name != "sqlite":
+        return
+    if not connection.connection.dbapi_connection.in_transaction:
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+
 def init_db() -> None:
     """
     Initialize database tables
     """
     from app.models import (
-        User, Product, InventoryMovement, Order, OrderItem,
-        Supplier, PurchaseOrder, PurchaseOrderItem, AuditLog
+        User, Product, CatalogState, InventoryMovement, InventoryCheckpoint,
+        Order, OrderItem, ReturnLine,
+        OrderNumberSequence, Supplier, PurchaseOrder, PurchaseOrderItem, AuditLog
     )
+    from app.migrations import upgrade_schema
+    from app.services.fts import ensure_fts
+    import app.services.catalog  # noqa: F401  (seeds the catalog version row)
     Base.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
+    ensure_fts(engine)
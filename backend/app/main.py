@@ -8,9 +8,13 @@ from datetime import datetime
 import logging
 
 from app.config import settings
-from app.database import init_db
+from app.pagination import NEXT_CURSOR_HEADER
+from app.database import init_db, SessionLocal
 from app.schemas import HealthCheck
-from app.routes import auth, products, orders, cart, config, users, returns
+from app.routes import auth, products, orders, cart, config, users, returns, inventory
+from app.services.search_index import build_product_index
+from app.services.group_commit import start_group_writer, stop_group_writer
+from app.services.idempotency import IDEMPOTENT_REPLAY_HEADER
 
 # Configure logging
 logging.basicConfig(
@@ -35,6 +39,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, IDEMPOTENT_REPLAY_HEADER],
 )
 
 
@@ -72,6 +77,22 @@ async def startup_event():
         logger.error(f"Failed to initialize database: {e}")
         raise
 
+    # Build in-memory product search index
+    db = SessionLocal()
+    try:
+        indexed = build_product_index(db)
+        logger.info(f"Product search index built ({indexed} products)")
+    except Exception as e:
+        # Search falls back to SQL until the index is built
+        logger.error(f"Failed to build product search index: {e}")
+    finally:
+        db.close()
+
+    # Single-writer group commit for checkout and return writes
+    if settings.group_commit_enabled:
+        start_group_writer(settings.database_url)
+        logger.info("Group commit writer started")
+
 
 # Health check endpoint
 @app.get("/health", response_model=HealthCheck, tags=["health"])
@@ -114,6 +135,7 @@ app.include_router(orders.router)
 app.include_router(cart.router)
 app.include_router(config.router)
 app.include_router(returns.router)
+app.include_router(inventory.router)
 
 
 # Shutdown event
@@ -123,3 +145,4 @@ async def shutdown_event():
     Cleanup on application shutdown
     """
     logger.info(f"Shutting down {settings.app_name}")
+    stop_group_writer()
@@ -0,0 +1,218 @@
+"""
+Lightweight schema upgrades for existing databases
+
+create_all only creates missing tables. These helpers bring tables that
+already exist up to date with the models: missing columns are added,
+legacy float money columns converted to integer cents, the return ledger
+backfilled from the audit log, return restocks relabelled, retired indexes
+dropped and missing indexes created. Every step is a no-op once applied.
+"""
+import json
+import logging
+
+from sqlalchemy import func, insert, inspect, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateColumn
+
+from app.database import Base
+from app.models import (
+    AuditLog, InventoryMovement, InventoryMovementType, OrderItem, ReturnLine
+)
+from app.money import CENTS_SUFFIX, to_cents
+
+logger = logging.getLogger(__name__)
+
+# Indexes the models no longer declare, per table
+RETIRED_INDEXES = {
+    # Superseded by ix_inventory_movements_product_id_id: ledger tails are
+    # bounded by movement id, and SQLite would otherwise pick this one for
+    # as-of queries
+    "inventory_movements": ["ix_inventory_movements_product_created"],
+}
+
+
+def add_missing_columns(engine: Engine) -> None:
+    """
+    Add model columns missing from existing tables
+
+    New non-nullable columns must declare a server_default so existing
+    rows can be filled in.
+
+    Args:
+        engine: Database engine
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing_columns = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                column_ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                logger.info(f"Adding column {table.name}.{column.name}")
+                connection.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {column_ddl}")
+
+
+def convert_money_columns(engine: Engine) -> None:
+    """
+    Move legacy float money columns into their integer cents columns
+
+    For every `<name>_cents` model column whose table still has a `<name>`
+    column, the amounts are copied over rounded to the cent and the old
+    column is dropped. Run after add_missing_columns.
+
+    Args:
+        engine: Database engine
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing_columns = {c["name"] for c in inspector.get_columns(table.name)}
+        legacy = [
+            column.name[:-len(CENTS_SUFFIX)] for column in table.columns
+            if column.name.endswith(CENTS_SUFFIX)
+            and column.name[:-len(CENTS_SUFFIX)] in existing_columns
+        ]
+        if not legacy:
+            continue
+
+        with engine.begin() as connection:
+            assignments = ", ".join(
+                f"{name}{CENTS_SUFFIX} = CAST(ROUND({name} * 100) AS INTEGER)" for name in legacy
+            )
+            logger.info(f"Converting {table.name} money columns to cents: {', '.join(legacy)}")
+            connection.exec_driver_sql(f"UPDATE {table.name} SET {assignments}")
+            for name in legacy:
+                connection.exec_driver_sql(f"ALTER TABLE {table.name} DROP COLUMN {name}")
+
+
+def backfill_return_lines(engine: Engine) -> None:
+    """
+    Build the return ledger from returns recorded only in the audit log
+
+    Runs while return_lines is empty: every "return_processed" audit entry
+    becomes one ReturnLine per returned item, then each order item's
+    returned_qty is set to the sum of its lines.
+
+    Args:
+        engine: Database engine
+    """
+    with engine.begin() as connection:
+        if connection.execute(select(ReturnLine.id).limit(1)).first() is not None:
+            return
+
+        entries = connection.execute(
+            select(AuditLog.actor_id, AuditLog.entity_id, AuditLog.metadata_json, AuditLog.created_at)
+            .where(AuditLog.action == "return_processed", AuditLog.entity_type == "order")
+            .order_by(AuditLog.id)
+        ).all()
+        lines = []
+        for actor_id, order_id, metadata_json, created_at in entries:
+            metadata = json.loads(metadata_json) if metadata_json else {}
+            for item in metadata.get("items", []):
+                lines.append({
+                    "order_id": order_id,
+                    "order_item_id": item["order_item_id"],
+                    "product_id": item["product_id"],
+                    "qty": item["qty"],
+                    "damaged": bool(item.get("damaged")),
+                    "refund_cents": to_cents(item.get("refund_amount") or 0),
+                    "reason": metadata.get("reason"),
+                    "created_by_id": actor_id,
+                    "created_at": created_at
+                })
+        if not lines:
+            return
+
+        logger.info(f"Backfilling {len(lines)} return lines from the audit log")
+        connection.execute(insert(ReturnLine), lines)
+        returned = (
+            select(func.coalesce(func.sum(ReturnLine.qty), 0))
+            .where(ReturnLine.order_item_id == OrderItem.id)
+            .scalar_subquery()
+        )
+        connection.execute(
+            update(OrderItem)
+            .where(OrderItem.id.in_({line["order_item_id"] for line in lines}))
+            .values(returned_qty=returned)
+        )
+
+
+def relabel_return_movements(engine: Engine) -> None:
+    """
+    Label restocks from returns as RETURN movements
+
+    Returns used to record their restock as a PURCHASE movement; the
+    reason text written with it identifies those rows.
+
+    Args:
+        engine: Database engine
+    """
+    if not inspect(engine).has_table(InventoryMovement.__tablename__):
+        return
+    with engine.begin() as connection:
+        result = connection.execute(
+            update(InventoryMovement)
+            .where(
+                InventoryMovement.type == InventoryMovementType.PURCHASE,
+                InventoryMovement.reason.like("Return - Order %")
+            )
+            .values(type=InventoryMovementType.RETURN)
+        )
+        if result.rowcount:
+            logger.info(f"Relabelled {result.rowcount} return restock movements")
+
+
+def drop_retired_indexes(engine: Engine) -> None:
+    """
+    Drop indexes listed in RETIRED_INDEXES from existing tables
+
+    Args:
+        engine: Database engine
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+
+    with engine.begin() as connection:
+        for table_name, index_names in RETIRED_INDEXES.items():
+            if table_name not in existing_tables:
+                continue
+            existing = {index["name"] for index in inspector.get_indexes(table_name)}
+            for name in index_names:
+                if name in existing:
+                    logger.info(f"Dropping retired index {name}")
+                    connection.exec_driver_sql(f"DROP INDEX {name}")
+
+
+def create_missing_indexes(engine: Engine) -> None:
+    """
+    Create model indexes missing from existing tables
+
+    Args:
+        engine: Database engine
+    """
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+def upgrade_schema(engine: Engine) -> None:
+    """
+    Bring an existing database up to date with the models
+
+    Args:
+        engine: Database engine
+    """
+    add_missing_columns(engine)
+    convert_money_columns(engine)
+    backfill_return_lines(engine)
+    relabel_return_movements(engine)
+    drop_retired_indexes(engine)
+    create_missing_indexes(engine)
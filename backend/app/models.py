@@ -2,13 +2,14 @@
 SQLAlchemy ORM Models
 """
 from sqlalchemy import (
-    Column, Integer, String, Float, Boolean, DateTime, Text, ForeignKey, Enum
+    Column, Integer, String, Boolean, DateTime, Text, ForeignKey, Enum, Index
 )
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
 
 from app.database import Base
+from app.money import money_property
 
 
 class UserRole(str, enum.Enum):
@@ -68,8 +69,10 @@ class Product(Base):
     name = Column(String(255), nullable=False)
     description = Column(Text, nullable=True)
     category = Column(String(100), nullable=True)
-    price = Column(Float, nullable=False)
-    cost = Column(Float, nullable=False, default=0.0)
+    price_cents = Column(Integer, nullable=False, server_default="0")
+    cost_cents = Column(Integer, nullable=False, default=0, server_default="0")
+    price = money_property("price_cents")
+    cost = money_property("cost_cents")
     taxable = Column(Boolean, default=True, nullable=False)
     reorder_threshold = Column(Integer, default=10, nullable=False)
     reorder_qty = Column(Integer, default=50, nullable=False)
@@ -77,6 +80,8 @@ class Product(Base):
     status = Column(Enum(ProductStatus), default=ProductStatus.ACTIVE, nullable=False)
     on_hand = Column(Integer, default=0, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # Catalog version of the last change to this product's catalog fields
+    catalog_version = Column(Integer, default=0, server_default="0", nullable=False, index=True)
 
     # Relationships
     inventory_movements = relationship("InventoryMovement", back_populates="product")
@@ -84,6 +89,14 @@ class Product(Base):
     purchase_order_items = relationship("PurchaseOrderItem", back_populates="product")
 
 
+class CatalogState(Base):
+    """Catalog version counter (single row)"""
+    __tablename__ = "catalog_state"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
 class InventoryMovement(Base):
     """Inventory movement model"""
     __tablename__ = "inventory_movements"
@@ -96,11 +109,33 @@ class InventoryMovement(Base):
     created_by_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
+    __table_args__ = (
+        # Per-product ledger tails after a checkpoint's movement id (as-of
+        # stock and reconciliation)
+        Index("ix_inventory_movements_product_id_id", "product_id", "id"),
+    )
+
     # Relationships
     product = relationship("Product", back_populates="inventory_movements")
     created_by = relationship("User", back_populates="inventory_movements")
 
 
+class InventoryCheckpoint(Base):
+    """Snapshot of a product's on_hand covering movements up to movement_id"""
+    __tablename__ = "inventory_checkpoints"
+
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    on_hand = Column(Integer, nullable=False)
+    # Highest inventory_movements.id included in on_hand
+    movement_id = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index("ix_inventory_checkpoints_product_created", "product_id", "created_at"),
+    )
+
+
 class Order(Base):
     """Order model"""
     __tablename__ = "orders"
@@ -110,17 +145,35 @@ class Order(Base):
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     cashier_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     customer_id = Column(Integer, nullable=True)  # Optional customer reference
-    subtotal = Column(Float, nullable=False, default=0.0)
-    discount_total = Column(Float, nullable=False, default=0.0)
-    tax_total = Column(Float, nullable=False, default=0.0)
-    total = Column(Float, nullable=False, default=0.0)
+    subtotal_cents = Column(Integer, nullable=False, default=0, server_default="0")
+    discount_total_cents = Column(Integer, nullable=False, default=0, server_default="0")
+    tax_total_cents = Column(Integer, nullable=False, default=0, server_default="0")
+    total_cents = Column(Integer, nullable=False, default=0, server_default="0")
     payment_json = Column(Text, nullable=True)  # JSON string for payment details
+    receipt_json = Column(Text, nullable=True)  # Receipt rendered at checkout
+    subtotal = money_property("subtotal_cents")
+    discount_total = money_property("discount_total_cents")
+    tax_total = money_property("tax_total_cents")
+    total = money_property("total_cents")
+
+    __table_args__ = (
+        # Keyset pagination over (created_at, id)
+        Index("ix_orders_created_at_id", "created_at", "id"),
+    )
 
     # Relationships
     cashier = relationship("User", foreign_keys=[cashier_id], back_populates="orders_created")
     items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
 
 
+class OrderNumberSequence(Base):
+    """Per-day order number sequence"""
+    __tablename__ = "order_number_sequences"
+
+    day = Column(String(8), primary_key=True)  # YYYYMMDD
+    last_value = Column(Integer, nullable=False, default=0)
+
+
 class OrderItem(Base):
     """Order item model"""
     __tablename__ = "order_items"
@@ -129,13 +182,39 @@ class OrderItem(Base):
     order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
     qty = Column(Integer, nullable=False)
-    unit_price = Column(Float, nullable=False)
-    discount = Column(Float, nullable=False, default=0.0)
-    line_total = Column(Float, nullable=False)
+    unit_price_cents = Column(Integer, nullable=False, server_default="0")
+    discount_cents = Column(Integer, nullable=False, default=0, server_default="0")
+    line_total_cents = Column(Integer, nullable=False, server_default="0")
+    unit_price = money_property("unit_price_cents")
+    discount = money_property("discount_cents")
+    line_total = money_property("line_total_cents")
+    # Units returned so far (sum of return_lines.qty), kept by the return path
+    returned_qty = Column(Integer, nullable=False, default=0, server_default="0")
 
     # Relationships
     order = relationship("Order", back_populates="items")
     product = relationship("Product", back_populates="order_items")
+    return_lines = relationship("ReturnLine", back_populates="order_item")
+
+
+class ReturnLine(Base):
+    """Returned units of one order item (one row per return)"""
+    __tablename__ = "return_lines"
+
+    id = Column(Integer, primary_key=True, index=True)
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False, index=True)
+    order_item_id = Column(Integer, ForeignKey("order_items.id"), nullable=False, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    qty = Column(Integer, nullable=False)
+    damaged = Column(Boolean, default=False, nullable=False)
+    refund_cents = Column(Integer, nullable=False, default=0, server_default="0")
+    refund = money_property("refund_cents")
+    reason = Column(String(255), nullable=True)
+    created_by_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    # Relationships
+    order_item = relationship("OrderItem", back_populates="return_lines")
 
 
 class Supplier(Base):
@@ -176,7 +255,8 @@ class PurchaseOrderItem(Base):
     purchase_order_id = Column(Integer, ForeignKey("purchase_orders.id"), nullable=False)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
     qty = Column(Integer, nullable=False)
-    unit_cost = Column(Float, nullable=False)
+    unit_cost_cents = Column(Integer, nullable=False, server_default="0")
+    unit_cost = money_property("unit_cost_cents")
 
     # Relationships
     purchase_order = relationship("PurchaseOrder", back_populates="items")
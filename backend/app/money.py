@@ -0,0 +1,117 @@
+"""
+Money helpers
+
+Amounts are stored and computed as integer cents; the API keeps speaking
+decimal currency amounts. Models map each money field to a `<name>_cents`
+column and expose `<name>` as a currency-unit hybrid property, so sums and
+comparisons in SQL are exact integer math.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+from fractions import Fraction
+import math
+from typing import Any, Dict, Optional, Type, Union
+
+from sqlalchemy import Integer, cast, func
+from sqlalchemy.ext.hybrid import hybrid_property
+
+CENTS_SUFFIX = "_cents"
+
+
+def to_cents(amount: float) -> int:
+    """
+    Convert a currency amount to integer cents, rounding half up
+
+    Args:
+        amount: Amount in currency units
+
+    Returns:
+        Amount in cents
+    """
+    return int(Decimal(str(amount)).scaleb(2).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def from_cents(cents: int) -> float:
+    """
+    Convert integer cents to a currency amount
+
+    Args:
+        cents: Amount in cents
+
+    Returns:
+        Amount in currency units
+    """
+    return cents / 100
+
+
+def round_cents(cents: int, factor: Union[float, Fraction] = 1) -> int:
+    """
+    Multiply whole cents by a rate or fraction and round half up
+
+    The product is computed exactly (a float rate is taken at its decimal
+    value, so 200 cents at 0.0725 is 14.5 and rounds to 15).
+
+    Args:
+        cents: Non-negative whole cents
+        factor: Non-negative rate or fraction
+
+    Returns:
+        Whole cents
+    """
+    if isinstance(factor, float):
+        factor = Fraction(str(factor))
+    return math.floor(cents * Fraction(factor) + Fraction(1, 2))
+
+
+def money_property(cents_attr: str) -> hybrid_property:
+    """
+    Currency-unit view of an integer cents column
+
+    Reading gives a float amount, assigning converts to cents, and in SQL
+    the property divides the cents column by 100.
+
+    Args:
+        cents_attr: Name of the mapped cents attribute
+
+    Returns:
+        Hybrid property for the model class body
+    """
+    def fget(self) -> Optional[float]:
+        cents = getattr(self, cents_attr)
+        return None if cents is None else from_cents(cents)
+
+    def fset(self, value: Optional[float]) -> None:
+        setattr(self, cents_attr, None if value is None else to_cents(value))
+
+    def expression(cls):
+        return getattr(cls, cents_attr) / 100.0
+
+    def update_expression(cls, value):
+        if isinstance(value, (int, float, Decimal)):
+            return [(getattr(cls, cents_attr), to_cents(value))]
+        return [(getattr(cls, cents_attr), cast(func.round(value * 100), Integer))]
+
+    return hybrid_property(fget, fset, expr=expression, update_expr=update_expression)
+
+
+def cents_values(model: Type[Any], values: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Rewrite currency-unit keys of a row dict to the model's cents columns
+
+    For set-based inserts and updates, which bypass the hybrid properties.
+
+    Args:
+        model: Mapped model class
+        values: Column values keyed by attribute name
+
+    Returns:
+        Values with money fields converted to `<name>_cents`
+    """
+    columns = model.__table__.c
+    converted = {}
+    for key, value in values.items():
+        cents_key = key + CENTS_SUFFIX
+        if cents_key in columns and key not in columns:
+            converted[cents_key] = None if value is None else to_cents(value)
+        else:
+            converted[key] = value
+    return converted
@@ -3,12 +3,16 @@ Cart validation routes
 """
 from fastapi import APIRouter, Depends, status
 from sqlalchemy.orm import Session
-from typing import List
 
 from app.database import get_db
-from app.models import Product, User
-from app.schemas import CartValidationRequest, CartValidationResponse
-from app.services.tax import calculate_tax
+from app.models import User
+from app.schemas import (
+    CartValidationRequest, CartValidationResponse,
+    CartBatchValidationRequest, CartBatchValidationResponse,
+    CartLineCreate, CartLineUpdate, CartSessionResponse
+)
+from app.services.cart_sessions import cart_store
+from app.services.pricing import price_cart, price_carts
 from app.auth import get_current_user
 
 router = APIRouter(prefix="/cart", tags=["cart"])
@@ -30,45 +34,153 @@ def validate_cart(
     Returns:
         Validation result with errors and totals
     """
-    errors = []
-    valid = True
-    subtotal = 0.0
-    taxable_subtotal = 0.0
-
-    for item in cart_data.items:
-        # Check if product exists
-        product = db.query(Product).filter(Product.id == item.product_id).first()
-        if not product:
-            errors.append(f"Product {item.product_id} not found")
-            valid = False
-            continue
-
-        # Check if quantity is available
-        if product.on_hand < item.qty:
-            errors.append(
-                f"{product.name}: Insufficient stock. Available: {product.on_hand}, Requested: {item.qty}"
-            )
-            valid = False
-            continue
-
-        # Calculate subtotal
-        item_total = product.price * item.qty
-        subtotal += item_total
-
-        # Track taxable items
-        if product.taxable:
-            taxable_subtotal += item_total
-
-    # Calculate tax
-    tax = calculate_tax(taxable_subtotal)
-    total = subtotal + tax
-
-    return CartValidationResponse(
-        valid=valid,
-        errors=errors,
-        totals={
-            "subtotal": round(subtotal, 2),
-            "tax": round(tax, 2),
-            "total": round(total, 2)
-        }
+    return price_cart(db, cart_data.items)
+
+
+@router.post("/validate/batch", response_model=CartBatchValidationResponse)
+def validate_carts(
+    batch: CartBatchValidationRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Validate many carts in one request (self-checkout kiosks)
+
+    Args:
+        batch: Carts to validate
+        db: Database session
+
+    Returns:
+        Validation result per cart, in request order
+    """
+    return CartBatchValidationResponse(
+        results=price_carts(db, [cart.items for cart in batch.carts])
     )
+
+
+@router.post("/sessions", response_model=CartSessionResponse, status_code=status.HTTP_201_CREATED)
+def create_cart_session(
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Start a server-side cart
+
+    Returns:
+        Empty cart
+    """
+    return cart_store.create(current_user.id).to_response()
+
+
+@router.get("/sessions/{cart_id}", response_model=CartSessionResponse)
+def get_cart_session(
+    cart_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get a cart with its running totals
+
+    Args:
+        cart_id: Cart ID
+
+    Returns:
+        Cart
+
+    Raises:
+        HTTPException: If the cart is not found or expired
+    """
+    return cart_store.get(cart_id, current_user.id).to_response()
+
+
+@router.post("/sessions/{cart_id}/lines", response_model=CartSessionResponse)
+def add_cart_line(
+    cart_id: str,
+    line: CartLineCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Add units of a product to a cart (one scan)
+
+    Args:
+        cart_id: Cart ID
+        line: Product and quantity to add
+        db: Database session
+
+    Returns:
+        Updated cart
+
+    Raises:
+        HTTPException: If the cart or product is not found, or stock is insufficient
+    """
+    cart = cart_store.get(cart_id, current_user.id)
+    return cart_store.add(db, cart, line.product_id, line.qty).to_response()
+
+
+@router.put("/sessions/{cart_id}/lines/{product_id}", response_model=CartSessionResponse)
+def update_cart_line(
+    cart_id: str,
+    product_id: int,
+    line: CartLineUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Set a product's quantity in a cart (0 removes the line)
+
+    Args:
+        cart_id: Cart ID
+        product_id: Product ID
+        line: New quantity
+        db: Database session
+
+    Returns:
+        Updated cart
+
+    Raises:
+        HTTPException: If the cart or product is not found, or stock is insufficient
+    """
+    cart = cart_store.get(cart_id, current_user.id)
+    return cart_store.set_qty(db, cart, product_id, line.qty).to_response()
+
+
+@router.delete("/sessions/{cart_id}/lines/{product_id}", response_model=CartSessionResponse)
+def remove_cart_line(
+    cart_id: str,
+    product_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Remove a product from a cart
+
+    Args:
+        cart_id: Cart ID
+        product_id: Product ID
+        db: Database session
+
+    Returns:
+        Updated cart
+
+    Raises:
+        HTTPException: If the cart is not found
+    """
+    cart = cart_store.get(cart_id, current_user.id)
+    return cart_store.set_qty(db, cart, product_id, 0).to_response()
+
+
+@router.delete("/sessions/{cart_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_cart_session(
+    cart_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Abandon a cart
+
+    Args:
+        cart_id: Cart ID
+
+    Raises:
+        HTTPException: If the cart is not found
+    """
+    cart_store.get(cart_id, current_user.id)
+    cart_store.delete(cart_id)
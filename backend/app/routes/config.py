@@ -3,12 +3,10 @@ Configuration routes
 """
 from fastapi import APIRouter
 from app.schemas import TaxConfigResponse
+from app.services.tax import tax_engine
 
 router = APIRouter(prefix="/config", tags=["config"])
 
-# Default tax rate (8.5%)
-DEFAULT_TAX_RATE = 0.085
-
 
 @router.get("/tax", response_model=TaxConfigResponse)
 def get_tax_config():
@@ -16,9 +14,12 @@ def get_tax_config():
     Get current tax rate configuration
 
     Returns:
-        Tax configuration
+        Tax configuration of the store's jurisdiction
     """
+    table = tax_engine.table()
     return TaxConfigResponse(
-        tax_rate=DEFAULT_TAX_RATE,
-        tax_rate_percent=DEFAULT_TAX_RATE * 100
+        tax_rate=table.rate,
+        tax_rate_percent=table.rate * 100,
+        jurisdiction=table.jurisdiction,
+        category_rates=table.category_rates
     )
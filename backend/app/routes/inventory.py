@@ -0,0 +1,98 @@
+"""
+Inventory ledger routes
+"""
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.models import User
+from app.schemas import (
+    InventoryCheckpointResponse, StockAsOf, StockMismatch, StockReconciliationResponse
+)
+from app.auth import get_current_user
+from app.rbac import require_manager
+from app.services.stock_ledger import reconcile_stock, stock_as_of, take_checkpoints
+
+router = APIRouter(prefix="/inventory", tags=["inventory"])
+
+
+@router.post("/checkpoints", response_model=InventoryCheckpointResponse)
+def create_checkpoints(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_manager)
+):
+    """
+    Checkpoint the stock of every product that moved since its last checkpoint
+
+    Meant to be called periodically (e.g. nightly) so as-of queries and
+    reconciliation only read a short ledger tail.
+
+    Args:
+        db: Database session
+        current_user: Current authenticated manager
+
+    Returns:
+        Number of checkpoints written and their time
+    """
+    now = datetime.utcnow()
+    created = take_checkpoints(db, now)
+    db.commit()
+    return InventoryCheckpointResponse(created=created, created_at=now)
+
+
+@router.get("/as-of", response_model=List[StockAsOf])
+def get_stock_as_of(
+    at: datetime,
+    product_id: Optional[List[int]] = Query(None),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get on-hand stock at a point in time
+
+    Args:
+        at: Point in time (UTC)
+        product_id: Products to report, repeatable (default: all products
+            that existed at that time)
+        db: Database session
+        current_user: Current authenticated user
+
+    Returns:
+        Stock per product
+    """
+    stock = stock_as_of(db, at, product_id)
+    return [StockAsOf(product_id=pid, on_hand=on_hand) for pid, on_hand in stock.items()]
+
+
+@router.get("/reconciliation", response_model=StockReconciliationResponse)
+def get_stock_reconciliation(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_manager)
+):
+    """
+    Check every product's on_hand against its latest checkpoint plus ledger tail
+
+    Args:
+        db: Database session
+        current_user: Current authenticated manager
+
+    Returns:
+        Number of products checked and the ones that disagree
+    """
+    checked, mismatches = reconcile_stock(db)
+    return StockReconciliationResponse(
+        checked=checked,
+        mismatches=[
+            StockMismatch(
+                product_id=product_id,
+                sku=sku,
+                on_hand=on_hand,
+                ledger_on_hand=ledger_on_hand,
+                difference=on_hand - ledger_on_hand
+            )
+            for product_id, sku, on_hand, ledger_on_hand in mismatches
+        ]
+    )
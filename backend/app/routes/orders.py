@@ -1,32 +1,54 @@
 """
 Order routes
 """
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from typing import List
-import json
+from fastapi import APIRouter, Depends, Header, HTTPException, status, Query, Response
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session, selectinload
+from typing import Dict, List, Optional, Union
 from datetime import datetime
 
 from app.database import get_db
-from app.models import Order, OrderItem, Product, InventoryMovement, InventoryMovementType, User
-from app.schemas import OrderCreate, OrderResponse, OrderItemResponse, ReceiptResponse
+from app.models import Order, OrderItem, User
+from app.money import from_cents
+from app.schemas import (
+    OrderCreate, OrderResponse, OrderItemResponse, ReceiptResponse,
+    OrderBatchCreate, OrderBatchResult, OrderBatchResponse,
+    OrderTaxAudit, OrderTaxAuditResponse
+)
 from app.auth import get_current_user
-from app.services.inventory import decrement_inventory
+from app.rbac import require_manager
+from app.services.cart_sessions import cart_store
+from app.services.checkout import checkout, checkout_batch
+from app.services.group_commit import CommitPending, run_transaction
+from app.services.idempotency import IDEMPOTENCY_HEADER, idempotency_store
+from app.services.order_numbers import order_number_allocator
+from app.services.receipts import store_legacy_receipt
+from app.services.tax import recompute_order_taxes, tax_engine
+from app.pagination import NEXT_CURSOR_HEADER, encode_cursor, decode_cursor
 
 router = APIRouter(prefix="/orders", tags=["orders"])
 
+# Loader options for OrderResponse (items -> product): one IN query per
+# level instead of a lazy load per order and per line
+ORDER_DETAIL_LOADS = (selectinload(Order.items).selectinload(OrderItem.product),)
+
 
 @router.post("", response_model=OrderResponse, status_code=status.HTTP_201_CREATED)
 def create_order(
     order_data: OrderCreate,
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Create new order (checkout)
 
+    A retry carrying the same Idempotency-Key as a completed request gets
+    the original response back without creating another order.
+
     Args:
         order_data: Order creation data
+        idempotency_key: Optional Idempotency-Key header
         db: Database session
         current_user: Current authenticated user
 
@@ -34,107 +56,299 @@ def create_order(
         Created order with items
 
     Raises:
-        HTTPException: If product not found or insufficient inventory
+        HTTPException: If product not found or insufficient inventory, or
+            the idempotency key is in use or reused with another payload
     """
-    try:
-        # Generate order number
-        order_count = db.query(Order).count()
-        order_number = f"ORD-{datetime.utcnow().strftime('%Y%m%d')}-{order_count + 1:04d}"
-
-        # Create order
-        new_order = Order(
-            order_number=order_number,
-            cashier_id=current_user.id,
-            customer_id=order_data.customer_id,
-            subtotal=order_data.subtotal,
-            discount_total=order_data.discount_total,
-            tax_total=order_data.tax_total,
-            total=order_data.total,
-            payment_json=json.dumps(order_data.payment_details) if order_data.payment_details else None
-        )
-        db.add(new_order)
-        db.flush()  # Get order ID without committing
-
-        # Create order items and decrement inventory
-        for item_data in order_data.items:
-            # Verify product exists
-            product = db.query(Product).filter(Product.id == item_data.product_id).first()
-            if not product:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail=f"Product {item_data.product_id} not found"
-                )
+    claim = idempotency_store.claim("orders", current_user.id, idempotency_key, order_data)
+    if claim.replay is not None:
+        return claim.replay
+
+    with claim:
+        # Take the lines of a server-side cart as already validated
+        cart = cart_store.get(order_data.cart_id, current_user.id) if order_data.cart_id else None
+        if cart is not None:
+            order_data = cart.to_order(order_data)
+
+        try:
+            # Allocate order number (before any writes in this transaction)
+            order_number = order_number_allocator.next_order_number(db)
+            cashier_id, cashier_email = current_user.id, current_user.email
+
+            # Write the order, its lines and stock changes (group-committed when enabled)
+            def write_order(session: Session) -> int:
+                return checkout(session, order_data, order_number, cashier_id, cashier_email).id
+
+            order_id = run_transaction(db, write_order)
+
+            # Reload with items and products in two IN queries for the response
+            # (refreshing stock the writer may have changed outside this session)
+            order = db.query(Order).options(*ORDER_DETAIL_LOADS).filter(
+                Order.id == order_id
+            ).populate_existing().one()
+
+        except HTTPException:
+            db.rollback()
+            raise
+        except CommitPending as e:
+            db.rollback()
+
+            def committed(order_id: int) -> dict:
+                if cart is not None:
+                    cart_store.delete(cart.id)
+                return {"id": order_id, "order_number": order_number}
+
+            # A retry gets the order's id and number once it has committed
+            claim.defer(e.future, status.HTTP_201_CREATED, committed)
+            raise HTTPException(
+                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                detail="Order is still being written; retry with the same Idempotency-Key"
+            )
+        except Exception as e:
+            db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to create order: {str(e)}"
+            )
+
+        if cart is not None:
+            cart_store.delete(cart.id)
+        claim.save(status.HTTP_201_CREATED, OrderResponse.model_validate(order))
+        return order
+
 
-            # Check inventory availability
-            if product.on_hand < item_data.qty:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Insufficient inventory for {product.name}. Available: {product.on_hand}, Requested: {item_data.qty}"
+def _batch_response(
+    outcomes: List[Union[int, HTTPException]],
+    order_numbers: List[str],
+    created: Dict[int, Order]
+) -> OrderBatchResponse:
+    """
+    Build a batch upload response
+
+    Args:
+        outcomes: Per order, the new order ID or the HTTPException that rejected it
+        order_numbers: Allocated order number per order
+        created: Created orders by ID (orders missing here are reported
+            without their details)
+
+    Returns:
+        Batch response
+    """
+    results = []
+    for index, (outcome, order_number) in enumerate(zip(outcomes, order_numbers)):
+        if isinstance(outcome, HTTPException):
+            results.append(OrderBatchResult(
+                index=index,
+                status_code=outcome.status_code,
+                error=outcome.detail
+            ))
+        else:
+            order = created.get(outcome)
+            results.append(OrderBatchResult(
+                index=index,
+                status_code=status.HTTP_201_CREATED,
+                order_number=order_number,
+                order=OrderResponse.model_validate(order) if order is not None else None
+            ))
+
+    failed = sum(1 for outcome in outcomes if isinstance(outcome, HTTPException))
+    return OrderBatchResponse(created=len(outcomes) - failed, failed=failed, results=results)
+
+
+@router.post("/batch", response_model=OrderBatchResponse)
+def create_orders_batch(
+    batch: OrderBatchCreate,
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Create many orders at once (offline register replay)
+
+    Orders are applied in the given order and each succeeds or fails on
+    its own; failures do not roll back the others. A retry carrying the
+    same Idempotency-Key gets the original results back.
+
+    Args:
+        batch: Orders to create
+        idempotency_key: Optional Idempotency-Key header
+        db: Database session
+        current_user: Current authenticated user
+
+    Returns:
+        Per-order results with the created orders
+    """
+    claim = idempotency_store.claim("orders/batch", current_user.id, idempotency_key, batch)
+    if claim.replay is not None:
+        return claim.replay
+
+    with claim:
+        carts = [
+            cart_store.get(order_data.cart_id, current_user.id) if order_data.cart_id else None
+            for order_data in batch.orders
+        ]
+        orders = [
+            cart.to_order(order_data) if cart is not None else order_data
+            for order_data, cart in zip(batch.orders, carts)
+        ]
+
+        try:
+            # Allocate order numbers (before any writes in this transaction)
+            order_numbers = [order_number_allocator.next_order_number(db) for _ in orders]
+            cashier_id, cashier_email = current_user.id, current_user.email
+
+            outcomes = run_transaction(
+                db, lambda session: checkout_batch(
+                    session, orders, order_numbers, cashier_id, cashier_email
                 )
+            )
 
-            # Calculate line total
-            line_total = (item_data.unit_price * item_data.qty) - item_data.discount
-
-            # Create order item
-            order_item = OrderItem(
-                order_id=new_order.id,
-                product_id=item_data.product_id,
-                qty=item_data.qty,
-                unit_price=item_data.unit_price,
-                discount=item_data.discount,
-                line_total=line_total
+            created_ids = [outcome for outcome in outcomes if isinstance(outcome, int)]
+            created = {
+                order.id: order
+                for order in db.query(Order).options(*ORDER_DETAIL_LOADS).filter(
+                    Order.id.in_(created_ids)
+                ).populate_existing()
+            } if created_ids else {}
+
+        except HTTPException:
+            db.rollback()
+            raise
+        except CommitPending as e:
+            db.rollback()
+
+            def committed(outcomes: List[Union[int, HTTPException]]) -> OrderBatchResponse:
+                for outcome, cart in zip(outcomes, carts):
+                    if cart is not None and not isinstance(outcome, HTTPException):
+                        cart_store.delete(cart.id)
+                return _batch_response(outcomes, order_numbers, {})
+
+            # A retry gets each order's outcome and number (without the
+            # order details) once the batch has committed
+            claim.defer(e.future, status.HTTP_200_OK, committed)
+            raise HTTPException(
+                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                detail="Orders are still being written; retry with the same Idempotency-Key"
             )
-            db.add(order_item)
-
-            # Decrement inventory (atomic update)
-            decrement_inventory(
-                db=db,
-                product_id=item_data.product_id,
-                qty=item_data.qty,
-                reason=f"Sale - Order {order_number}",
-                user_id=current_user.id
+        except Exception as e:
+            db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to create orders: {str(e)}"
             )
 
-        # Commit transaction
-        db.commit()
-        db.refresh(new_order)
-
-        return new_order
-
-    except HTTPException:
-        db.rollback()
-        raise
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to create order: {str(e)}"
-        )
+        for outcome, cart in zip(outcomes, carts):
+            if cart is not None and not isinstance(outcome, HTTPException):
+                cart_store.delete(cart.id)
+        response = _batch_response(outcomes, order_numbers, created)
+        claim.save(status.HTTP_200_OK, response)
+        return response
 
 
 @router.get("", response_model=List[OrderResponse])
 def list_orders(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
-    List all orders with pagination
+    List all orders with pagination, newest first
+
+    When a page is full, the cursor for the next page is returned in the
+    X-Next-Cursor header. Passing it back as `cursor` seeks past the last
+    (created_at, id) on the composite index, so every page costs the same.
 
     Args:
-        skip: Number of records to skip (pagination)
+        response: Outgoing response (for the next-cursor header)
+        skip: Number of records to skip (ignored when cursor is given)
         limit: Maximum number of records to return
+        cursor: Cursor from the previous page's X-Next-Cursor header
         db: Database session
         current_user: Current authenticated user
 
     Returns:
         List of orders
     """
-    orders = db.query(Order).order_by(Order.created_at.desc()).offset(skip).limit(limit).all()
+    query = db.query(Order).options(*ORDER_DETAIL_LOADS).order_by(
+        Order.created_at.desc(), Order.id.desc()
+    )
+
+    if cursor:
+        values = decode_cursor(cursor)
+        try:
+            last_created_at = datetime.fromisoformat(values["created_at"])
+            last_id = int(values["id"])
+        except (KeyError, TypeError, ValueError):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+        query = query.filter(
+            tuple_(Order.created_at, Order.id) < tuple_(last_created_at, last_id)
+        )
+    else:
+        query = query.offset(skip)
+
+    orders = query.limit(limit).all()
+    if len(orders) == limit:
+        last = orders[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor({
+            "created_at": last.created_at.isoformat(),
+            "id": last.id
+        })
     return orders
 
 
+@router.get("/tax-audit", response_model=OrderTaxAuditResponse)
+def audit_order_taxes(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    jurisdiction: Optional[str] = None,
+    limit: int = Query(1000, ge=1, le=10000),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_manager)
+):
+    """
+    Recompute the tax of stored orders and compare it with what was charged
+
+    Lines are taxed with the current rules and product categories, so the
+    report shows what each order would owe under the configured (or a
+    given) jurisdiction. Costs two queries regardless of the rule count.
+
+    Args:
+        start: Only orders created at or after this time
+        end: Only orders created before this time
+        jurisdiction: Tax jurisdiction (default: the store's)
+        limit: Maximum number of orders (newest first)
+        db: Database session
+        current_user: Current authenticated manager
+
+    Returns:
+        Recorded and recomputed tax per order
+
+    Raises:
+        HTTPException: If the jurisdiction is not configured
+    """
+    table = tax_engine.table(jurisdiction)
+    audits = []
+    for order, tax_cents in recompute_order_taxes(db, table, start, end, limit):
+        audits.append(OrderTaxAudit(
+            order_id=order.id,
+            order_number=order.order_number,
+            created_at=order.created_at,
+            recorded_tax=order.tax_total,
+            computed_tax=from_cents(tax_cents),
+            difference=from_cents(order.tax_total_cents - tax_cents)
+        ))
+    return OrderTaxAuditResponse(
+        jurisdiction=table.jurisdiction,
+        orders=audits,
+        mismatched=sum(1 for audit in audits if audit.difference)
+    )
+
+
 @router.get("/{order_id}", response_model=OrderResponse)
 def get_order(
     order_id: int,
@@ -155,7 +369,7 @@ def get_order(
     Raises:
         HTTPException: If order not found
     """
-    order = db.query(Order).filter(Order.id == order_id).first()
+    order = db.query(Order).options(*ORDER_DETAIL_LOADS).filter(Order.id == order_id).first()
     if not order:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -173,6 +387,10 @@ def generate_receipt(
     """
     Generate receipt for an order
 
+    Returns the receipt rendered at checkout with a single primary-key
+    read; orders from before receipt snapshots get theirs built and stored
+    on first request.
+
     Args:
         order_id: Order ID
         db: Database session
@@ -184,36 +402,13 @@ def generate_receipt(
     Raises:
         HTTPException: If order not found
     """
-    order = db.query(Order).filter(Order.id == order_id).first()
-    if not order:
+    receipt_json = db.query(Order.receipt_json).filter(Order.id == order_id).scalar()
+    if receipt_json is None:
+        receipt_json = store_legacy_receipt(db, order_id)
+    if receipt_json is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Order not found"
         )
 
-    # Build receipt data
-    items = []
-    for order_item in order.items:
-        items.append({
-            "name": order_item.product.name,
-            "qty": order_item.qty,
-            "unit_price": order_item.unit_price,
-            "discount": order_item.discount,
-            "line_total": order_item.line_total
-        })
-
-    payment_details = json.loads(order.payment_json) if order.payment_json else {}
-
-    receipt = ReceiptResponse(
-        order_number=order.order_number,
-        date=order.created_at,
-        items=items,
-        subtotal=order.subtotal,
-        discount_total=order.discount_total,
-        tax_total=order.tax_total,
-        total=order.total,
-        payment_method=payment_details.get("method", "Unknown"),
-        cashier=order.cashier.email
-    )
-
-    return receipt
+    return Response(content=receipt_json, media_type="application/json")
@@ -1,47 +1,64 @@
 """
 Product routes
 """
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import (
+    APIRouter, Depends, HTTPException, status, Query, Request, Response, UploadFile, File
+)
 from sqlalchemy.orm import Session
 from typing import List, Optional
+import io
 
 from app.database import get_db
 from app.models import Product, ProductStatus, User
-from app.schemas import ProductResponse, ProductCreate, ProductUpdate
+from app.schemas import (
+    ProductResponse, ProductCreate, ProductUpdate,
+    CatalogVersionResponse, CatalogChangesResponse, ProductImportResponse,
+    ProductBulkUpdate, ProductBulkUpdateResponse, ProductSearchResult
+)
 from app.auth import get_current_user
 from app.rbac import require_manager
+from app.pagination import NEXT_CURSOR_HEADER, encode_cursor, decode_cursor
+from app.services.search_index import product_index, index_catalog_version
+from app.services.fts import apply_fts_search, fts_available
+from app.services.catalog import (
+    ALLOWED_CATEGORIES, get_catalog_version, get_changes_since, snapshot_cache, stamp_product
+)
+from app.services.product_import import import_products, iter_csv_rows, iter_jsonl_rows
+from app.services.bulk_update import bulk_update_products
+from app.services.product_cache import product_cache, invalidate_product
+from app.services.reservations import reservations
 
 router = APIRouter(prefix="/products", tags=["products"])
 
-# Allowed product categories
-ALLOWED_CATEGORIES = [
-    "Birthday",
-    "Anniversary",
-    "Holiday",
-    "Sympathy",
-    "Blank",
-    "Humor",
-    "Kids",
-    "Thank You"
-]
-
 
 @router.get("", response_model=List[ProductResponse])
 def list_products(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=500),
     category: Optional[str] = None,
     search: str = "",
+    mode: str = Query("like", pattern="^(like|fts)$"),
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
     """
     List all products with filtering
 
+    Products are returned in ID order. When a page is full, the cursor for
+    the next page is returned in the X-Next-Cursor header; passing it back
+    as `cursor` continues after the last product without an OFFSET scan.
+    Ranked full-text results are paginated with skip only.
+
     Args:
-        skip: Number of records to skip (pagination)
+        response: Outgoing response (for the next-cursor header)
+        skip: Number of records to skip (ignored when cursor is given)
         limit: Maximum number of records to return
         category: Filter by category (optional)
         search: Search query for name, SKU, or barcode
+        mode: "like" for substring filtering, "fts" for relevance-ranked
+            full-text search (falls back to "like" where FTS is unavailable)
+        cursor: Cursor from the previous page's X-Next-Cursor header
         db: Database session
 
     Returns:
@@ -53,6 +70,13 @@ def list_products(
     if category:
         query = query.filter(Product.category == category)
 
+    # Apply full-text search, ranked by relevance
+    if search and mode == "fts" and fts_available(db):
+        ranked_query = apply_fts_search(query, search)
+        if ranked_query is None:
+            return []
+        return ranked_query.offset(skip).limit(limit).all()
+
     # Apply search filter
     if search:
         search_pattern = f"%{search}%"
@@ -62,28 +86,77 @@ def list_products(
             (Product.barcode.like(search_pattern))
         )
 
-    # Apply pagination and return
-    products = query.offset(skip).limit(limit).all()
+    # Apply keyset pagination and return
+    query = query.order_by(Product.id)
+    if cursor:
+        last_id = decode_cursor(cursor).get("id")
+        if not isinstance(last_id, int):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+        query = query.filter(Product.id > last_id)
+    else:
+        query = query.offset(skip)
+
+    products = query.limit(limit).all()
+    if len(products) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor({"id": products[-1].id})
     return products
 
 
-@router.get("/search", response_model=List[ProductResponse])
+@router.get("/search", response_model=List[ProductSearchResult])
 def search_products(
     q: str = Query(..., min_length=1),
     limit: int = Query(20, ge=1, le=100),
+    mode: str = Query("index", pattern="^(index|fts|fuzzy|like)$"),
     db: Session = Depends(get_db)
 ):
     """
     Fast product search by SKU, barcode, or name
 
+    Modes:
+        index: served from the in-memory token index; the SQL substring
+            search is used when the index is unavailable or finds nothing
+        fts: BM25-ranked full-text search over name, description, SKU
+            and category
+        fuzzy: typo-tolerant match of name tokens within a small edit
+            distance, served from the in-memory index
+        like: SQL substring search
+
+    Each result carries `available`: on_hand minus units reserved by
+    open carts.
+
     Args:
         q: Search query
         limit: Maximum number of results
+        mode: Search mode
         db: Database session
 
     Returns:
         List of matching products
     """
+    # Ranked full-text search
+    if mode == "fts" and fts_available(db):
+        ranked_query = apply_fts_search(
+            db.query(Product).filter(Product.status == ProductStatus.ACTIVE), q
+        )
+        return _with_availability(ranked_query.limit(limit).all() if ranked_query is not None else [])
+
+    # Serve from the in-memory index when it is loaded
+    if mode in ("index", "fuzzy") and product_index.ready:
+        if mode == "fuzzy":
+            product_ids = product_index.fuzzy_search(q, limit)
+        else:
+            product_ids = product_index.search(q, limit)
+        if product_ids:
+            products = db.query(Product).filter(Product.id.in_(product_ids)).all()
+            products_by_id = {product.id: product for product in products}
+            return _with_availability(
+                [products_by_id[pid] for pid in product_ids if pid in products_by_id]
+            )
+
+    # Fall back to a substring scan (index not built, or no prefix match)
     search_pattern = f"%{q}%"
     products = db.query(Product).filter(
         (Product.sku.like(search_pattern)) |
@@ -93,7 +166,139 @@ def search_products(
         Product.status == ProductStatus.ACTIVE
     ).limit(limit).all()
 
-    return products
+    return _with_availability(products)
+
+
+def _with_availability(products: List[Product]) -> List[ProductSearchResult]:
+    held = reservations.reserved_many([product.id for product in products])
+    return [
+        ProductSearchResult(
+            **ProductResponse.model_validate(product).model_dump(),
+            available=product.on_hand - held.get(product.id, 0)
+        )
+        for product in products
+    ]
+
+
+@router.get("/catalog/version", response_model=CatalogVersionResponse)
+def get_catalog_version_endpoint(db: Session = Depends(get_db)):
+    """
+    Get the current catalog version
+
+    Args:
+        db: Database session
+
+    Returns:
+        Catalog version
+    """
+    return CatalogVersionResponse(version=get_catalog_version(db))
+
+
+@router.get("/catalog/snapshot")
+def get_catalog_snapshot(
+    request: Request,
+    db: Session = Depends(get_db)
+):
+    """
+    Download the full catalog as gzipped JSON
+
+    The body is {"version": N, "products": [...]}; the ETag carries the
+    version so unchanged catalogs cost a 304. Follow up with
+    /products/catalog/changes?since=N to stay current.
+
+    Args:
+        request: Incoming request (for If-None-Match)
+        db: Database session
+
+    Returns:
+        Compressed catalog snapshot
+    """
+    version, body = snapshot_cache.get(db)
+    etag = f'"catalog-{version}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={"Content-Encoding": "gzip", "ETag": etag}
+    )
+
+
+@router.get("/catalog/changes", response_model=CatalogChangesResponse)
+def get_catalog_changes(
+    since: int = Query(..., ge=0),
+    after_id: int = Query(0, ge=0),
+    limit: int = Query(1000, ge=1, le=5000),
+    db: Session = Depends(get_db)
+):
+    """
+    Products changed after a catalog version, oldest change first
+
+    Discontinued products are included with their new status, so clients
+    can drop them locally. When has_more is true, call again with
+    since=version and after_id=after_id; otherwise the client is current
+    as of version.
+
+    Args:
+        since: Catalog version the client already holds
+        after_id: Last product ID received within a partially read version
+        limit: Maximum number of products to return
+        db: Database session
+
+    Returns:
+        Changed products and where to resume
+    """
+    products, has_more = get_changes_since(db, since, after_id, limit)
+    last = products[-1] if products else None
+    return CatalogChangesResponse(
+        since=since,
+        version=last.catalog_version if last else since,
+        after_id=last.id if has_more else 0,
+        has_more=has_more,
+        products=products
+    )
+
+
+@router.get("/scan", response_model=ProductResponse)
+def scan_product(
+    code: str = Query(..., min_length=1),
+    db: Session = Depends(get_db)
+):
+    """
+    Resolve a scanned barcode or SKU to a single active product
+
+    Args:
+        code: Full barcode or SKU
+        db: Database session
+
+    Returns:
+        Matching product
+
+    Raises:
+        HTTPException: If no active product has this code
+    """
+    code = code.strip()
+
+    # Exact-match lookup in the in-memory code map
+    product_id = product_index.lookup_code(code) if product_index.ready else None
+    if product_id is not None:
+        product = product_cache.get(db, product_id)
+        if product and product.status == ProductStatus.ACTIVE:
+            return product
+
+    # Fall back to an indexed equality lookup
+    product = db.query(Product).filter(
+        (Product.barcode == code) | (Product.sku == code)
+    ).filter(
+        Product.status == ProductStatus.ACTIVE
+    ).first()
+    if not product:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No product found for code {code}"
+        )
+    return product
 
 
 @router.get("/{product_id}", response_model=ProductResponse)
@@ -114,7 +319,7 @@ def get_product(
     Raises:
         HTTPException: If product not found
     """
-    product = db.query(Product).filter(Product.id == product_id).first()
+    product = product_cache.get(db, product_id)
     if not product:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -123,6 +328,20 @@ def get_product(
     return product
 
 
+@router.get("/cache/stats")
+def get_product_cache_stats(current_user: User = Depends(require_manager)):
+    """
+    Get product cache counters for this worker
+
+    Args:
+        current_user: Current authenticated user
+
+    Returns:
+        Hits, misses, evictions and size
+    """
+    return product_cache.stats()
+
+
 @router.post("", response_model=ProductResponse, status_code=status.HTTP_201_CREATED)
 def create_product(
     product_data: ProductCreate,
@@ -169,13 +388,101 @@ def create_product(
 
     # Create product
     new_product = Product(**product_data.model_dump())
+    stamp_product(db, new_product)
     db.add(new_product)
     db.commit()
     db.refresh(new_product)
+    product_index.upsert(new_product)
 
     return new_product
 
 
+@router.post("/import", response_model=ProductImportResponse)
+def import_products_file(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, pattern="^(csv|jsonl)$"),
+    upsert: bool = False,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_manager)
+):
+    """
+    Bulk import products from a CSV or JSONL file
+
+    Rows are streamed and written in chunks with set-based inserts and
+    updates. Invalid rows are reported individually and do not stop the
+    import.
+
+    Args:
+        file: CSV (with header row) or JSONL upload of product fields
+        format: File format; inferred from the file name when omitted
+        upsert: Update existing products matched by SKU
+        db: Database session
+        current_user: Current authenticated user
+
+    Returns:
+        Import counts and per-row errors
+
+    Raises:
+        HTTPException: If the file format cannot be determined
+    """
+    filename = (file.filename or "").lower()
+    if format is None:
+        if filename.endswith(".csv"):
+            format = "csv"
+        elif filename.endswith((".jsonl", ".ndjson")):
+            format = "jsonl"
+        else:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Unknown file format. Use a .csv or .jsonl file or pass format"
+            )
+
+    lines = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    rows = iter_csv_rows(lines) if format == "csv" else iter_jsonl_rows(lines)
+    result = import_products(db, rows, upsert=upsert)
+
+    return ProductImportResponse(
+        created=result.created,
+        updated=result.updated,
+        failed=result.failed,
+        errors=result.errors
+    )
+
+
+@router.post("/bulk-update", response_model=ProductBulkUpdateResponse)
+def bulk_update(
+    update_data: ProductBulkUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_manager)
+):
+    """
+    Update every product matching a filter in a single statement
+
+    Use changes.price_adjust_percent for relative repricing (e.g. -10 for
+    10% off, rounded to cents).
+
+    Args:
+        update_data: Product filter and field changes
+        db: Database session
+        current_user: Current authenticated user
+
+    Returns:
+        Number of affected products and their new catalog version
+
+    Raises:
+        HTTPException: If the filter or changes are empty or invalid
+    """
+    affected, version = bulk_update_products(
+        db, update_data.filter, update_data.changes, current_user.id
+    )
+    if affected:
+        db.commit()
+        index_catalog_version(db, version)
+        product_cache.invalidate_all()
+
+    return ProductBulkUpdateResponse(affected=affected, catalog_version=version)
+
+
 @router.patch("/{product_id}", response_model=ProductResponse)
 def update_product(
     product_id: int,
@@ -235,9 +542,12 @@ def update_product(
     # Update product fields
     for field, value in update_data.items():
         setattr(product, field, value)
+    stamp_product(db, product)
+    invalidate_product(db, product.id)
 
     db.commit()
     db.refresh(product)
+    product_index.upsert(product)
 
     return product
 
@@ -271,8 +581,11 @@ def delete_product(
 
     # Soft delete by setting status to discontinued
     product.status = ProductStatus.DISCONTINUED
+    stamp_product(db, product)
+    invalidate_product(db, product.id)
     db.commit()
     db.refresh(product)
+    product_index.remove(product.id)
 
     return product
 
@@ -1,24 +1,29 @@
 """
 Returns and Refunds routes
 """
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, status, Query
+from sqlalchemy import bindparam, case, func, insert, update
+from sqlalchemy.orm import Session, selectinload
+from typing import Dict, List, Optional
 import json
 from datetime import datetime
+from fractions import Fraction
 
 from app.database import get_db
 from app.models import (
-    Order, OrderItem, Product, InventoryMovement,
-    InventoryMovementType, User, AuditLog
+    Order, OrderItem, InventoryMovement,
+    InventoryMovementType, ReturnLine, User, AuditLog
 )
+from app.money import from_cents, round_cents
 from app.schemas import (
     ReturnCreate, ReturnResponse, OrderLookupResponse,
-    ReturnItemCreate
+    ReturnItemCreate, ReturnReportLine, ReturnReportResponse
 )
 from app.auth import get_current_user
-from app.rbac import require_cashier
-from app.services.inventory import increment_inventory
+from app.rbac import require_cashier, require_manager
+from app.services.inventory import increment_stock
+from app.services.group_commit import CommitPending, run_transaction
+from app.services.idempotency import IDEMPOTENCY_HEADER, idempotency_store
 
 router = APIRouter(prefix="/returns", tags=["returns"])
 
@@ -43,8 +48,11 @@ def lookup_order(
     Raises:
         HTTPException: If order not found
     """
-    # Search by order number (receipt number is same as order number)
-    order = db.query(Order).filter(Order.order_number == search.strip()).first()
+    # Search by order number (receipt number is same as order number),
+    # loading lines and their products with one IN query each
+    order = db.query(Order).options(
+        selectinload(Order.items).selectinload(OrderItem.product)
+    ).filter(Order.order_number == search.strip()).first()
 
     if not order:
         raise HTTPException(
@@ -73,24 +81,239 @@ def lookup_order(
                 "qty": item.qty,
                 "unit_price": item.unit_price,
                 "discount": item.discount,
-                "line_total": item.line_total
+                "line_total": item.line_total,
+                "returned_qty": item.returned_qty
             }
             for item in order.items
         ]
     )
 
 
+def claim_returned_qty(
+    db: Session,
+    order_items: Dict[int, OrderItem],
+    returned_qty: Dict[int, int]
+) -> None:
+    """
+    Move order items' returned_qty counters with one batched UPDATE
+
+    Each row is only updated if its counter still holds the value that was
+    read, so two concurrent returns of the same line cannot both succeed.
+
+    Args:
+        db: Database session
+        order_items: Order items as loaded, by ID
+        returned_qty: New returned quantity per order item ID
+
+    Raises:
+        HTTPException: If a counter changed since it was read
+    """
+    table = OrderItem.__table__
+    statement = update(table).where(table.c.id == bindparam("_id")).where(
+        table.c.returned_qty == bindparam("_old")
+    ).values(returned_qty=bindparam("_new"))
+    params = [
+        {"_id": item_id, "_old": order_items[item_id].returned_qty, "_new": qty}
+        for item_id, qty in sorted(returned_qty.items())
+    ]
+
+    if len(params) == 1 or not db.get_bind().dialect.supports_sane_multi_rowcount:
+        claimed = sum(db.execute(statement, row).rowcount for row in params)
+    else:
+        claimed = db.execute(statement, params).rowcount
+    if claimed != len(params):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Order items changed during return, please retry"
+        )
+
+    for item_id in returned_qty:
+        db.expire(order_items[item_id], ["returned_qty"])
+
+
+def _apply_return(
+    db: Session,
+    return_data: ReturnCreate,
+    user_id: int,
+    user_email: str
+) -> ReturnResponse:
+    """
+    Write a return: ledger lines, restock, damage movements and audit log
+    (caller commits)
+
+    Each line is checked against the order item's returned_qty counter, so
+    repeated partial returns can never return more than was sold. Order
+    items are loaded with one query and every write is one batched
+    statement, whatever the number of lines.
+
+    Args:
+        db: Database session
+        return_data: Return data with line items
+        user_id: Cashier user ID
+        user_email: Cashier email for the response
+
+    Returns:
+        Return processing result
+
+    Raises:
+        HTTPException: If order not found or invalid return
+    """
+    # Verify order exists
+    order = db.query(Order).filter(Order.id == return_data.order_id).first()
+    if not order:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Order not found"
+        )
+
+    # Parse original payment details
+    payment_details = json.loads(order.payment_json) if order.payment_json else {}
+    refund_method = payment_details.get("method", "cash")
+
+    # Load every returned order item with one IN query
+    order_items = {
+        order_item.id: order_item
+        for order_item in db.query(OrderItem).filter(
+            OrderItem.id.in_({item.order_item_id for item in return_data.items}),
+            OrderItem.order_id == order.id
+        )
+    }
+
+    total_refund_cents = 0
+    processed_items = []
+    returned_qty: Dict[int, int] = {}
+    restock: Dict[int, int] = {}
+    lines = []
+    movements = []
+
+    # Validate and price every line before writing anything; lines that
+    # repeat an order item are counted one after the other
+    for return_item in return_data.items:
+        order_item = order_items.get(return_item.order_item_id)
+        if not order_item:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Order item {return_item.order_item_id} not found"
+            )
+
+        # Validate return quantity
+        if return_item.qty > order_item.qty:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Return quantity ({return_item.qty}) exceeds order quantity ({order_item.qty})"
+            )
+        already_returned = returned_qty.get(order_item.id, order_item.returned_qty)
+        if already_returned + return_item.qty > order_item.qty:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=(
+                    f"Return quantity ({return_item.qty}) exceeds remaining quantity "
+                    f"({order_item.qty - already_returned}); {already_returned} already returned"
+                )
+            )
+        returned_qty[order_item.id] = already_returned + return_item.qty
+
+        # Refund the line total prorated over the units returned so far,
+        # so a line returned in parts refunds exactly its line total
+        refund_cents = (
+            round_cents(order_item.line_total_cents, Fraction(returned_qty[order_item.id], order_item.qty))
+            - round_cents(order_item.line_total_cents, Fraction(already_returned, order_item.qty))
+        )
+        total_refund_cents += refund_cents
+        lines.append({
+            "order_id": order.id,
+            "order_item_id": order_item.id,
+            "product_id": order_item.product_id,
+            "qty": return_item.qty,
+            "damaged": return_item.damaged,
+            "refund_cents": refund_cents,
+            "reason": return_data.reason,
+            "created_by_id": user_id,
+        })
+
+        # Restock only if NOT damaged; damaged units are recorded as a loss
+        if not return_item.damaged:
+            restock[order_item.product_id] = restock.get(order_item.product_id, 0) + return_item.qty
+            movements.append({
+                "product_id": order_item.product_id,
+                "type": InventoryMovementType.RETURN,
+                "delta_qty": return_item.qty,
+                "reason": f"Return - Order {order.order_number} (non-damaged)",
+                "created_by_id": user_id,
+            })
+        else:
+            # Returned, then written off: the pair nets to zero like on_hand
+            movements.append({
+                "product_id": order_item.product_id,
+                "type": InventoryMovementType.RETURN,
+                "delta_qty": return_item.qty,
+                "reason": f"Return - Order {order.order_number} (damaged)",
+                "created_by_id": user_id,
+            })
+            movements.append({
+                "product_id": order_item.product_id,
+                "type": InventoryMovementType.DAMAGE,
+                "delta_qty": -return_item.qty,  # Negative to show loss
+                "reason": f"Return - Order {order.order_number} (damaged, not restocked)",
+                "created_by_id": user_id,
+            })
+
+        processed_items.append({
+            "order_item_id": return_item.order_item_id,
+            "product_id": order_item.product_id,
+            "qty": return_item.qty,
+            "damaged": return_item.damaged,
+            "refund_amount": from_cents(refund_cents)
+        })
+
+    claim_returned_qty(db, order_items, returned_qty)
+    increment_stock(db, restock)
+    db.execute(insert(ReturnLine), lines)
+    db.execute(insert(InventoryMovement), movements)
+
+    # Create audit log entry
+    audit_log = AuditLog(
+        actor_id=user_id,
+        action="return_processed",
+        entity_type="order",
+        entity_id=order.id,
+        metadata_json=json.dumps({
+            "order_number": order.order_number,
+            "items": processed_items,
+            "total_refund": from_cents(total_refund_cents),
+            "refund_method": refund_method,
+            "reason": return_data.reason
+        })
+    )
+    db.add(audit_log)
+
+    return ReturnResponse(
+        order_id=order.id,
+        order_number=order.order_number,
+        refund_amount=from_cents(total_refund_cents),
+        refund_method=refund_method,
+        items_returned=processed_items,
+        processed_at=datetime.utcnow(),
+        processed_by=user_email
+    )
+
+
 @router.post("", response_model=ReturnResponse, status_code=status.HTTP_201_CREATED)
 def process_return(
     return_data: ReturnCreate,
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER),
     db: Session = Depends(get_db),
     current_user: User = Depends(require_cashier)
 ):
     """
     Process return/refund
 
+    A retry carrying the same Idempotency-Key as a completed request gets
+    the original response back without refunding or restocking again.
+
     Args:
         return_data: Return data with line items
+        idempotency_key: Optional Idempotency-Key header
         db: Database session
         current_user: Current authenticated user (cashier+)
 
@@ -98,113 +321,85 @@ def process_return(
         Return processing result
 
     Raises:
-        HTTPException: If order not found or invalid return
+        HTTPException: If order not found or invalid return, or the
+            idempotency key is in use or reused with another payload
     """
-    try:
-        # Verify order exists
-        order = db.query(Order).filter(Order.id == return_data.order_id).first()
-        if not order:
+    claim = idempotency_store.claim("returns", current_user.id, idempotency_key, return_data)
+    if claim.replay is not None:
+        return claim.replay
+
+    with claim:
+        try:
+            user_id = current_user.id
+            user_email = current_user.email
+            result = run_transaction(
+                db, lambda session: _apply_return(session, return_data, user_id, user_email)
+            )
+
+        except HTTPException:
+            db.rollback()
+            raise
+        except CommitPending as e:
+            db.rollback()
+            # A retry gets the return's response once it has committed
+            claim.defer(e.future, status.HTTP_201_CREATED, lambda result: result)
             raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Order not found"
+                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                detail="Return is still being written; retry with the same Idempotency-Key"
+            )
+        except Exception as e:
+            db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to process return: {str(e)}"
             )
 
-        # Parse original payment details
-        payment_details = json.loads(order.payment_json) if order.payment_json else {}
-        refund_method = payment_details.get("method", "cash")
-
-        total_refund = 0.0
-        processed_items = []
-
-        # Process each return item
-        for return_item in return_data.items:
-            # Verify order item exists
-            order_item = db.query(OrderItem).filter(
-                OrderItem.id == return_item.order_item_id,
-                OrderItem.order_id == return_data.order_id
-            ).first()
-
-            if not order_item:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail=f"Order item {return_item.order_item_id} not found"
-                )
+        claim.save(status.HTTP_201_CREATED, result)
+        return result
 
-            # Validate return quantity
-            if return_item.qty > order_item.qty:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Return quantity ({return_item.qty}) exceeds order quantity ({order_item.qty})"
-                )
 
-            # Calculate refund amount (proportional to quantity)
-            refund_amount = (order_item.line_total / order_item.qty) * return_item.qty
-            total_refund += refund_amount
-
-            # Increment inventory only if NOT damaged
-            if not return_item.damaged:
-                increment_inventory(
-                    db=db,
-                    product_id=order_item.product_id,
-                    qty=return_item.qty,
-                    reason=f"Return - Order {order.order_number} (non-damaged)",
-                    user_id=current_user.id
-                )
-            else:
-                # Record damaged inventory movement (but don't increment stock)
-                product = db.query(Product).filter(Product.id == order_item.product_id).first()
-                movement = InventoryMovement(
-                    product_id=order_item.product_id,
-                    type=InventoryMovementType.DAMAGE,
-                    delta_qty=-return_item.qty,  # Negative to show loss
-                    reason=f"Return - Order {order.order_number} (damaged, not restocked)",
-                    created_by_id=current_user.id
-                )
-                db.add(movement)
+@router.get("/report", response_model=ReturnReportResponse)
+def return_report(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_manager)
+):
+    """
+    Summarize returns per product from the return ledger
 
-            processed_items.append({
-                "order_item_id": return_item.order_item_id,
-                "product_id": order_item.product_id,
-                "qty": return_item.qty,
-                "damaged": return_item.damaged,
-                "refund_amount": refund_amount
-            })
+    Args:
+        start: Only returns processed at or after this time
+        end: Only returns processed before this time
+        db: Database session
+        current_user: Current authenticated manager
 
-        # Create audit log entry
-        audit_log = AuditLog(
-            actor_id=current_user.id,
-            action="return_processed",
-            entity_type="order",
-            entity_id=order.id,
-            metadata_json=json.dumps({
-                "order_number": order.order_number,
-                "items": processed_items,
-                "total_refund": total_refund,
-                "refund_method": refund_method,
-                "reason": return_data.reason
-            })
-        )
-        db.add(audit_log)
-
-        # Commit transaction
-        db.commit()
-
-        return ReturnResponse(
-            order_id=order.id,
-            order_number=order.order_number,
-            refund_amount=total_refund,
-            refund_method=refund_method,
-            items_returned=processed_items,
-            processed_at=datetime.utcnow(),
-            processed_by=current_user.email
-        )
+    Returns:
+        Returned units, damaged units and refunds, in total and per product
+    """
+    query = db.query(
+        ReturnLine.product_id,
+        func.sum(ReturnLine.qty),
+        func.sum(case((ReturnLine.damaged, ReturnLine.qty), else_=0)),
+        func.sum(ReturnLine.refund_cents)
+    ).group_by(ReturnLine.product_id).order_by(ReturnLine.product_id)
+    if start is not None:
+        query = query.filter(ReturnLine.created_at >= start)
+    if end is not None:
+        query = query.filter(ReturnLine.created_at < end)
 
-    except HTTPException:
-        db.rollback()
-        raise
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to process return: {str(e)}"
-        )
+    rows = query.all()
+    return ReturnReportResponse(
+        units=sum(row[1] for row in rows),
+        damaged_units=sum(row[2] for row in rows),
+        refund_total=from_cents(sum(row[3] for row in rows)),
+        products=[
+            ReturnReportLine(
+                product_id=product_id,
+                units=units,
+                damaged_units=damaged_units,
+                refund_total=from_cents(refund_cents)
+            )
+            for product_id, units, damaged_units, refund_cents in rows
+        ]
+    )
@@ -1,15 +1,16 @@
 """
 User routes
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
 from app.database import get_db
 from app.models import User, UserRole
 from app.schemas import UserResponse
 from app.auth import get_current_user
 from app.rbac import require_admin
+from app.pagination import NEXT_CURSOR_HEADER, encode_cursor, decode_cursor
 
 router = APIRouter(prefix="/users", tags=["users"])
 
@@ -30,20 +31,41 @@ def get_me(current_user: User = Depends(get_current_user)):
 
 @router.get("", response_model=List[UserResponse])
 def list_users(
+    response: Response,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_admin)
 ):
     """
-    List all users (Admin only)
+    List users in ID order (Admin only)
+
+    When a page is full, the cursor for the next page is returned in the
+    X-Next-Cursor header.
 
     Args:
+        response: Outgoing response (for the next-cursor header)
+        limit: Maximum number of records to return
+        cursor: Cursor from the previous page's X-Next-Cursor header
         db: Database session
         current_user: Current authenticated admin user
 
     Returns:
-        List of all users
+        List of users
     """
-    users = db.query(User).all()
+    query = db.query(User).order_by(User.id)
+    if cursor:
+        last_id = decode_cursor(cursor).get("id")
+        if not isinstance(last_id, int):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+        query = query.filter(User.id > last_id)
+
+    users = query.limit(limit).all()
+    if len(users) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor({"id": users[-1].id})
     return users
 
 
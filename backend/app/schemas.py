@@ -1,10 +1,10 @@
 """
 Pydantic schemas for request/response validation
 """
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, EmailStr, Field, model_validator
 from typing import Optional, List, Dict, Any
 from datetime import datetime
-from app.models import UserRole
+from app.models import UserRole, ProductStatus
 
 
 # Auth schemas
@@ -95,6 +95,82 @@ class ProductResponse(ProductBase):
         return self.price - self.cost
 
 
+class ProductSearchResult(ProductResponse):
+    """Product search hit with available-to-sell stock"""
+    available: int
+
+
+class CatalogProductResponse(ProductBase):
+    """Catalog sync product schema (stock levels are not versioned)"""
+    id: int
+    status: str
+    catalog_version: int
+
+    class Config:
+        from_attributes = True
+
+
+class CatalogVersionResponse(BaseModel):
+    """Catalog version response schema"""
+    version: int
+
+
+class CatalogChangesResponse(BaseModel):
+    """Catalog delta response schema"""
+    since: int
+    version: int
+    after_id: int
+    has_more: bool
+    products: List[CatalogProductResponse]
+
+
+class ProductImportError(BaseModel):
+    """Bulk import row error schema"""
+    row: int
+    sku: Optional[str] = None
+    error: str
+
+
+class ProductImportResponse(BaseModel):
+    """Bulk import result schema"""
+    created: int
+    updated: int
+    failed: int
+    errors: List[ProductImportError]
+
+
+class ProductBulkFilter(BaseModel):
+    """Bulk update product selection (criteria are combined with AND)"""
+    ids: Optional[List[int]] = None
+    category: Optional[str] = None
+    sku_prefix: Optional[str] = Field(None, min_length=1)
+
+
+class ProductBulkChanges(BaseModel):
+    """Bulk update field changes"""
+    price: Optional[float] = Field(None, gt=0)
+    price_adjust_percent: Optional[float] = Field(None, gt=-100)
+    cost: Optional[float] = Field(None, ge=0)
+    category: Optional[str] = None
+    taxable: Optional[bool] = None
+    reorder_threshold: Optional[int] = Field(None, ge=0)
+    reorder_qty: Optional[int] = Field(None, ge=0)
+    location: Optional[str] = None
+    status: Optional[ProductStatus] = None
+
+
+class ProductBulkUpdate(BaseModel):
+    """Bulk update request schema"""
+    filter: ProductBulkFilter
+    changes: ProductBulkChanges
+
+
+class ProductBulkUpdateResponse(BaseModel):
+    """Bulk update result schema"""
+    affected: int
+    catalog_version: Optional[int] = None
+
+
 # Order schemas
 class OrderItemCreate(BaseModel):
     """Order item creation schema"""
@@ -122,13 +198,24 @@ class OrderItemResponse(BaseModel):
 class OrderCreate(BaseModel):
     """Order creation schema"""
     customer_id: Optional[int] = None
-    items: List[OrderItemCreate]
-    subtotal: float = Field(..., ge=0)
+    # Either the lines and totals, or a server-side cart to take them from
+    items: List[OrderItemCreate] = []
+    cart_id: Optional[str] = None
+    subtotal: Optional[float] = Field(None, ge=0)
     discount_total: float = Field(0.0, ge=0)
-    tax_total: float = Field(..., ge=0)
-    total: float = Field(..., gt=0)
+    tax_total: Optional[float] = Field(None, ge=0)
+    total: Optional[float] = Field(None, gt=0)
     payment_details: Optional[Dict[str, Any]] = None
 
+    @model_validator(mode="after")
+    def check_items_or_cart(self) -> "OrderCreate":
+        if not self.cart_id:
+            if not self.items:
+                raise ValueError("Order needs items or a cart_id")
+            if None in (self.subtotal, self.tax_total, self.total):
+                raise ValueError("subtotal, tax_total and total are required without a cart_id")
+        return self
+
 
 class OrderResponse(BaseModel):
     """Order response schema"""
@@ -148,6 +235,27 @@ class OrderResponse(BaseModel):
         from_attributes = True
 
 
+class OrderBatchCreate(BaseModel):
+    """Batch order upload schema (offline register replay)"""
+    orders: List[OrderCreate] = Field(..., min_length=1, max_length=500)
+
+
+class OrderBatchResult(BaseModel):
+    """Outcome of one order in a batch upload"""
+    index: int
+    status_code: int
+    order_number: Optional[str] = None
+    order: Optional[OrderResponse] = None
+    error: Optional[str] = None
+
+
+class OrderBatchResponse(BaseModel):
+    """Batch order upload response schema"""
+    created: int
+    failed: int
+    results: List[OrderBatchResult]
+
+
 class ReceiptResponse(BaseModel):
     """Receipt response schema"""
     order_number: str
@@ -180,11 +288,68 @@ class CartValidationResponse(BaseModel):
     totals: Dict[str, float]
 
 
+class CartBatchValidationRequest(BaseModel):
+    """Multi-cart validation request schema"""
+    carts: List[CartValidationRequest] = Field(..., min_length=1, max_length=100)
+
+
+class CartBatchValidationResponse(BaseModel):
+    """Multi-cart validation response schema"""
+    results: List[CartValidationResponse]
+
+
+class CartLineCreate(BaseModel):
+    """Cart session line add schema"""
+    product_id: int
+    qty: int = Field(1, gt=0)
+
+
+class CartLineUpdate(BaseModel):
+    """Cart session line quantity schema (0 removes the line)"""
+    qty: int = Field(..., ge=0)
+
+
+class CartSessionLine(BaseModel):
+    """Cart session line schema"""
+    product_id: int
+    name: str
+    qty: int
+    unit_price: float
+    taxable: bool
+    line_total: float
+
+
+class CartSessionResponse(BaseModel):
+    """Cart session response schema"""
+    id: str
+    items: List[CartSessionLine]
+    totals: Dict[str, float]
+
+
 # Config schemas
 class TaxConfigResponse(BaseModel):
     """Tax configuration response schema"""
     tax_rate: float
     tax_rate_percent: float
+    jurisdiction: str
+    category_rates: Dict[str, float] = {}
+
+
+class OrderTaxAudit(BaseModel):
+    """Recorded vs recomputed tax of one order"""
+    order_id: int
+    order_number: str
+    created_at: datetime
+    recorded_tax: float
+    computed_tax: float
+    difference: float
+
+
+class OrderTaxAuditResponse(BaseModel):
+    """Tax recomputation over a set of orders"""
+    jurisdiction: str
+    orders: List[OrderTaxAudit]
+    mismatched: int
 
 
 # Returns schemas
@@ -227,6 +392,50 @@ class ReturnResponse(BaseModel):
     processed_by: str
 
 
+class ReturnReportLine(BaseModel):
+    """Returned units and refunds of one product"""
+    product_id: int
+    units: int
+    damaged_units: int
+    refund_total: float
+
+
+class ReturnReportResponse(BaseModel):
+    """Returns over a period, from the return ledger"""
+    units: int
+    damaged_units: int
+    refund_total: float
+    products: List[ReturnReportLine]
+
+
+# Inventory ledger schemas
+class InventoryCheckpointResponse(BaseModel):
+    """Checkpoint run result"""
+    created: int
+    created_at: datetime
+
+
+class StockAsOf(BaseModel):
+    """A product's stock at a point in time"""
+    product_id: int
+    on_hand: int
+
+
+class StockMismatch(BaseModel):
+    """A product whose on_hand disagrees with its ledger"""
+    product_id: int
+    sku: str
+    on_hand: int
+    ledger_on_hand: int
+    difference: int
+
+
+class StockReconciliationResponse(BaseModel):
+    """Catalog-wide on_hand vs ledger comparison"""
+    checked: int
+    mismatches: List[StockMismatch]
+
+
 # Health check schema
 class HealthCheck(BaseModel):
     """Health check response"""
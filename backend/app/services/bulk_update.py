@@ -0,0 +1,99 @@
+"""
+Set-based bulk product updates
+"""
+import json
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import Integer, and_, cast, func, update
+from sqlalchemy.orm import Session
+
+from app.models import AuditLog, Product
+from app.schemas import ProductBulkChanges, ProductBulkFilter
+from app.services.catalog import ALLOWED_CATEGORIES, next_catalog_version
+
+
+def bulk_update_products(
+    db: Session,
+    filters: ProductBulkFilter,
+    changes: ProductBulkChanges,
+    user_id: int
+) -> Tuple[int, Optional[int]]:
+    """
+    Apply field changes to every matching product in one UPDATE
+
+    All matched products are stamped with one new catalog version, and a
+    single audit entry records the filter, changes and affected count. The
+    caller commits.
+
+    Args:
+        db: Database session
+        filters: Product selection
+        changes: Fields to set, or a percentage price adjustment
+        user_id: User ID performing the update
+
+    Returns:
+        Number of affected products and the catalog version they were
+        stamped with (None if nothing matched)
+
+    Raises:
+        HTTPException: If the filter or changes are empty or invalid
+    """
+    conditions = []
+    if filters.ids is not None:
+        conditions.append(Product.id.in_(filters.ids))
+    if filters.category is not None:
+        conditions.append(Product.category == filters.category)
+    if filters.sku_prefix is not None:
+        conditions.append(Product.sku.startswith(filters.sku_prefix, autoescape=True))
+    if not conditions:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="At least one filter (ids, category, sku_prefix) is required"
+        )
+
+    values: Dict[str, Any] = changes.model_dump(exclude_none=True)
+    percent = values.pop("price_adjust_percent", None)
+    if percent is not None:
+        if "price" in values:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Set either price or price_adjust_percent, not both"
+            )
+        values["price_cents"] = cast(func.round(Product.price_cents * (1 + percent / 100)), Integer)
+    if not values:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No changes given"
+        )
+    if "category" in values and values["category"] not in ALLOWED_CATEGORIES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid category. Must be one of: {', '.join(ALLOWED_CATEGORIES)}"
+        )
+
+    version = next_catalog_version(db)
+    result = db.execute(
+        update(Product)
+        .where(and_(*conditions))
+        .values(**values, catalog_version=version)
+        .execution_options(synchronize_session=False)
+    )
+    affected = result.rowcount
+    if not affected:
+        db.rollback()
+        return 0, None
+
+    audit_log = AuditLog(
+        actor_id=user_id,
+        action="bulk_update",
+        entity_type="catalog_version",
+        entity_id=version,
+        metadata_json=json.dumps({
+            "filter": filters.model_dump(exclude_none=True),
+            "changes": changes.model_dump(mode="json", exclude_none=True),
+            "affected": affected
+        })
+    )
+    db.add(audit_log)
+    return affected, version
@@ -0,0 +1,313 @@
+"""
+Server-side cart sessions
+
+Registers build a cart on the server one scan at a time instead of
+re-posting the whole cart for validation. Each mutation checks only the
+line it touches and adjusts the running subtotal, taxable subtotal and
+tax in O(1); totals are kept in integer cents so repeated adds and
+removes never drift. Carts live in a bounded in-memory LRU store with a
+TTL, per worker process. Each line reserves its units (see
+app.services.reservations) so other carts cannot sell them meanwhile.
+"""
+from collections import OrderedDict
+from dataclasses import dataclass, field
+import threading
+import time
+from typing import Dict, List, Optional
+import uuid
+
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import Product
+from app.money import from_cents, to_cents
+from app.schemas import (
+    CartSessionLine, CartSessionResponse, OrderCreate, OrderItemCreate, ProductResponse
+)
+from app.services.product_cache import product_cache
+from app.services.reservations import reservations
+from app.services.tax import sum_tax_cents, tax_engine
+
+
+@dataclass
+class _Line:
+    product_id: int
+    name: str
+    qty: int
+    unit_price_cents: int
+    taxable: bool
+    tax_rate: float
+
+    @property
+    def total_cents(self) -> int:
+        return self.unit_price_cents * self.qty
+
+
+@dataclass
+class CartSession:
+    """A cart with running totals"""
+    id: str
+    user_id: int
+    lines: Dict[int, _Line] = field(default_factory=dict)
+    subtotal_cents: int = 0
+    # Taxable subtotal per tax rate
+    taxable_cents: Dict[float, int] = field(default_factory=dict)
+    expires_at: float = 0.0
+
+    @property
+    def tax_cents(self) -> int:
+        return sum_tax_cents(self.taxable_cents)
+
+    def _apply(self, line: _Line, sign: int) -> None:
+        self.subtotal_cents += sign * line.total_cents
+        if line.tax_rate:
+            cents = self.taxable_cents.get(line.tax_rate, 0) + sign * line.total_cents
+            if cents:
+                self.taxable_cents[line.tax_rate] = cents
+            else:
+                self.taxable_cents.pop(line.tax_rate, None)
+
+    def set_line(self, product: ProductResponse, qty: int) -> None:
+        """Replace a product's line, keeping the totals current"""
+        self.remove_line(product.id)
+        line = _Line(
+            product_id=product.id,
+            name=product.name,
+            qty=qty,
+            unit_price_cents=to_cents(product.price),
+            taxable=product.taxable,
+            tax_rate=tax_engine.table().rate_for(product.category, product.taxable)
+        )
+        self.lines[product.id] = line
+        self._apply(line, 1)
+
+    def remove_line(self, product_id: int) -> Optional[_Line]:
+        """Drop a product's line, keeping the totals current"""
+        line = self.lines.pop(product_id, None)
+        if line is not None:
+            self._apply(line, -1)
+        return line
+
+    def to_response(self) -> CartSessionResponse:
+        """Render the cart for the API"""
+        tax_cents = self.tax_cents
+        return CartSessionResponse(
+            id=self.id,
+            items=[
+                CartSessionLine(
+                    product_id=line.product_id,
+                    name=line.name,
+                    qty=line.qty,
+                    unit_price=from_cents(line.unit_price_cents),
+                    taxable=line.taxable,
+                    line_total=from_cents(line.total_cents)
+                )
+                for line in self.lines.values()
+            ],
+            totals={
+                "subtotal": from_cents(self.subtotal_cents),
+                "tax": from_cents(tax_cents),
+                "total": from_cents(self.subtotal_cents + tax_cents)
+            }
+        )
+
+    def to_order(self, order_data: OrderCreate) -> OrderCreate:
+        """
+        Fill an order's lines and totals from the cart
+
+        Totals the client sent along must match the cart's running totals.
+
+        Args:
+            order_data: Order referencing this cart
+
+        Returns:
+            Order with the cart's lines, prices and totals
+
+        Raises:
+            HTTPException: If the cart is empty or the order's totals
+                differ from the cart's
+        """
+        if not self.lines:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Cart is empty"
+            )
+        tax_cents = self.tax_cents
+        totals = {
+            "subtotal": self.subtotal_cents,
+            "discount_total": 0,
+            "tax_total": tax_cents,
+            "total": self.subtotal_cents + tax_cents
+        }
+        for name, cents in totals.items():
+            sent = getattr(order_data, name)
+            if sent is not None and to_cents(sent) != cents:
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail=f"Order {name} {sent} does not match the cart ({from_cents(cents)})"
+                )
+
+        items: List[OrderItemCreate] = [
+            OrderItemCreate(
+                product_id=line.product_id,
+                qty=line.qty,
+                unit_price=from_cents(line.unit_price_cents)
+            )
+            for line in self.lines.values()
+        ]
+        return order_data.model_copy(update={
+            "items": items, **{name: from_cents(cents) for name, cents in totals.items()}
+        })
+
+
+class CartStore:
+    """
+    Bounded LRU store of cart sessions with TTL expiry
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._carts: "OrderedDict[str, CartSession]" = OrderedDict()
+
+    def create(self, user_id: int) -> CartSession:
+        """
+        Start an empty cart
+
+        Args:
+            user_id: Owning user ID
+
+        Returns:
+            New cart
+        """
+        cart = CartSession(id=uuid.uuid4().hex, user_id=user_id)
+        with self._lock:
+            cart.expires_at = time.monotonic() + self.ttl_seconds
+            self._carts[cart.id] = cart
+            while len(self._carts) > self.max_size:
+                evicted, _ = self._carts.popitem(last=False)
+                reservations.release(evicted)
+        return cart
+
+    def get(self, cart_id: str, user_id: int) -> CartSession:
+        """
+        Get a live cart and extend its TTL and its reservations
+
+        Args:
+            cart_id: Cart ID
+            user_id: Requesting user ID (carts are private to their owner)
+
+        Returns:
+            Cart
+
+        Raises:
+            HTTPException: If the cart does not exist, expired or belongs
+                to another user
+        """
+        now = time.monotonic()
+        with self._lock:
+            cart = self._carts.get(cart_id)
+            if cart is not None and cart.expires_at <= now:
+                del self._carts[cart_id]
+                reservations.release(cart_id)
+                cart = None
+            if cart is None or cart.user_id != user_id:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Cart not found"
+                )
+            cart.expires_at = now + self.ttl_seconds
+            self._carts.move_to_end(cart_id)
+            reservations.renew(cart_id)
+            return cart
+
+    def set_qty(self, db: Session, cart: CartSession, product_id: int, qty: int) -> CartSession:
+        """
+        Set a product's quantity in a cart (0 removes the line)
+
+        Only the changed line is validated: the product must exist and
+        have enough stock not reserved by other carts. The check and the
+        cart's reservation of the new quantity are one atomic step.
+
+        Args:
+            db: Database session
+            cart: Cart to change
+            product_id: Product ID
+            qty: New quantity
+
+        Returns:
+            Updated cart
+
+        Raises:
+            HTTPException: If the product is not found or has insufficient stock
+        """
+        if qty <= 0:
+            with self._lock:
+                cart.remove_line(product_id)
+            reservations.hold(cart.id, product_id, 0)
+            return cart
+
+        product = product_cache.get(db, product_id)
+        if product is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Product {product_id} not found"
+            )
+        on_hand = db.query(Product.on_hand).filter(Product.id == product_id).scalar() or 0
+        available = reservations.try_hold(cart.id, product_id, qty, on_hand)
+        if available < qty:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"{product.name}: Insufficient stock. Available: {available}, Requested: {qty}"
+            )
+
+        with self._lock:
+            cart.set_line(product, qty)
+        return cart
+
+    def add(self, db: Session, cart: CartSession, product_id: int, qty: int) -> CartSession:
+        """
+        Add units of a product to a cart
+
+        Args:
+            db: Database session
+            cart: Cart to change
+            product_id: Product ID
+            qty: Units to add
+
+        Returns:
+            Updated cart
+
+        Raises:
+            HTTPException: If the product is not found or has insufficient stock
+        """
+        line = cart.lines.get(product_id)
+        return self.set_qty(db, cart, product_id, (line.qty if line else 0) + qty)
+
+    def delete(self, cart_id: str) -> None:
+        """
+        Drop a cart and its reservations (after checkout or when abandoned)
+
+        Args:
+            cart_id: Cart ID
+        """
+        with self._lock:
+            self._carts.pop(cart_id, None)
+        reservations.release(cart_id)
+
+    def clear(self) -> None:
+        """Drop every cart"""
+        with self._lock:
+            self._carts.clear()
+
+    def __len__(self) -> int:
+        return len(self._carts)
+
+
+# Shared cart store for the application process
+cart_store = CartStore(
+    max_size=settings.cart_session_max_entries,
+    ttl_seconds=settings.cart_session_ttl_seconds
+)
@@ -0,0 +1,184 @@
+"""
+Catalog versioning and sync services
+
+Every change to a product's catalog fields stamps the product with the next
+value of a single catalog version counter. POS terminals download a full
+snapshot once and then poll for products changed since the version they
+hold. Stock levels (on_hand) are not versioned; they change with every sale
+and are always checked server-side at checkout.
+"""
+import gzip
+import json
+import threading
+from typing import List, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import event, insert, tuple_, update
+from sqlalchemy.orm import Session
+
+from app.models import CatalogState, Product
+from app.schemas import CatalogProductResponse
+
+# Primary key of the single counter row
+CATALOG_STATE_ID = 1
+
+# Allowed product categories
+ALLOWED_CATEGORIES = [
+    "Birthday",
+    "Anniversary",
+    "Holiday",
+    "Sympathy",
+    "Blank",
+    "Humor",
+    "Kids",
+    "Thank You"
+]
+
+
+def next_catalog_version(db: Session) -> int:
+    """
+    Allocate the next catalog version inside the current transaction
+
+    The counter row stays locked until the transaction ends, so versions
+    become visible in the order they were allocated.
+
+    Args:
+        db: Database session
+
+    Returns:
+        New catalog version
+    """
+    result = db.execute(
+        update(CatalogState)
+        .where(CatalogState.id == CATALOG_STATE_ID)
+        .values(version=CatalogState.version + 1)
+    )
+    if result.rowcount == 0:
+        # Counter row is seeded with the table; recreate it if removed
+        db.add(CatalogState(id=CATALOG_STATE_ID, version=1))
+        db.flush()
+        return 1
+
+    return db.query(CatalogState.version).filter(CatalogState.id == CATALOG_STATE_ID).scalar()
+
+
+def get_catalog_version(db: Session) -> int:
+    """
+    Get the current catalog version
+
+    Args:
+        db: Database session
+
+    Returns:
+        Current catalog version (0 if the catalog was never changed)
+    """
+    version = db.query(CatalogState.version).filter(CatalogState.id == CATALOG_STATE_ID).scalar()
+    return version or 0
+
+
+def stamp_product(db: Session, product: Product) -> int:
+    """
+    Mark a product as changed in a new catalog version
+
+    Args:
+        db: Database session
+        product: Product being created or changed
+
+    Returns:
+        Version the product was stamped with
+    """
+    product.catalog_version = next_catalog_version(db)
+    return product.catalog_version
+
+
+def get_changes_since(
+    db: Session,
+    since: int,
+    after_id: int,
+    limit: int
+) -> Tuple[List[Product], bool]:
+    """
+    Products changed after a catalog version, oldest change first
+
+    Versions commit in allocation order, so a client that has read every
+    change up to a version never misses a later one. A single version can
+    span many products (bulk changes), so pages resume from
+    (version, product ID).
+
+    Args:
+        db: Database session
+        since: Catalog version the client already holds
+        after_id: Last product ID already read within a partially read
+            version `since` (0 when the client holds all of it)
+        limit: Maximum number of products to return
+
+    Returns:
+        Changed products and whether more changes remain
+    """
+    if after_id:
+        condition = tuple_(Product.catalog_version, Product.id) > tuple_(since, after_id)
+    else:
+        condition = Product.catalog_version > since
+
+    products = db.query(Product).filter(condition).order_by(
+        Product.catalog_version, Product.id
+    ).limit(limit + 1).all()
+    return products[:limit], len(products) > limit
+
+
+class SnapshotCache:
+    """
+    Gzipped catalog snapshots, rebuilt only when the catalog version moves
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._key: Optional[Tuple[str, int]] = None
+        self._body: bytes = b""
+
+    def get(self, db: Session) -> Tuple[int, bytes]:
+        """
+        Get the compressed snapshot for the current catalog version
+
+        Args:
+            db: Database session
+
+        Returns:
+            Snapshot version and gzipped JSON body
+        """
+        database = str(db.get_bind().url)
+        current = get_catalog_version(db)
+        with self._lock:
+            if self._key == (database, current):
+                return current, self._body
+
+        products = db.query(Product).order_by(Product.id).all()
+        # Version the rows actually read, in case a change landed in between
+        version = max((p.catalog_version for p in products), default=0)
+        payload = {
+            "version": version,
+            "products": [CatalogProductResponse.model_validate(p) for p in products],
+        }
+        body = gzip.compress(
+            json.dumps(jsonable_encoder(payload), separators=(",", ":")).encode()
+        )
+
+        with self._lock:
+            self._key = (database, version)
+            self._body = body
+        return version, body
+
+    def clear(self) -> None:
+        """Drop the cached snapshot"""
+        with self._lock:
+            self._key = None
+            self._body = b""
+
+
+# Shared snapshot cache for the application process
+snapshot_cache = SnapshotCache()
+
+
+@event.listens_for(CatalogState.__table__, "after_create")
+def _seed_catalog_state(target, connection, **kw):
+    connection.execute(insert(target).values(id=CATALOG_STATE_ID, version=0))
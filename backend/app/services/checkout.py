@@ -0,0 +1,355 @@
+"""
+Checkout services
+
+Writes an order with a fixed number of statements regardless of basket
+size. Order items and inventory movements are written with batched
+inserts, and the receipt is rendered into the order row as it is inserted
+(product names come from the product cache). Stock is then taken in one
+of two ways (settings.inventory_mode):
+
+- atomic: one batched conditional UPDATE decrements every product in id
+  order and fails if any of them is short; nothing is read beforehand.
+- locking: one IN query locks every product in id order (so concurrent
+  checkouts cannot deadlock), stock is validated in memory and the new
+  levels are written back in one batched UPDATE.
+
+Either way, units reserved by other carts stay in stock; an order placed
+from a cart may use the units that cart reserved.
+"""
+import json
+from dataclasses import dataclass
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Union
+
+from fastapi import HTTPException, status
+from sqlalchemy import insert, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.database import begin_transaction
+from app.models import (
+    InventoryMovement, InventoryMovementType, Order, OrderItem, Product
+)
+from app.money import from_cents, to_cents
+from app.schemas import OrderCreate, OrderItemCreate
+from app.services.inventory import decrement_stock, expire_stock, use_atomic_updates
+from app.services.product_cache import product_cache
+from app.services.receipts import render_receipt
+from app.services.reservations import reservations
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StockLevel:
+    """Locked product stock, updated in memory as sales are applied"""
+    id: int
+    name: str
+    on_hand: int
+
+
+def basket_quantities(items: Iterable[OrderItemCreate]) -> Dict[int, int]:
+    """
+    Total quantity per product, combining repeated lines
+
+    Args:
+        items: Order lines
+
+    Returns:
+        Mapping of product ID to quantity
+    """
+    quantities: Dict[int, int] = {}
+    for item in items:
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.qty
+    return quantities
+
+
+def lock_stock(db: Session, product_ids: Iterable[int]) -> Dict[int, StockLevel]:
+    """
+    Load and lock stock levels for a set of products with one query
+
+    Rows are locked in ascending id order so checkouts touching the same
+    products always acquire locks in the same order.
+
+    Args:
+        db: Database session
+        product_ids: Product IDs
+
+    Returns:
+        Mapping of product ID to stock level (missing products are absent)
+    """
+    ids = sorted(set(product_ids))
+    if not ids:
+        return {}
+    rows = db.query(Product.id, Product.name, Product.on_hand).filter(
+        Product.id.in_(ids)
+    ).order_by(Product.id).with_for_update().all()
+    return {row.id: StockLevel(id=row.id, name=row.name, on_hand=row.on_hand) for row in rows}
+
+
+def check_stock(
+    quantities: Dict[int, int],
+    stock: Dict[int, StockLevel],
+    held: Optional[Dict[int, int]] = None
+) -> None:
+    """
+    Verify every product exists and has enough stock
+
+    Args:
+        quantities: Quantity per product
+        stock: Locked stock levels
+        held: Units per product reserved by other carts
+
+    Raises:
+        HTTPException: If a product is not found or has insufficient inventory
+    """
+    held = held or {}
+    for product_id, qty in quantities.items():
+        level = stock.get(product_id)
+        if level is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Product {product_id} not found"
+            )
+        available = level.on_hand - held.get(product_id, 0)
+        if available < qty:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Insufficient inventory for {level.name}. Available: {available}, Requested: {qty}"
+            )
+
+
+def write_stock(db: Session, stock: Dict[int, StockLevel], product_ids: Iterable[int]) -> None:
+    """
+    Persist in-memory stock levels for the given products
+
+    Args:
+        db: Database session
+        stock: Locked stock levels
+        product_ids: Products whose stock changed
+    """
+    ids = sorted(set(product_ids))
+    if not ids:
+        return
+    db.execute(update(Product), [{"id": pid, "on_hand": stock[pid].on_hand} for pid in ids])
+    expire_stock(db, ids)
+
+
+def add_order(
+    db: Session,
+    order_data: OrderCreate,
+    order_number: str,
+    cashier_id: int,
+    cashier_email: str,
+    stock: Optional[Dict[int, StockLevel]] = None
+) -> Order:
+    """
+    Write an order, its items and inventory movements
+
+    When locked stock levels are given they are checked and decremented
+    in memory; call write_stock once all orders sharing them have been
+    added. Without them the caller must take stock itself.
+
+    Args:
+        db: Database session
+        order_data: Order creation data
+        order_number: Allocated order number
+        cashier_id: Cashier user ID
+        cashier_email: Cashier shown on the receipt
+        stock: Locked stock levels for every product in the order
+
+    Returns:
+        Flushed order
+
+    Raises:
+        HTTPException: If the order has no items, or a product is not found
+            or has insufficient inventory
+    """
+    if not order_data.items:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Order has no items"
+        )
+
+    quantities = basket_quantities(order_data.items)
+    if stock is not None:
+        check_stock(quantities, stock, reservations.reserved_many(quantities, exclude=order_data.cart_id))
+
+    products = product_cache.get_many(db, quantities)
+    for product_id in quantities:
+        if product_id not in products:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Product {product_id} not found"
+            )
+
+    items: List[dict] = []
+    receipt_items: List[dict] = []
+    movements: List[dict] = []
+    reason = f"Sale - Order {order_number}"
+    for item in order_data.items:
+        unit_price_cents = to_cents(item.unit_price)
+        discount_cents = to_cents(item.discount)
+        line_total_cents = unit_price_cents * item.qty - discount_cents
+        items.append({
+            "product_id": item.product_id,
+            "qty": item.qty,
+            "unit_price_cents": unit_price_cents,
+            "discount_cents": discount_cents,
+            "line_total_cents": line_total_cents,
+        })
+        receipt_items.append({
+            "name": products[item.product_id].name,
+            "qty": item.qty,
+            "unit_price": from_cents(unit_price_cents),
+            "discount": from_cents(discount_cents),
+            "line_total": from_cents(line_total_cents),
+        })
+        movements.append({
+            "product_id": item.product_id,
+            "type": InventoryMovementType.SALE,
+            "delta_qty": -item.qty,  # Negative for decrement
+            "reason": reason,
+            "created_by_id": cashier_id,
+        })
+
+    created_at = datetime.utcnow()
+    order = Order(
+        order_number=order_number,
+        created_at=created_at,
+        cashier_id=cashier_id,
+        customer_id=order_data.customer_id,
+        subtotal_cents=to_cents(order_data.subtotal),
+        discount_total_cents=to_cents(order_data.discount_total),
+        tax_total_cents=to_cents(order_data.tax_total),
+        total_cents=to_cents(order_data.total),
+        payment_json=json.dumps(order_data.payment_details) if order_data.payment_details else None
+    )
+    order.receipt_json = render_receipt(
+        order_number=order_number,
+        created_at=created_at,
+        items=receipt_items,
+        subtotal=order.subtotal,
+        discount_total=order.discount_total,
+        tax_total=order.tax_total,
+        total=order.total,
+        payment_details=order_data.payment_details,
+        cashier_email=cashier_email
+    )
+    db.add(order)
+    db.flush()  # Get order ID without committing
+
+    for values in items:
+        values["order_id"] = order.id
+    db.execute(insert(OrderItem), items)
+    db.execute(insert(InventoryMovement), movements)
+
+    if stock is not None:
+        for product_id, qty in quantities.items():
+            stock[product_id].on_hand -= qty
+
+    return order
+
+
+def checkout(
+    db: Session,
+    order_data: OrderCreate,
+    order_number: str,
+    cashier_id: int,
+    cashier_email: str
+) -> Order:
+    """
+    Write a single order and decrement stock (caller commits)
+
+    Args:
+        db: Database session
+        order_data: Order creation data
+        order_number: Allocated order number
+        cashier_id: Cashier user ID
+        cashier_email: Cashier shown on the receipt
+
+    Returns:
+        Flushed order
+
+    Raises:
+        HTTPException: If a product is not found or has insufficient inventory
+    """
+    quantities = basket_quantities(order_data.items)
+    if use_atomic_updates():
+        order = add_order(db, order_data, order_number, cashier_id, cashier_email)
+        decrement_stock(
+            db, quantities, held=reservations.reserved_many(quantities, exclude=order_data.cart_id)
+        )
+        return order
+
+    stock = lock_stock(db, quantities)
+    order = add_order(db, order_data, order_number, cashier_id, cashier_email, stock)
+    write_stock(db, stock, quantities)
+    return order
+
+
+def checkout_batch(
+    db: Session,
+    orders: Sequence[OrderCreate],
+    order_numbers: Sequence[str],
+    cashier_id: int,
+    cashier_email: str
+) -> List[Union[int, HTTPException]]:
+    """
+    Write several orders, each succeeding or failing on its own (caller commits)
+
+    Each order runs in its own SAVEPOINT inside one transaction, so the
+    caller's rollback still undoes the whole batch. An order rejected by
+    the database (e.g. a constraint violation) fails on its own with a 500. In locking mode every product in
+    the batch is locked once, up front, and stock is tracked in memory
+    across orders.
+
+    Args:
+        db: Database session
+        orders: Orders to write
+        order_numbers: Allocated order number per order
+        cashier_id: Cashier user ID
+        cashier_email: Cashier shown on the receipts
+
+    Returns:
+        Per order, the new order ID or the HTTPException that rejected it
+    """
+    begin_transaction(db)
+    stock: Optional[Dict[int, StockLevel]] = None
+    if not use_atomic_updates():
+        stock = lock_stock(
+            db, {item.product_id for order_data in orders for item in order_data.items}
+        )
+
+    outcomes: List[Union[int, HTTPException]] = []
+    for order_data, order_number in zip(orders, order_numbers):
+        quantities = basket_quantities(order_data.items)
+        # Stock levels to restore if the database rejects the order
+        levels = {pid: stock[pid].on_hand for pid in quantities if pid in stock} if stock else {}
+        savepoint = db.begin_nested()
+        try:
+            order = add_order(db, order_data, order_number, cashier_id, cashier_email, stock)
+            if stock is None:
+                decrement_stock(
+                    db, quantities,
+                    held=reservations.reserved_many(quantities, exclude=order_data.cart_id)
+                )
+            else:
+                write_stock(db, stock, quantities)
+            savepoint.commit()
+        except (HTTPException, SQLAlchemyError) as e:
+            # Also closes a savepoint a failed flush has already deactivated
+            savepoint.rollback()
+            for pid, on_hand in levels.items():
+                stock[pid].on_hand = on_hand
+            if isinstance(e, SQLAlchemyError):
+                logger.error(f"Batch order {order_number} failed: {e}")
+                e = HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail=f"Failed to create order: {e}"
+                )
+            outcomes.append(e)
+            continue
+        outcomes.append(order.id)
+    return outcomes
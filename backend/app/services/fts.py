@@ -0,0 +1,183 @@
+"""
+SQLite FTS5 full-text search over the product catalog
+
+An external-content FTS5 table mirrors products.name, description, sku and
+category. Triggers keep it current for every write, including bulk SQL
+updates that bypass the ORM.
+"""
+import logging
+from typing import Dict, Optional
+
+from sqlalchemy import column, event, func, literal_column, table, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Query, Session
+
+from app.models import Product
+from app.services.search_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = "products_fts"
+
+# Lightweight handle for joining against the virtual table
+products_fts = table(FTS_TABLE, column("rowid"))
+
+# Column weights for bm25(): name, description, sku, category
+BM25_WEIGHTS = (10.0, 1.0, 5.0, 2.0)
+
+FTS_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name, description, sku, category,
+        content='products', content_rowid='id'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, description, sku, category)
+        VALUES (new.id, new.name, new.description, new.sku, new.category);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description, sku, category)
+        VALUES ('delete', old.id, old.name, old.description, old.sku, old.category);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS products_fts_au
+    AFTER UPDATE OF name, description, sku, category ON products BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description, sku, category)
+        VALUES ('delete', old.id, old.name, old.description, old.sku, old.category);
+        INSERT INTO {FTS_TABLE}(rowid, name, description, sku, category)
+        VALUES (new.id, new.name, new.description, new.sku, new.category);
+    END
+    """,
+]
+
+# FTS availability per database URL
+_available: Dict[str, bool] = {}
+
+
+def create_fts_objects(connection: Connection) -> bool:
+    """
+    Create the FTS table and triggers, and index existing products
+
+    Args:
+        connection: Database connection
+
+    Returns:
+        True if full-text search is available
+    """
+    if connection.dialect.name != "sqlite":
+        return False
+
+    try:
+        for statement in FTS_DDL:
+            connection.exec_driver_sql(statement)
+        connection.exec_driver_sql(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    except OperationalError as e:
+        # SQLite built without FTS5
+        logger.warning(f"Full-text search unavailable: {e}")
+        return False
+    return True
+
+
+def ensure_fts(engine) -> bool:
+    """
+    Create full-text search objects on an existing database if missing
+
+    Args:
+        engine: Database engine
+
+    Returns:
+        True if full-text search is available
+    """
+    if engine.dialect.name != "sqlite":
+        return False
+
+    with engine.begin() as connection:
+        exists = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {"name": FTS_TABLE}
+        ).first()
+        available = bool(exists) or create_fts_objects(connection)
+
+    _available[str(engine.url)] = available
+    return available
+
+
+def fts_available(db: Session) -> bool:
+    """
+    Check whether the session's database has the FTS index
+
+    Args:
+        db: Database session
+
+    Returns:
+        True if full-text search can be used
+    """
+    bind = db.get_bind()
+    key = str(bind.url)
+    if key not in _available:
+        if bind.dialect.name != "sqlite":
+            _available[key] = False
+        else:
+            _available[key] = db.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {"name": FTS_TABLE}
+            ).first() is not None
+    return _available[key]
+
+
+def build_match_expression(query: str) -> Optional[str]:
+    """
+    Turn free text into a safe FTS5 prefix query
+
+    Args:
+        query: User search text
+
+    Returns:
+        MATCH expression, or None if the query has no searchable tokens
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def apply_fts_search(query: Query, search: str) -> Optional[Query]:
+    """
+    Restrict a product query to FTS matches, ordered by BM25 relevance
+
+    Args:
+        query: Product query
+        search: User search text
+
+    Returns:
+        Ranked query, or None if the search text has no searchable tokens
+    """
+    match = build_match_expression(search)
+    if match is None:
+        return None
+
+    fts = literal_column(FTS_TABLE)
+    return query.join(
+        products_fts, products_fts.c.rowid == Product.id
+    ).filter(
+        fts.op("MATCH")(match)
+    ).order_by(
+        func.bm25(fts, *BM25_WEIGHTS)
+    )
+
+
+@event.listens_for(Product.__table__, "after_create")
+def _create_fts_after_products(target, connection, **kw):
+    _available[str(connection.engine.url)] = create_fts_objects(connection)
+
+
+@event.listens_for(Product.__table__, "before_drop")
+def _drop_fts_before_products(target, connection, **kw):
+    if connection.dialect.name == "sqlite":
+        connection.exec_driver_sql(f"DROP TABLE IF EXISTS {FTS_TABLE}")
@@ -0,0 +1,179 @@
+"""
+Typo-tolerant token lookup
+
+SymSpell-style deletion dictionary: every vocabulary token is stored under
+each string obtained by deleting up to MAX_EDIT_DISTANCE characters from it.
+A misspelled query token generates its own deletes, and any token sharing a
+delete is a candidate that is then verified with a real edit distance. Query
+cost depends on the query length, not on the vocabulary size.
+"""
+from itertools import combinations
+from typing import Dict, Set
+
+# Largest edit distance supported by the dictionary
+MAX_EDIT_DISTANCE = 2
+
+# Query tokens shorter than this are only matched exactly
+MIN_FUZZY_LENGTH = 3
+
+# Longest token indexed or searched fuzzily (bounds delete generation)
+MAX_TOKEN_LENGTH = 24
+
+
+def max_distance_for(token: str) -> int:
+    """
+    Allowed edit distance for a query token of this length
+
+    Args:
+        token: Query token
+
+    Returns:
+        Maximum edit distance
+    """
+    if len(token) < MIN_FUZZY_LENGTH:
+        return 0
+    if len(token) <= 4:
+        return 1
+    return MAX_EDIT_DISTANCE
+
+
+def generate_deletes(token: str, max_distance: int) -> Set[str]:
+    """
+    All strings obtained by deleting up to max_distance characters
+
+    Args:
+        token: Source token
+        max_distance: Maximum number of deleted characters
+
+    Returns:
+        Set of delete variants, including the token itself
+    """
+    variants = {token}
+    for distance in range(1, min(max_distance, len(token)) + 1):
+        for positions in combinations(range(len(token)), distance):
+            skip = set(positions)
+            variants.add("".join(ch for i, ch in enumerate(token) if i not in skip))
+    return variants
+
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    """
+    Optimal string alignment distance with an early cutoff
+
+    Args:
+        a: First string
+        b: Second string
+        max_distance: Distances above this are reported as max_distance + 1
+
+    Returns:
+        Edit distance, capped at max_distance + 1
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+
+    previous_previous = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = current[0]
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + cost
+            )
+            # Adjacent transposition
+            if (
+                previous_previous is not None and i > 1 and j > 1
+                and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]
+            ):
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+            row_min = min(row_min, current[j])
+        if row_min > max_distance:
+            return max_distance + 1
+        previous_previous, previous = previous, current
+
+    return min(previous[len(b)], max_distance + 1)
+
+
+class DeletionIndex:
+    """
+    Deletion dictionary over a reference-counted token vocabulary
+
+    Not thread-safe on its own; ProductSearchIndex guards it with its lock.
+    """
+
+    def __init__(self, max_distance: int = MAX_EDIT_DISTANCE):
+        self.max_distance = max_distance
+        self._counts: Dict[str, int] = {}
+        self._deletes: Dict[str, Set[str]] = {}
+
+    def add(self, token: str) -> None:
+        """
+        Add one reference to a token
+
+        Args:
+            token: Vocabulary token
+        """
+        if len(token) > MAX_TOKEN_LENGTH:
+            return
+        count = self._counts.get(token, 0)
+        self._counts[token] = count + 1
+        if count:
+            return
+        for variant in generate_deletes(token, self.max_distance):
+            self._deletes.setdefault(variant, set()).add(token)
+
+    def remove(self, token: str) -> None:
+        """
+        Drop one reference to a token, forgetting it when unused
+
+        Args:
+            token: Vocabulary token
+        """
+        count = self._counts.get(token)
+        if not count:
+            return
+        if count > 1:
+            self._counts[token] = count - 1
+            return
+        del self._counts[token]
+        for variant in generate_deletes(token, self.max_distance):
+            tokens = self._deletes.get(variant)
+            if tokens is None:
+                continue
+            tokens.discard(token)
+            if not tokens:
+                del self._deletes[variant]
+
+    def clear(self) -> None:
+        """Forget every token"""
+        self._counts = {}
+        self._deletes = {}
+
+    def lookup(self, term: str) -> Dict[str, int]:
+        """
+        Find vocabulary tokens within the allowed distance of a term
+
+        Args:
+            term: Query token
+
+        Returns:
+            Mapping of matching token to edit distance
+        """
+        term = term[:MAX_TOKEN_LENGTH]
+        max_distance = min(max_distance_for(term), self.max_distance)
+
+        matches: Dict[str, int] = {}
+        for variant in generate_deletes(term, max_distance):
+            for token in self._deletes.get(variant, ()):
+                if token in matches:
+                    continue
+                distance = edit_distance(term, token, max_distance)
+                if distance <= max_distance:
+                    matches[token] = distance
+        return matches
+
+    def __len__(self) -> int:
+        return len(self._counts)
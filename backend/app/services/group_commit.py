@@ -0,0 +1,281 @@
+"""
+Group-commit write pipeline
+
+On SQLite every writer serializes on the database lock and pays its own
+fsync. When enabled, write jobs are queued to a single writer thread that
+runs several of them in one transaction, each inside its own SAVEPOINT,
+and commits once per batch. A failing job rolls back only its savepoint;
+the others still commit. Each caller blocks on a future until the batch
+holding its job has committed.
+
+Jobs run on the writer's session in another thread: they must not open
+their own connections (allocate order numbers before submitting) and
+should return plain values rather than ORM objects.
+
+A caller that gives up waiting cancels its job if the writer has not
+started it yet. Otherwise the job may still commit, and the caller gets
+CommitPending with the job's future instead of a plain failure.
+"""
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass, field
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from fastapi import HTTPException, status
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class CommitPending(Exception):
+    """
+    A write job timed out after the writer started it and may still commit
+
+    Attributes:
+        future: Resolves once the job's batch has committed or failed
+    """
+
+    def __init__(self, future: Future):
+        super().__init__("Write is still in progress")
+        self.future = future
+
+
+@dataclass
+class _Job:
+    fn: Callable[[Session], Any]
+    future: Future = field(default_factory=Future)
+
+
+def _create_writer_engine(url: str) -> Engine:
+    """
+    Engine for the writer thread
+
+    pysqlite only emits BEGIN before DML, so a SAVEPOINT as the first
+    statement would open (and RELEASE would commit) its own transaction.
+    The writer takes the database lock up front with BEGIN IMMEDIATE
+    instead.
+    """
+    if not url.startswith("sqlite"):
+        return create_engine(url)
+
+    engine = create_engine(url, connect_args={"check_same_thread": False})
+
+    @event.listens_for(engine, "connect")
+    def _disable_implicit_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _begin_immediate(connection):
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+    return engine
+
+
+class GroupCommitWriter:
+    """
+    Single writer thread that commits queued jobs in batches
+    """
+
+    def __init__(self, url: str, max_batch: int, max_wait_ms: float, timeout: float):
+        self.url = url
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.timeout = timeout
+        self._engine = _create_writer_engine(url)
+        self._session_factory = sessionmaker(autocommit=False, autoflush=False, bind=self._engine)
+        self._queue: "queue.Queue[Optional[_Job]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._batches = 0
+        self._jobs = 0
+
+    def start(self) -> None:
+        """Start the writer thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="group-commit-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Finish queued jobs and stop the writer thread"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        self._engine.dispose()
+
+    def handles(self, db: Session) -> bool:
+        """
+        Check whether this writer serves the session's database
+
+        Args:
+            db: Request database session
+
+        Returns:
+            True if jobs for this session can be queued here
+        """
+        return self._thread is not None and str(db.get_bind().url) == self.url
+
+    def submit(self, fn: Callable[[Session], T]) -> T:
+        """
+        Queue a write job and wait for its batch to commit
+
+        Args:
+            fn: Job taking the writer's session; must not commit
+
+        Returns:
+            The job's return value
+
+        Raises:
+            HTTPException: If the job timed out before the writer started it
+                (it was cancelled and will not run)
+            CommitPending: If the job timed out while running; it may
+                still commit
+            Exception: Whatever the job raised, or the commit error
+        """
+        job = _Job(fn=fn)
+        self._queue.put(job)
+        try:
+            return job.future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            if job.future.cancel():
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Write queue is busy, please retry"
+                )
+            raise CommitPending(job.future)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Writer statistics
+
+        Returns:
+            Committed batches and jobs
+        """
+        return {"batches": self._batches, "jobs": self._jobs}
+
+    def _next_batch(self) -> Tuple[List[_Job], bool]:
+        first = self._queue.get()
+        if first is None:
+            return [], True
+
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                job = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is None:
+                return batch, True
+            batch.append(job)
+        return batch, False
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch, stopping = self._next_batch()
+            if batch:
+                self._apply(batch)
+
+    def _apply(self, batch: List[_Job]) -> None:
+        db = self._session_factory()
+        completed: List[Tuple[Future, Any]] = []
+        try:
+            for job in batch:
+                if not job.future.set_running_or_notify_cancel():
+                    continue
+                savepoint = db.begin_nested()
+                try:
+                    result = job.fn(db)
+                    savepoint.commit()
+                except Exception as e:
+                    if savepoint.is_active:
+                        savepoint.rollback()
+                    job.future.set_exception(e)
+                    continue
+                completed.append((job.future, result))
+
+            db.commit()
+        except Exception as e:
+            logger.error(f"Group commit failed: {e}")
+            db.rollback()
+            for future, _ in completed:
+                future.set_exception(e)
+            return
+        finally:
+            db.close()
+
+        self._batches += 1
+        self._jobs += len(completed)
+        for future, result in completed:
+            future.set_result(result)
+
+
+# Shared writer for the application process (None when disabled)
+group_writer: Optional[GroupCommitWriter] = None
+
+
+def start_group_writer(url: str) -> GroupCommitWriter:
+    """
+    Start the shared writer for a database
+
+    Args:
+        url: Database URL
+
+    Returns:
+        Running writer
+    """
+    global group_writer
+    stop_group_writer()
+    group_writer = GroupCommitWriter(
+        url,
+        max_batch=settings.group_commit_max_batch,
+        max_wait_ms=settings.group_commit_max_wait_ms,
+        timeout=settings.group_commit_timeout_seconds
+    )
+    group_writer.start()
+    return group_writer
+
+
+def stop_group_writer() -> None:
+    """Stop the shared writer, if running"""
+    global group_writer
+    if group_writer is not None:
+        group_writer.stop()
+        group_writer = None
+
+
+def run_transaction(db: Session, fn: Callable[[Session], T]) -> T:
+    """
+    Run a write job and commit it
+
+    Goes through the shared group-commit writer when it serves this
+    database, otherwise runs on the request session.
+
+    Args:
+        db: Request database session
+        fn: Job taking a session; must not commit
+
+    Returns:
+        The job's return value
+    """
+    writer = group_writer
+    if writer is not None and writer.handles(db):
+        return writer.submit(fn)
+
+    try:
+        result = fn(db)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return result
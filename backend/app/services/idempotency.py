@@ -0,0 +1,243 @@
+"""
+Idempotent request handling
+
+Clients send an Idempotency-Key header with writes they may retry. The
+first request with a key claims it; once it succeeds, its response is
+stored and every retry with the same key gets the stored response back
+without touching the database. Failed requests release their key so a
+retry runs again. Keys are scoped per user and endpoint, and reusing a
+key with a different payload is rejected.
+
+A request that gave up waiting on a write which may still commit leaves
+its key in progress until the write ends. The key is then released if
+the write failed, or completed with a response built from its result,
+so a retry can neither apply the write twice nor wait forever.
+
+The store lives in process memory, like the product cache: with several
+workers, a retry routed to a different worker is not deduplicated.
+"""
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass
+import hashlib
+import threading
+import time
+from typing import Any, Callable, Optional, Tuple
+
+from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from app.config import settings
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+
+# Set on responses replayed from the store
+IDEMPOTENT_REPLAY_HEADER = "Idempotent-Replayed"
+
+# Longest accepted key
+MAX_KEY_LENGTH = 255
+
+StoreKey = Tuple[str, int, str]
+
+
+@dataclass
+class _Entry:
+    fingerprint: str
+    expires_at: float
+    status_code: Optional[int] = None  # None while the first request runs
+    body: Any = None
+
+
+def fingerprint(payload: BaseModel) -> str:
+    """
+    Hash a request payload
+
+    Args:
+        payload: Validated request body
+
+    Returns:
+        Hex digest of the payload's JSON form
+    """
+    return hashlib.sha256(payload.model_dump_json().encode()).hexdigest()
+
+
+class IdempotencyClaim:
+    """
+    A request's hold on an idempotency key
+
+    Use as a context manager around the write: the key is released if the
+    block raises or finishes without save() being called.
+    """
+
+    def __init__(self, store: "IdempotencyStore", key: Optional[StoreKey], replay: Optional[JSONResponse] = None):
+        self._store = store
+        self._key = key
+        self._saved = False
+        self.replay = replay
+
+    def save(self, status_code: int, body: Any) -> None:
+        """
+        Store the successful response for retries
+
+        Args:
+            status_code: Response status code
+            body: Response body (model or JSON-compatible data)
+        """
+        if self._key is not None:
+            self._store._complete(self._key, status_code, jsonable_encoder(body))
+        self._saved = True
+
+    def defer(self, future: Future, status_code: int, on_commit: Callable[[Any], Any]) -> None:
+        """
+        Keep the key claimed until a write that outlived the request ends
+
+        Retries get 409 while the write runs. If it fails the key is
+        released; if it commits, the response built by on_commit is stored
+        for retries.
+
+        Args:
+            future: Future of the pending write
+            status_code: Status code to store once the write commits
+            on_commit: Called with the write's result once it commits
+                (on the writer thread, so without database access);
+                returns the response body
+        """
+        key = self._key
+        self._saved = True  # The write's outcome settles the key, not __exit__
+
+        def settle(done: Future) -> None:
+            if done.exception() is not None:
+                if key is not None:
+                    self._store._release(key)
+                return
+            body = on_commit(done.result())
+            if key is not None:
+                self._store._complete(key, status_code, body)
+
+        future.add_done_callback(settle)
+
+    def __enter__(self) -> "IdempotencyClaim":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if self._key is not None and not self._saved:
+            self._store._release(self._key)
+
+
+class IdempotencyStore:
+    """
+    Bounded TTL store of responses keyed by idempotency key
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[StoreKey, _Entry]" = OrderedDict()
+
+    def claim(
+        self,
+        scope: str,
+        user_id: int,
+        key: Optional[str],
+        payload: BaseModel
+    ) -> IdempotencyClaim:
+        """
+        Claim an idempotency key for a request
+
+        Args:
+            scope: Endpoint name
+            user_id: Requesting user ID
+            key: Idempotency-Key header value (None disables idempotency)
+            payload: Validated request body
+
+        Returns:
+            Claim; its `replay` is the stored response when the key was
+            already completed
+
+        Raises:
+            HTTPException: If the key is invalid, reused with a different
+                payload, or still in use by another request
+        """
+        if key is None:
+            return IdempotencyClaim(self, None)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"{IDEMPOTENCY_HEADER} must be 1-{MAX_KEY_LENGTH} characters"
+            )
+
+        store_key = (scope, user_id, key)
+        digest = fingerprint(payload)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(store_key)
+            if entry is not None and entry.expires_at <= now:
+                del self._entries[store_key]
+                entry = None
+
+            if entry is None:
+                self._entries[store_key] = _Entry(fingerprint=digest, expires_at=now + self.ttl_seconds)
+                self._evict()
+                return IdempotencyClaim(self, store_key)
+
+            if entry.fingerprint != digest:
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail=f"{IDEMPOTENCY_HEADER} was already used with a different request"
+                )
+            if entry.status_code is None:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="A request with this idempotency key is still in progress"
+                )
+            status_code, body = entry.status_code, entry.body
+
+        return IdempotencyClaim(self, None, replay=JSONResponse(
+            status_code=status_code,
+            content=body,
+            headers={IDEMPOTENT_REPLAY_HEADER: "true"}
+        ))
+
+    def _complete(self, key: StoreKey, status_code: int, body: Any) -> None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.status_code = status_code
+                entry.body = body
+                entry.expires_at = time.monotonic() + self.ttl_seconds
+
+    def _release(self, key: StoreKey) -> None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.status_code is None:
+                del self._entries[key]
+
+    def _evict(self) -> None:
+        # Oldest claims go first; in-flight claims are kept
+        excess = len(self._entries) - self.max_size
+        if excess <= 0:
+            return
+        for key in list(self._entries):
+            if excess <= 0:
+                break
+            if self._entries[key].status_code is not None:
+                del self._entries[key]
+                excess -= 1
+
+    def clear(self) -> None:
+        """Forget every key"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Shared store for the application process
+idempotency_store = IdempotencyStore(
+    max_size=settings.idempotency_max_entries,
+    ttl_seconds=settings.idempotency_ttl_seconds
+)
@@ -1,10 +1,171 @@
 """
 Inventory management services
+
+Stock changes run in one of two modes (settings.inventory_mode):
+
+- atomic: a conditional UPDATE adjusts on_hand in the database and its
+  row count tells whether there was enough stock. No read is needed and
+  two registers can never sell the same last unit, on SQLite as well as
+  Postgres.
+- locking: the product row is read with SELECT ... FOR UPDATE and updated
+  in Python. SQLite ignores FOR UPDATE, so this mode is only safe on
+  databases with row locks.
 """
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import Integer, bindparam, update
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.util import identity_key
 from fastapi import HTTPException, status
 
+from app.config import settings
 from app.models import Product, InventoryMovement, InventoryMovementType
+from app.services.product_cache import invalidate_product
+
+INVENTORY_MODE_ATOMIC = "atomic"
+INVENTORY_MODE_LOCKING = "locking"
+
+
+def use_atomic_updates() -> bool:
+    """
+    Check whether stock changes use conditional UPDATEs
+
+    Returns:
+        True unless the inventory mode is "locking"
+    """
+    return settings.inventory_mode != INVENTORY_MODE_LOCKING
+
+
+def expire_stock(db: Session, product_ids: Iterable[int]) -> None:
+    """
+    Forget on_hand values changed behind the ORM's back
+
+    Expires on_hand on products already loaded in the session and
+    invalidates their cache entries.
+
+    Args:
+        db: Database session
+        product_ids: Products whose stock changed
+    """
+    for product_id in product_ids:
+        product = db.identity_map.get(identity_key(Product, product_id))
+        if product is not None:
+            db.expire(product, ["on_hand"])
+        invalidate_product(db, product_id)
+
+
+def _stock_error(db: Session, product_id: int, qty: int, held: int = 0) -> HTTPException:
+    product = db.query(Product.name, Product.on_hand).filter(Product.id == product_id).first()
+    if product is None:
+        return HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Product {product_id} not found"
+        )
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=f"Insufficient inventory for {product.name}. Available: {product.on_hand - held}, Requested: {qty}"
+    )
+
+
+def decrement_stock(
+    db: Session,
+    quantities: Dict[int, int],
+    allow_negative: bool = False,
+    held: Optional[Dict[int, int]] = None
+) -> None:
+    """
+    Decrement stock for several products with conditional UPDATEs
+
+    Products are updated in ascending id order with one batched statement.
+    If any product is missing or short, nothing is decremented and the
+    first offending product is reported; the caller should roll back.
+    Call this after the transaction has written something: on SQLite the
+    batch runs in a SAVEPOINT, which would otherwise start its own
+    transaction.
+
+    Args:
+        db: Database session
+        quantities: Quantity to remove per product ID
+        allow_negative: Allow negative inventory (admin override)
+        held: Units per product reserved by other carts, which must stay
+            in stock
+
+    Raises:
+        HTTPException: If a product is not found or has insufficient inventory
+    """
+    ids = sorted(quantities)
+    if not ids:
+        return
+    held = held or {}
+
+    table = Product.__table__
+    qty = bindparam("_qty", type_=Integer)
+    statement = update(table).where(table.c.id == bindparam("_id"))
+    if not allow_negative:
+        statement = statement.where(table.c.on_hand >= qty + bindparam("_held", type_=Integer))
+    statement = statement.values(on_hand=table.c.on_hand - qty)
+    params = [{"_id": pid, "_qty": quantities[pid], "_held": held.get(pid, 0)} for pid in ids]
+
+    if len(params) == 1 or not db.get_bind().dialect.supports_sane_multi_rowcount:
+        # One statement per product; the first that matches no row is unchanged
+        for row in params:
+            if db.execute(statement, row).rowcount == 0:
+                raise _stock_error(db, row["_id"], row["_qty"], row["_held"])
+    else:
+        savepoint = db.begin_nested()
+        if db.execute(statement, params).rowcount != len(params):
+            # Undo the partial batch so the error reports unchanged stock
+            savepoint.rollback()
+            for pid in ids:
+                row = db.query(Product.on_hand).filter(Product.id == pid).first()
+                if row is None or (
+                    not allow_negative and row.on_hand - held.get(pid, 0) < quantities[pid]
+                ):
+                    raise _stock_error(db, pid, quantities[pid], held.get(pid, 0))
+            # Stock was restored by another transaction in between
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Inventory changed during update, please retry"
+            )
+        savepoint.commit()
+
+    expire_stock(db, ids)
+
+
+def increment_stock(db: Session, quantities: Dict[int, int]) -> None:
+    """
+    Add stock for several products with one batched relative UPDATE
+
+    Increments need no availability check, so this is used in both
+    inventory modes.
+
+    Args:
+        db: Database session
+        quantities: Quantity to add per product ID
+
+    Raises:
+        HTTPException: If a product is not found
+    """
+    ids = sorted(quantities)
+    if not ids:
+        return
+
+    table = Product.__table__
+    statement = update(table).where(table.c.id == bindparam("_id")).values(
+        on_hand=table.c.on_hand + bindparam("_qty", type_=Integer)
+    )
+    params = [{"_id": pid, "_qty": quantities[pid]} for pid in ids]
+
+    if len(params) == 1 or not db.get_bind().dialect.supports_sane_multi_rowcount:
+        for row in params:
+            if db.execute(statement, row).rowcount == 0:
+                raise _stock_error(db, row["_id"], row["_qty"])
+    elif db.execute(statement, params).rowcount != len(params):
+        found = {pid for (pid,) in db.query(Product.id).filter(Product.id.in_(ids))}
+        missing = next(pid for pid in ids if pid not in found)
+        raise _stock_error(db, missing, quantities[missing])
+
+    expire_stock(db, ids)
 
 
 def decrement_inventory(
@@ -29,25 +190,29 @@ def decrement_inventory(
     Raises:
         HTTPException: If product not found or insufficient inventory
     """
-    # Get product with row lock to prevent race conditions
-    product = db.query(Product).filter(Product.id == product_id).with_for_update().first()
+    if use_atomic_updates():
+        decrement_stock(db, {product_id: qty}, allow_negative=allow_negative)
+    else:
+        # Get product with row lock to prevent race conditions
+        product = db.query(Product).filter(Product.id == product_id).with_for_update().first()
 
-    if not product:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Product {product_id} not found"
-        )
+        if not product:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Product {product_id} not found"
+            )
 
-    # Check inventory availability
-    new_quantity = product.on_hand - qty
-    if new_quantity < 0 and not allow_negative:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Insufficient inventory for {product.name}. Available: {product.on_hand}, Requested: {qty}"
-        )
+        # Check inventory availability
+        new_quantity = product.on_hand - qty
+        if new_quantity < 0 and not allow_negative:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Insufficient inventory for {product.name}. Available: {product.on_hand}, Requested: {qty}"
+            )
 
-    # Update product inventory
-    product.on_hand = new_quantity
+        # Update product inventory
+        product.on_hand = new_quantity
+        invalidate_product(db, product_id)
 
     # Create inventory movement record
     movement = InventoryMovement(
@@ -82,17 +247,21 @@ def increment_inventory(
     Raises:
         HTTPException: If product not found
     """
-    # Get product with row lock
-    product = db.query(Product).filter(Product.id == product_id).with_for_update().first()
+    if use_atomic_updates():
+        increment_stock(db, {product_id: qty})
+    else:
+        # Get product with row lock
+        product = db.query(Product).filter(Product.id == product_id).with_for_update().first()
 
-    if not product:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Product {product_id} not found"
-        )
+        if not product:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Product {product_id} not found"
+            )
 
-    # Update product inventory
-    product.on_hand += qty
+        # Update product inventory
+        product.on_hand += qty
+        invalidate_product(db, product_id)
 
     # Create inventory movement record
     movement = InventoryMovement(
@@ -0,0 +1,127 @@
+"""
+Order number allocation
+
+Order numbers keep the ORD-YYYYMMDD-NNNN format with a per-day sequence.
+Each worker reserves a block of numbers from the order_number_sequences
+table in its own short transaction, then hands them out from memory, so
+checkout never counts orders and concurrent registers never collide.
+Numbers are unique but not gap-free: a restarted worker abandons the rest
+of its block, and blocks from different workers interleave.
+
+A day's sequence starts after the highest order number already stored
+for that day, so it never reissues numbers given out before the sequence
+existed (e.g. by the old count-based numbering).
+"""
+from datetime import datetime
+import threading
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import Integer, cast, func, insert, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import Order, OrderNumberSequence
+
+
+def format_order_number(day: str, value: int) -> str:
+    """
+    Format an order number
+
+    Args:
+        day: Day as YYYYMMDD
+        value: Sequence value within the day
+
+    Returns:
+        Order number
+    """
+    return f"{_order_number_prefix(day)}{value:04d}"
+
+
+def _order_number_prefix(day: str) -> str:
+    return f"ORD-{day}-"
+
+
+class OrderNumberAllocator:
+    """
+    Hands out order numbers from blocks reserved in the database
+    """
+
+    def __init__(self, block_size: int):
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        # (database, day) -> (next value, last reserved value)
+        self._blocks: Dict[Tuple[str, str], Tuple[int, int]] = {}
+
+    def _reserve_block(self, engine: Engine, day: str) -> Tuple[int, int]:
+        table = OrderNumberSequence.__table__
+        with engine.begin() as connection:
+            result = connection.execute(
+                update(table)
+                .where(table.c.day == day)
+                .values(last_value=table.c.last_value + self.block_size)
+            )
+            if result.rowcount == 0:
+                # Continue after the day's existing orders (numbers are
+                # compared as integers: they outgrow four digits)
+                prefix = _order_number_prefix(day)
+                start = connection.execute(
+                    select(func.coalesce(func.max(
+                        cast(func.substr(Order.order_number, len(prefix) + 1), Integer)
+                    ), 0)).where(Order.order_number.like(f"{prefix}%"))
+                ).scalar_one()
+                try:
+                    with connection.begin_nested():
+                        connection.execute(
+                            insert(table).values(day=day, last_value=start + self.block_size)
+                        )
+                    return start + 1, start + self.block_size
+                except IntegrityError:
+                    # Another worker created the day's row first
+                    connection.execute(
+                        update(table)
+                        .where(table.c.day == day)
+                        .values(last_value=table.c.last_value + self.block_size)
+                    )
+            last_value = connection.execute(
+                select(table.c.last_value).where(table.c.day == day)
+            ).scalar_one()
+        return last_value - self.block_size + 1, last_value
+
+    def next_order_number(self, db: Session, now: Optional[datetime] = None) -> str:
+        """
+        Allocate the next order number
+
+        Call before the checkout transaction writes anything: reserving a
+        new block uses a separate connection and commits immediately.
+
+        Args:
+            db: Database session (used to find the database)
+            now: Time of sale (default: current UTC time)
+
+        Returns:
+            Unique order number
+        """
+        day = (now or datetime.utcnow()).strftime("%Y%m%d")
+        engine = db.get_bind()
+        key = (str(engine.url), day)
+
+        with self._lock:
+            next_value, last_value = self._blocks.get(key, (1, 0))
+            if next_value > last_value:
+                next_value, last_value = self._reserve_block(engine, day)
+                # Blocks for earlier days are never used again
+                self._blocks = {k: v for k, v in self._blocks.items() if k[1] >= day}
+            self._blocks[key] = (next_value + 1, last_value)
+
+        return format_order_number(day, next_value)
+
+    def reset(self) -> None:
+        """Forget reserved blocks"""
+        with self._lock:
+            self._blocks = {}
+
+
+# Shared allocator for the application process
+order_number_allocator = OrderNumberAllocator(block_size=settings.order_number_block_size)
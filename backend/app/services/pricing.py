@@ -0,0 +1,102 @@
+"""
+Cart pricing services
+
+Validates and totals carts with a fixed number of queries: catalog fields
+for every product in every cart come from the product cache (one IN query
+for misses) and stock from one IN query, after which each cart is priced
+in a single pass over its lines. Units reserved by open carts are not
+available to sell.
+"""
+from typing import Dict, List, Sequence
+
+from sqlalchemy.orm import Session
+
+from app.models import Product
+from app.money import from_cents, to_cents
+from app.schemas import CartItem, CartValidationResponse, ProductResponse
+from app.services.product_cache import product_cache
+from app.services.reservations import reservations
+from app.services.tax import TaxLine, TaxTable, tax_engine
+
+
+def _price_cart(
+    items: Sequence[CartItem],
+    products: Dict[int, ProductResponse],
+    on_hand: Dict[int, int],
+    held: Dict[int, int],
+    tax_table: TaxTable
+) -> CartValidationResponse:
+    errors: List[str] = []
+    subtotal_cents = 0
+    tax_lines: List[TaxLine] = []
+    # Quantity already claimed by earlier lines of the same product
+    requested: Dict[int, int] = {}
+
+    for item in items:
+        product = products.get(item.product_id)
+        if product is None or item.product_id not in on_hand:
+            errors.append(f"Product {item.product_id} not found")
+            continue
+
+        qty = requested.get(item.product_id, 0) + item.qty
+        available = on_hand[item.product_id] - held.get(item.product_id, 0)
+        if available < qty:
+            errors.append(
+                f"{product.name}: Insufficient stock. Available: {available}, Requested: {qty}"
+            )
+            continue
+        requested[item.product_id] = qty
+
+        item_cents = to_cents(product.price) * item.qty
+        subtotal_cents += item_cents
+        tax_lines.append(TaxLine(product.category, product.taxable, item_cents))
+
+    tax_cents = tax_table.tax_cents(tax_lines)
+    return CartValidationResponse(
+        valid=not errors,
+        errors=errors,
+        totals={
+            "subtotal": from_cents(subtotal_cents),
+            "tax": from_cents(tax_cents),
+            "total": from_cents(subtotal_cents + tax_cents)
+        }
+    )
+
+
+def price_carts(db: Session, carts: Sequence[Sequence[CartItem]]) -> List[CartValidationResponse]:
+    """
+    Validate and total several carts
+
+    Args:
+        db: Database session
+        carts: Cart lines per cart
+
+    Returns:
+        Validation result per cart, in order
+    """
+    tax_table = tax_engine.table()
+    product_ids = {item.product_id for items in carts for item in items}
+    if not product_ids:
+        return [_price_cart(items, {}, {}, {}, tax_table) for items in carts]
+
+    # Catalog fields come from the cache; stock is always read fresh
+    products = product_cache.get_many(db, product_ids)
+    on_hand = dict(
+        db.query(Product.id, Product.on_hand).filter(Product.id.in_(product_ids)).all()
+    )
+    held = reservations.reserved_many(product_ids)
+    return [_price_cart(items, products, on_hand, held, tax_table) for items in carts]
+
+
+def price_cart(db: Session, items: Sequence[CartItem]) -> CartValidationResponse:
+    """
+    Validate and total a cart
+
+    Args:
+        db: Database session
+        items: Cart lines
+
+    Returns:
+        Validation result with errors and totals
+    """
+    return price_carts(db, [items])[0]
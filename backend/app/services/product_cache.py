@@ -0,0 +1,213 @@
+"""
+Read-through product cache
+
+Hot product rows are cached as immutable ProductResponse snapshots with
+LRU eviction and a TTL. Writers invalidate entries when their transaction
+commits. Each worker process has its own cache, so changes made by other
+workers become visible within the TTL.
+
+Misses are loaded outside the lock. A load only stores the products that
+were not invalidated while it read them: invalidations bump a generation
+counter, and the products invalidated during in-flight loads are
+remembered until those loads finish.
+"""
+from collections import OrderedDict
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import Product
+from app.schemas import ProductResponse
+
+# Session.info key holding product IDs to invalidate on commit
+PENDING_INVALIDATIONS_KEY = "product_cache_invalidations"
+
+# (expiry time, snapshot)
+_Entry = Tuple[float, ProductResponse]
+
+
+class ProductCache:
+    """
+    Bounded LRU cache of product snapshots with TTL expiry
+
+    Cached snapshots include on_hand as of the time they were loaded; code
+    that makes stock decisions must read on_hand from the database.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._generation = 0
+        self._cleared_at = 0
+        # Generation of the last invalidation per product, kept while loads run
+        self._invalidated_at: Dict[int, int] = {}
+        self._loads = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _lookup(self, product_id: int, now: float) -> Optional[ProductResponse]:
+        entry = self._entries.get(product_id)
+        if entry is None:
+            return None
+        expires_at, snapshot = entry
+        if expires_at <= now:
+            del self._entries[product_id]
+            return None
+        self._entries.move_to_end(product_id)
+        return snapshot
+
+    def _store(self, snapshot: ProductResponse, now: float) -> None:
+        self._entries[snapshot.id] = (now + self.ttl_seconds, snapshot)
+        self._entries.move_to_end(snapshot.id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _bump(self) -> int:
+        self._generation += 1
+        return self._generation
+
+    def get(self, db: Session, product_id: int) -> Optional[ProductResponse]:
+        """
+        Get a product snapshot, loading it on a miss
+
+        Args:
+            db: Database session
+            product_id: Product ID
+
+        Returns:
+            Product snapshot, or None if the product does not exist
+        """
+        return self.get_many(db, [product_id]).get(product_id)
+
+    def get_many(self, db: Session, product_ids: Iterable[int]) -> Dict[int, ProductResponse]:
+        """
+        Get product snapshots, loading all misses with one query
+
+        Args:
+            db: Database session
+            product_ids: Product IDs
+
+        Returns:
+            Snapshots by product ID (missing products are omitted)
+        """
+        found: Dict[int, ProductResponse] = {}
+        missing = []
+        now = time.monotonic()
+        with self._lock:
+            for product_id in set(product_ids):
+                snapshot = self._lookup(product_id, now)
+                if snapshot is None:
+                    missing.append(product_id)
+                else:
+                    found[product_id] = snapshot
+            self.hits += len(found)
+            self.misses += len(missing)
+            if not missing:
+                return found
+            started_at = self._generation
+            self._loads += 1
+
+        loaded = []
+        try:
+            products = db.query(Product).filter(Product.id.in_(missing)).all()
+            loaded = [ProductResponse.model_validate(product) for product in products]
+        finally:
+            with self._lock:
+                self._loads -= 1
+                if self._cleared_at <= started_at:
+                    for snapshot in loaded:
+                        # Skip rows read before an invalidation that ran meanwhile
+                        if self._invalidated_at.get(snapshot.id, 0) <= started_at:
+                            self._store(snapshot, now)
+                if not self._loads:
+                    self._invalidated_at.clear()
+
+        found.update((snapshot.id, snapshot) for snapshot in loaded)
+        return found
+
+    def invalidate(self, product_id: int) -> None:
+        """
+        Drop a product from the cache
+
+        Args:
+            product_id: Product ID
+        """
+        with self._lock:
+            self._entries.pop(product_id, None)
+            generation = self._bump()
+            if self._loads:
+                self._invalidated_at[product_id] = generation
+
+    def invalidate_all(self) -> None:
+        """Drop every cached product (after bulk changes)"""
+        with self._lock:
+            self._entries.clear()
+            self._cleared_at = self._bump()
+
+    def clear(self) -> None:
+        """Drop every cached product and reset counters"""
+        with self._lock:
+            self._entries.clear()
+            self._cleared_at = self._bump()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Cache counters
+
+        Returns:
+            Hits, misses, evictions, current size and hit ratio
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+# Shared product cache for the application process
+product_cache = ProductCache(
+    max_size=settings.product_cache_size,
+    ttl_seconds=settings.product_cache_ttl_seconds
+)
+
+
+def invalidate_product(db: Session, product_id: int) -> None:
+    """
+    Invalidate a cached product now and again when the session commits
+
+    The second invalidation drops any snapshot a concurrent reader cached
+    from the pre-commit row.
+
+    Args:
+        db: Session making the change
+        product_id: Product ID
+    """
+    product_cache.invalidate(product_id)
+    db.info.setdefault(PENDING_INVALIDATIONS_KEY, set()).add(product_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_products(session):
+    for product_id in session.info.pop(PENDING_INVALIDATIONS_KEY, ()):
+        product_cache.invalidate(product_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_invalidations(session):
+    session.info.pop(PENDING_INVALIDATIONS_KEY, None)
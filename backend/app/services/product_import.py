@@ -0,0 +1,245 @@
+"""
+Bulk product import services
+
+Streams CSV or JSONL rows, validates them in chunks and writes each chunk
+with set-based statements: one IN query to find existing SKUs/barcodes,
+one batched INSERT for new products and one batched UPDATE for upserts.
+"""
+import csv
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert, or_, update
+from sqlalchemy.orm import Session
+
+from app.models import Product, ProductStatus
+from app.money import cents_values
+from app.schemas import ProductCreate
+from app.services.catalog import ALLOWED_CATEGORIES, next_catalog_version
+from app.services.search_index import index_catalog_version
+from app.services.product_cache import product_cache
+
+# Rows validated and written per transaction
+IMPORT_CHUNK_SIZE = 2000
+
+# Per-row errors returned to the caller
+MAX_REPORTED_ERRORS = 1000
+
+
+@dataclass
+class ImportResult:
+    """Outcome of a bulk import"""
+    created: int = 0
+    updated: int = 0
+    failed: int = 0
+    errors: List[Dict[str, Any]] = field(default_factory=list)
+
+    def add_error(self, row: int, sku: Optional[str], error: str) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "sku": sku, "error": error})
+
+
+def iter_csv_rows(lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """
+    Parse CSV lines with a header row into dicts
+
+    Empty cells are dropped so schema defaults apply.
+
+    Args:
+        lines: CSV text lines
+
+    Yields:
+        Row dicts
+    """
+    for row in csv.DictReader(lines):
+        yield {
+            key.strip(): value.strip()
+            for key, value in row.items()
+            if key and value is not None and value.strip() != ""
+        }
+
+
+def iter_jsonl_rows(lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """
+    Parse JSON Lines into dicts, skipping blank lines
+
+    Lines that are not JSON objects are yielded as an error marker so the
+    importer can report them against their row number.
+
+    Args:
+        lines: JSONL text lines
+
+    Yields:
+        Row dicts
+    """
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield {"__error__": f"Invalid JSON: {e}"}
+            continue
+        if not isinstance(row, dict):
+            yield {"__error__": "Row must be a JSON object"}
+            continue
+        yield row
+
+
+def _format_validation_error(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in e['loc'])}: {e['msg']}" for e in error.errors()
+    )
+
+
+def _validate_chunk(
+    chunk: List[Tuple[int, Dict[str, Any]]],
+    seen_skus: Set[str],
+    seen_barcodes: Set[str],
+    result: ImportResult
+) -> List[Tuple[int, ProductCreate]]:
+    valid = []
+    for row_number, raw in chunk:
+        sku = raw.get("sku") if isinstance(raw.get("sku"), str) else None
+        if "__error__" in raw:
+            result.add_error(row_number, None, raw["__error__"])
+            continue
+
+        try:
+            product = ProductCreate.model_validate(raw)
+        except ValidationError as e:
+            result.add_error(row_number, sku, _format_validation_error(e))
+            continue
+
+        if product.category and product.category not in ALLOWED_CATEGORIES:
+            result.add_error(row_number, product.sku, f"Invalid category: {product.category}")
+            continue
+        if product.sku in seen_skus:
+            result.add_error(row_number, product.sku, "Duplicate SKU in import")
+            continue
+        if product.barcode and product.barcode in seen_barcodes:
+            result.add_error(row_number, product.sku, "Duplicate barcode in import")
+            continue
+
+        seen_skus.add(product.sku)
+        if product.barcode:
+            seen_barcodes.add(product.barcode)
+        valid.append((row_number, product))
+    return valid
+
+
+def _write_chunk(
+    db: Session,
+    valid: List[Tuple[int, ProductCreate]],
+    upsert: bool,
+    result: ImportResult
+) -> Optional[int]:
+    if not valid:
+        return None
+
+    skus = [product.sku for _, product in valid]
+    barcodes = [product.barcode for _, product in valid if product.barcode]
+
+    # One IN query finds every existing SKU and barcode in the chunk
+    conditions = [Product.sku.in_(skus)]
+    if barcodes:
+        conditions.append(Product.barcode.in_(barcodes))
+    existing = db.query(Product.id, Product.sku, Product.barcode).filter(or_(*conditions)).all()
+    id_by_sku = {row.sku: row.id for row in existing}
+    id_by_barcode = {row.barcode: row.id for row in existing if row.barcode}
+
+    inserts = []
+    updates = []
+    for row_number, product in valid:
+        existing_id = id_by_sku.get(product.sku)
+        if existing_id is not None and not upsert:
+            result.add_error(row_number, product.sku, "SKU already exists")
+            continue
+
+        barcode_owner = id_by_barcode.get(product.barcode) if product.barcode else None
+        if barcode_owner is not None and barcode_owner != existing_id:
+            result.add_error(row_number, product.sku, "Barcode already exists")
+            continue
+
+        # Set-based statements bypass the models' money properties
+        if existing_id is None:
+            inserts.append(cents_values(Product, product.model_dump()))
+        else:
+            updates.append(
+                {"id": existing_id, **cents_values(Product, product.model_dump(exclude_unset=True))}
+            )
+
+    if not inserts and not updates:
+        return None
+
+    version = next_catalog_version(db)
+    if inserts:
+        db.execute(insert(Product), [
+            {**values, "status": ProductStatus.ACTIVE, "on_hand": 0, "catalog_version": version}
+            for values in inserts
+        ])
+    if updates:
+        db.execute(update(Product), [
+            {**values, "catalog_version": version} for values in updates
+        ])
+
+    result.created += len(inserts)
+    result.updated += len(updates)
+    return version
+
+
+def import_products(
+    db: Session,
+    rows: Iterable[Dict[str, Any]],
+    upsert: bool = False,
+    chunk_size: int = IMPORT_CHUNK_SIZE
+) -> ImportResult:
+    """
+    Import products from an iterable of row dicts
+
+    Each chunk is validated, written and committed as one transaction; a
+    failing row is reported and skipped without affecting the rest of its
+    chunk.
+
+    Args:
+        db: Database session
+        rows: Product rows (ProductCreate fields)
+        upsert: Update products whose SKU already exists instead of
+            reporting them as errors
+        chunk_size: Rows per transaction
+
+    Returns:
+        Import counts and per-row errors (row numbers are 1-based)
+    """
+    result = ImportResult()
+    seen_skus: Set[str] = set()
+    seen_barcodes: Set[str] = set()
+
+    def flush(chunk: List[Tuple[int, Dict[str, Any]]]) -> None:
+        valid = _validate_chunk(chunk, seen_skus, seen_barcodes, result)
+        try:
+            version = _write_chunk(db, valid, upsert, result)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        if version is not None:
+            # Sync the search index and cache with everything written in this chunk
+            index_catalog_version(db, version)
+            product_cache.invalidate_all()
+
+    chunk: List[Tuple[int, Dict[str, Any]]] = []
+    for row_number, row in enumerate(rows, start=1):
+        chunk.append((row_number, row))
+        if len(chunk) >= chunk_size:
+            flush(chunk)
+            chunk = []
+    if chunk:
+        flush(chunk)
+
+    return result
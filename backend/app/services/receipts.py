@@ -0,0 +1,104 @@
+"""
+Receipt snapshots
+
+The receipt document is rendered once, inside the checkout transaction,
+and stored as compact JSON on the order. Reprints read that column by
+primary key and return it as-is, and the receipt keeps the product names
+as they were at the time of sale. Orders created before snapshots existed
+get theirs built and stored on first reprint.
+"""
+from datetime import datetime
+import json
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.orm import Session, joinedload, selectinload
+
+from app.models import Order, OrderItem
+from app.schemas import ReceiptResponse
+
+
+def render_receipt(
+    order_number: str,
+    created_at: datetime,
+    items: List[Dict[str, Any]],
+    subtotal: float,
+    discount_total: float,
+    tax_total: float,
+    total: float,
+    payment_details: Optional[Dict[str, Any]],
+    cashier_email: str
+) -> str:
+    """
+    Render a receipt document
+
+    Args:
+        order_number: Order number
+        created_at: Time of sale
+        items: Lines with name, qty, unit_price, discount and line_total
+        subtotal: Order subtotal
+        discount_total: Order discount total
+        tax_total: Order tax total
+        total: Order total
+        payment_details: Payment details (method is shown on the receipt)
+        cashier_email: Cashier shown on the receipt
+
+    Returns:
+        Receipt as compact JSON
+    """
+    receipt = ReceiptResponse(
+        order_number=order_number,
+        date=created_at,
+        items=items,
+        subtotal=subtotal,
+        discount_total=discount_total,
+        tax_total=tax_total,
+        total=total,
+        payment_method=(payment_details or {}).get("method", "Unknown"),
+        cashier=cashier_email
+    )
+    return receipt.model_dump_json()
+
+
+def store_legacy_receipt(db: Session, order_id: int) -> Optional[str]:
+    """
+    Build and store the receipt of an order created without a snapshot
+
+    Uses current product names, since the names at the time of sale were
+    not recorded.
+
+    Args:
+        db: Database session
+        order_id: Order ID
+
+    Returns:
+        Receipt JSON, or None if the order does not exist
+    """
+    order = db.query(Order).options(
+        selectinload(Order.items).selectinload(OrderItem.product),
+        joinedload(Order.cashier)
+    ).filter(Order.id == order_id).first()
+    if order is None:
+        return None
+
+    order.receipt_json = render_receipt(
+        order_number=order.order_number,
+        created_at=order.created_at,
+        items=[
+            {
+                "name": item.product.name,
+                "qty": item.qty,
+                "unit_price": item.unit_price,
+                "discount": item.discount,
+                "line_total": item.line_total
+            }
+            for item in order.items
+        ],
+        subtotal=order.subtotal,
+        discount_total=order.discount_total,
+        tax_total=order.tax_total,
+        total=order.total,
+        payment_details=json.loads(order.payment_json) if order.payment_json else None,
+        cashier_email=order.cashier.email
+    )
+    db.commit()
+    return order.receipt_json
@@ -0,0 +1,200 @@
+"""
+Stock reservations
+
+Carts hold units of stock while a customer shops, so two registers cannot
+both promise the last card. Reserved quantities are kept as a running
+total per product, which makes available-to-sell (on_hand - reserved) an
+O(1) lookup. Holds expire after a TTL; expiry is driven by a min-heap of
+deadlines, so each check only pops the holds that are actually due
+instead of scanning every reservation.
+
+Reservations live in process memory, like cart sessions: each worker
+only sees the holds made through it.
+"""
+import heapq
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.config import settings
+
+
+class ReservationBook:
+    """
+    Per-holder stock reservations with heap-driven expiry
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._reserved: Dict[int, int] = {}
+        self._holds: Dict[str, Dict[int, int]] = {}
+        self._deadlines: Dict[str, float] = {}
+        # (deadline, holder); stale entries are skipped when popped
+        self._heap: List[Tuple[float, str]] = []
+
+    def _expire(self, now: float) -> None:
+        while self._heap and self._heap[0][0] <= now:
+            deadline, holder = heapq.heappop(self._heap)
+            if self._deadlines.get(holder) == deadline:
+                self._release(holder)
+
+    def _release(self, holder: str) -> None:
+        self._deadlines.pop(holder, None)
+        for product_id, qty in self._holds.pop(holder, {}).items():
+            self._adjust(product_id, -qty)
+
+    def _adjust(self, product_id: int, delta: int) -> None:
+        total = self._reserved.get(product_id, 0) + delta
+        if total > 0:
+            self._reserved[product_id] = total
+        else:
+            self._reserved.pop(product_id, None)
+
+    def _touch(self, holder: str, now: float) -> None:
+        deadline = now + self.ttl_seconds
+        self._deadlines[holder] = deadline
+        heapq.heappush(self._heap, (deadline, holder))
+
+    def hold(self, holder: str, product_id: int, qty: int) -> None:
+        """
+        Set how many units of a product a holder reserves (0 releases them)
+
+        Also renews the holder's TTL.
+
+        Args:
+            holder: Holder ID (cart ID)
+            product_id: Product ID
+            qty: Units to hold
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            self._hold(holder, product_id, qty, now)
+
+    def try_hold(self, holder: str, product_id: int, qty: int, on_hand: int) -> int:
+        """
+        Hold units of a product only if enough are available
+
+        The check and the hold happen under one lock, so two holders can
+        never both reserve the last units.
+
+        Args:
+            holder: Holder ID (cart ID)
+            product_id: Product ID
+            qty: Units to hold
+            on_hand: Units in stock
+
+        Returns:
+            Units available to the holder (on_hand minus units held by
+            others); the hold was placed if this is at least qty
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            holds = self._holds.get(holder, {})
+            available = on_hand - (self._reserved.get(product_id, 0) - holds.get(product_id, 0))
+            if available >= qty:
+                self._hold(holder, product_id, qty, now)
+            return available
+
+    def _hold(self, holder: str, product_id: int, qty: int, now: float) -> None:
+        holds = self._holds.setdefault(holder, {})
+        self._adjust(product_id, qty - holds.get(product_id, 0))
+        if qty > 0:
+            holds[product_id] = qty
+        else:
+            holds.pop(product_id, None)
+
+        if holds:
+            self._touch(holder, now)
+        else:
+            self._release(holder)
+
+    def renew(self, holder: str) -> None:
+        """
+        Extend a holder's TTL without changing its holds
+
+        Args:
+            holder: Holder ID (cart ID)
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            if holder in self._holds:
+                self._touch(holder, now)
+
+    def release(self, holder: str) -> None:
+        """
+        Drop every hold of a holder
+
+        Args:
+            holder: Holder ID (cart ID)
+        """
+        with self._lock:
+            self._release(holder)
+
+    def reserved(self, product_id: int, exclude: Optional[str] = None) -> int:
+        """
+        Units of a product currently held
+
+        Args:
+            product_id: Product ID
+            exclude: Holder whose own holds are not counted
+
+        Returns:
+            Reserved units
+        """
+        with self._lock:
+            self._expire(time.monotonic())
+            total = self._reserved.get(product_id, 0)
+            if exclude is not None:
+                total -= self._holds.get(exclude, {}).get(product_id, 0)
+            return total
+
+    def reserved_many(self, product_ids, exclude: Optional[str] = None) -> Dict[int, int]:
+        """
+        Units held per product for several products
+
+        Args:
+            product_ids: Product IDs
+            exclude: Holder whose own holds are not counted
+
+        Returns:
+            Reserved units per product ID (products without holds are omitted)
+        """
+        with self._lock:
+            self._expire(time.monotonic())
+            own = self._holds.get(exclude, {}) if exclude is not None else {}
+            held = {}
+            for product_id in product_ids:
+                total = self._reserved.get(product_id, 0) - own.get(product_id, 0)
+                if total:
+                    held[product_id] = total
+            return held
+
+    def available(self, product_id: int, on_hand: int, exclude: Optional[str] = None) -> int:
+        """
+        Available-to-sell units
+
+        Args:
+            product_id: Product ID
+            on_hand: Units in stock
+            exclude: Holder whose own holds count as available
+
+        Returns:
+            on_hand minus units held by others
+        """
+        return on_hand - self.reserved(product_id, exclude)
+
+    def clear(self) -> None:
+        """Drop every hold"""
+        with self._lock:
+            self._reserved = {}
+            self._holds = {}
+            self._deadlines = {}
+            self._heap = []
+
+
+# Shared reservations for the application process
+reservations = ReservationBook(ttl_seconds=settings.reservation_ttl)
@@ -0,0 +1,292 @@
+"""
+In-memory product search index
+
+Keeps a token/prefix index over active products so POS search can be
+answered without scanning the products table.
+"""
+from bisect import bisect_left
+import heapq
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy.orm import Session
+
+from app.models import Product, ProductStatus
+from app.services.fuzzy import DeletionIndex
+
+# Split names into lowercase word tokens
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """
+    Split text into lowercase alphanumeric tokens
+
+    Args:
+        text: Text to tokenize
+
+    Returns:
+        List of tokens
+    """
+    if not text:
+        return []
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class ProductSearchIndex:
+    """
+    Token/prefix index over active products
+
+    Each product contributes the tokens of its name, SKU and barcode.
+    A query matches a product when every query token is a prefix of one of
+    the product's tokens. Tokens are kept in a sorted list so prefix
+    lookups are a binary search plus a short range walk.
+
+    Full SKUs and barcodes are also kept in an exact-match map so scanner
+    input resolves with a single dict lookup, and name tokens feed a
+    deletion dictionary for typo-tolerant search.
+
+    The index lives in process memory; each worker builds its own copy at
+    startup and keeps it in sync with the writes it serves.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings: Dict[str, Set[int]] = {}
+        self._product_tokens: Dict[int, Set[str]] = {}
+        self._product_codes: Dict[int, List[str]] = {}
+        self._codes: Dict[str, int] = {}
+        self._product_name_tokens: Dict[int, Set[str]] = {}
+        self._fuzzy = DeletionIndex()
+        self._sorted_tokens: List[str] = []
+        self._dirty = False
+        self.ready = False
+
+    def _product_token_set(self, product: Product) -> Set[str]:
+        tokens = set(tokenize(product.name))
+        tokens.update(tokenize(product.sku))
+        tokens.update(tokenize(product.barcode))
+        return tokens
+
+    def _add(self, product) -> None:
+        self._add_tokens(product.id, self._product_token_set(product))
+        codes = [code for code in (product.sku, product.barcode) if code]
+        for code in codes:
+            self._codes[code] = product.id
+        self._product_codes[product.id] = codes
+        name_tokens = set(tokenize(product.name))
+        for token in name_tokens:
+            self._fuzzy.add(token)
+        self._product_name_tokens[product.id] = name_tokens
+
+    def _add_tokens(self, product_id: int, tokens: Set[str]) -> None:
+        for token in tokens:
+            ids = self._postings.get(token)
+            if ids is None:
+                self._postings[token] = ids = set()
+                self._dirty = True
+            ids.add(product_id)
+        self._product_tokens[product_id] = tokens
+
+    def _remove(self, product_id: int) -> None:
+        for code in self._product_codes.pop(product_id, []):
+            if self._codes.get(code) == product_id:
+                del self._codes[code]
+        for token in self._product_name_tokens.pop(product_id, ()):
+            self._fuzzy.remove(token)
+        tokens = self._product_tokens.pop(product_id, None)
+        if not tokens:
+            return
+        for token in tokens:
+            ids = self._postings.get(token)
+            if ids is None:
+                continue
+            ids.discard(product_id)
+            if not ids:
+                del self._postings[token]
+                self._dirty = True
+
+    def _tokens_with_prefix(self, prefix: str) -> Iterable[str]:
+        if self._dirty:
+            self._sorted_tokens = sorted(self._postings)
+            self._dirty = False
+        tokens = self._sorted_tokens
+        i = bisect_left(tokens, prefix)
+        while i < len(tokens) and tokens[i].startswith(prefix):
+            yield tokens[i]
+            i += 1
+
+    def build(self, db: Session) -> int:
+        """
+        Rebuild the index from the database
+
+        Args:
+            db: Database session
+
+        Returns:
+            Number of indexed products
+        """
+        rows = db.query(Product.id, Product.name, Product.sku, Product.barcode).filter(
+            Product.status == ProductStatus.ACTIVE
+        ).all()
+
+        with self._lock:
+            self._postings = {}
+            self._product_tokens = {}
+            self._product_codes = {}
+            self._codes = {}
+            self._product_name_tokens = {}
+            self._fuzzy.clear()
+            for row in rows:
+                self._add(row)
+            self._dirty = True
+            self.ready = True
+            return len(self._product_tokens)
+
+    def upsert(self, product: Product) -> None:
+        """
+        Add or refresh a product; inactive products are dropped
+
+        Args:
+            product: Product to index
+        """
+        with self._lock:
+            self._remove(product.id)
+            if product.status == ProductStatus.ACTIVE:
+                self._add(product)
+
+    def remove(self, product_id: int) -> None:
+        """
+        Remove a product from the index
+
+        Args:
+            product_id: Product ID
+        """
+        with self._lock:
+            self._remove(product_id)
+
+    def lookup_code(self, code: str) -> Optional[int]:
+        """
+        Resolve an exact SKU or barcode
+
+        Args:
+            code: Scanned SKU or barcode
+
+        Returns:
+            Product ID, or None if no active product has this code
+        """
+        return self._codes.get(code)
+
+    def search(self, query: str, limit: int) -> List[int]:
+        """
+        Find products matching every query token by prefix
+
+        Args:
+            query: Search query
+            limit: Maximum number of results
+
+        Returns:
+            Matching product IDs, exact token matches first
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        with self._lock:
+            candidates: Optional[Set[int]] = None
+            exact: Set[int] = set()
+            # Rarest-first intersection would need postings sizes per prefix;
+            # longest term first is a cheap approximation
+            for term in sorted(terms, key=len, reverse=True):
+                matched: Set[int] = set()
+                for token in self._tokens_with_prefix(term):
+                    matched |= self._postings[token]
+                exact_ids = self._postings.get(term)
+                if exact_ids:
+                    exact |= exact_ids
+                candidates = matched if candidates is None else candidates & matched
+                if not candidates:
+                    return []
+
+        return heapq.nsmallest(limit, candidates, key=lambda pid: (pid not in exact, pid))
+
+    def fuzzy_search(self, query: str, limit: int) -> List[int]:
+        """
+        Find products whose names match every query token within a small
+        edit distance, or by prefix
+
+        Args:
+            query: Search query, possibly misspelled
+            limit: Maximum number of results
+
+        Returns:
+            Matching product IDs, closest matches first
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        with self._lock:
+            scores: Optional[Dict[int, int]] = None
+            for term in terms:
+                # Best distance per token: prefix hits count as exact
+                token_distances = self._fuzzy.lookup(term)
+                for token in self._tokens_with_prefix(term):
+                    token_distances[token] = 0
+
+                term_scores: Dict[int, int] = {}
+                for token, distance in token_distances.items():
+                    for pid in self._postings.get(token, ()):
+                        if distance < term_scores.get(pid, distance + 1):
+                            term_scores[pid] = distance
+
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {
+                        pid: score + term_scores[pid]
+                        for pid, score in scores.items() if pid in term_scores
+                    }
+                if not scores:
+                    return []
+
+        return heapq.nsmallest(limit, scores, key=lambda pid: (scores[pid], pid))
+
+    def __len__(self) -> int:
+        return len(self._product_tokens)
+
+
+# Shared index for the application process
+product_index = ProductSearchIndex()
+
+
+def build_product_index(db: Session) -> int:
+    """
+    Build the shared product index
+
+    Args:
+        db: Database session
+
+    Returns:
+        Number of indexed products
+    """
+    return product_index.build(db)
+
+
+def index_catalog_version(db: Session, version: int) -> None:
+    """
+    Refresh the shared index with every product stamped with a catalog
+    version (used after bulk writes that bypass the ORM)
+
+    Args:
+        db: Database session
+        version: Catalog version written by the bulk change
+    """
+    if not product_index.ready:
+        return
+    rows = db.query(
+        Product.id, Product.name, Product.sku, Product.barcode, Product.status
+    ).filter(Product.catalog_version == version)
+    for row in rows:
+        product_index.upsert(row)
@@ -0,0 +1,144 @@
+"""
+Inventory ledger checkpoints
+
+inventory_movements is an append-only ledger. A checkpoint records a
+product's on_hand together with the highest movement id it already
+includes, so stock at any time T is the latest checkpoint taken at or
+before T plus the movements after it up to T. As-of queries and
+reconciliation therefore read one checkpoint and a short tail per product
+(a seek on the (product_id, id) index past the checkpoint) instead of the
+whole ledger.
+
+Checkpoints are taken periodically (POST /inventory/checkpoints, e.g. from
+a nightly job), only for products that moved since their last one.
+Products without a checkpoint are summed from an empty ledger.
+
+A checkpoint's watermark is the highest movement id at the time, which is
+only safe if no movement with a lower id can commit afterwards. SQLite has
+a single writer, so this always holds; elsewhere ids are handed out before
+commit, so the checkpoint is taken under a SHARE lock on the ledger that
+waits for in-flight writers and holds new ones off until it commits.
+"""
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import DateTime, and_, exists, func, insert, literal, or_, select, text
+from sqlalchemy.orm import Session
+
+from app.models import InventoryCheckpoint, InventoryMovement, Product
+
+
+def take_checkpoints(db: Session, now: Optional[datetime] = None) -> int:
+    """
+    Checkpoint every product that moved since its last checkpoint
+
+    Runs as one INSERT ... SELECT, so on_hand and the movement watermark
+    come from the same snapshot. Outside SQLite the ledger is locked
+    against writes until the caller commits.
+
+    Args:
+        db: Database session
+        now: Checkpoint time (default: now)
+
+    Returns:
+        Number of checkpoints written
+    """
+    if db.get_bind().dialect.name != "sqlite":
+        # Movements committing out of id order would fall below the watermark
+        db.execute(text(f"LOCK TABLE {InventoryMovement.__tablename__} IN SHARE MODE"))
+
+    last = select(
+        InventoryCheckpoint.product_id,
+        func.max(InventoryCheckpoint.movement_id).label("movement_id")
+    ).group_by(InventoryCheckpoint.product_id).subquery()
+    watermark = select(func.coalesce(func.max(InventoryMovement.id), 0)).scalar_subquery()
+    moved = exists().where(
+        InventoryMovement.product_id == Product.id,
+        InventoryMovement.id > last.c.movement_id
+    )
+
+    source = select(
+        Product.id, Product.on_hand, watermark, literal(now or datetime.utcnow(), DateTime)
+    ).outerjoin(last, last.c.product_id == Product.id).where(
+        or_(last.c.movement_id.is_(None), moved)
+    )
+    result = db.execute(
+        insert(InventoryCheckpoint).from_select(
+            ["product_id", "on_hand", "movement_id", "created_at"], source
+        )
+    )
+    return result.rowcount
+
+
+def _ledger_stock(at: Optional[datetime]):
+    # Latest checkpoint per product (taken at or before `at`) ...
+    latest_ids = select(
+        InventoryCheckpoint.product_id,
+        func.max(InventoryCheckpoint.id).label("id")
+    ).group_by(InventoryCheckpoint.product_id)
+    if at is not None:
+        latest_ids = latest_ids.where(InventoryCheckpoint.created_at <= at)
+    latest_ids = latest_ids.subquery()
+    checkpoint = select(
+        InventoryCheckpoint.product_id, InventoryCheckpoint.on_hand, InventoryCheckpoint.movement_id
+    ).join(latest_ids, InventoryCheckpoint.id == latest_ids.c.id).subquery()
+
+    # ... plus the movements after it
+    tail_conditions = [
+        InventoryMovement.product_id == Product.id,
+        InventoryMovement.id > func.coalesce(checkpoint.c.movement_id, 0)
+    ]
+    if at is not None:
+        tail_conditions.append(InventoryMovement.created_at <= at)
+    tail = select(
+        func.coalesce(func.sum(InventoryMovement.delta_qty), 0)
+    ).where(and_(*tail_conditions)).scalar_subquery()
+
+    stock = (func.coalesce(checkpoint.c.on_hand, 0) + tail).label("ledger_on_hand")
+    return stock, checkpoint
+
+
+def stock_as_of(
+    db: Session,
+    at: datetime,
+    product_ids: Optional[Iterable[int]] = None
+) -> Dict[int, int]:
+    """
+    On-hand stock per product at a point in time
+
+    Args:
+        db: Database session
+        at: Point in time
+        product_ids: Products to report (default: all)
+
+    Returns:
+        Stock per product ID
+    """
+    stock, checkpoint = _ledger_stock(at)
+    query = select(Product.id, stock).outerjoin(
+        checkpoint, checkpoint.c.product_id == Product.id
+    ).where(Product.created_at <= at)
+    if product_ids is not None:
+        query = query.where(Product.id.in_(list(product_ids)))
+    return dict(db.execute(query.order_by(Product.id)).all())
+
+
+def reconcile_stock(db: Session) -> Tuple[int, List[Tuple[int, str, int, int]]]:
+    """
+    Compare every product's on_hand with its checkpoint plus ledger tail
+
+    Args:
+        db: Database session
+
+    Returns:
+        Number of products checked, and (product ID, SKU, on_hand, ledger
+        on_hand) for every product where they differ
+    """
+    stock, checkpoint = _ledger_stock(None)
+    rows = db.execute(
+        select(Product.id, Product.sku, Product.on_hand, stock)
+        .outerjoin(checkpoint, checkpoint.c.product_id == Product.id)
+        .order_by(Product.id)
+    ).all()
+    mismatches = [tuple(row) for row in rows if row.on_hand != row.ledger_on_hand]
+    return len(rows), mismatches
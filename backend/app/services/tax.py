@@ -1,20 +1,246 @@
 """
 Tax calculation services
+
+Rates are configured per jurisdiction, with per-category overrides and
+exemptions (see the tax_* settings). The rules are compiled once, when the
+settings are loaded, into one lookup table per jurisdiction: a line's rate
+is a single dict lookup on its category, so taxing a batch of lines costs
+one pass over the lines however many rules are configured.
+
+Amounts are integer cents. Tax is rounded per rate, on the sum of the
+lines taxed at that rate; with a single rate this is the tax on the
+taxable subtotal.
 """
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+
+from app.config import Settings, settings
+from app.models import Order, OrderItem, Product
+from app.money import round_cents
+
+DEFAULT_JURISDICTION = "default"
+
+
+class TaxLine(NamedTuple):
+    """A taxable amount in cents and what decides its rate"""
+    category: Optional[str]
+    taxable: bool
+    amount_cents: int
+
+
+@dataclass(frozen=True)
+class TaxTable:
+    """Compiled tax rates for one jurisdiction"""
+    jurisdiction: str
+    rate: float
+    category_rates: Dict[str, float] = field(default_factory=dict)
+
+    def rate_for(self, category: Optional[str], taxable: bool = True) -> float:
+        """
+        Rate for a product
+
+        Args:
+            category: Product category
+            taxable: Product taxable flag (False exempts the product)
+
+        Returns:
+            Tax rate
+        """
+        if not taxable:
+            return 0.0
+        return self.category_rates.get(category, self.rate)
+
+    def tax_cents(self, lines: Iterable[TaxLine]) -> int:
+        """
+        Total tax of a set of lines in cents, rounded per rate
+
+        Args:
+            lines: Lines to tax
 
-# Default tax rate (8.5%)
-DEFAULT_TAX_RATE = 0.085
+        Returns:
+            Tax in cents
+        """
+        cents_by_rate: Dict[float, int] = {}
+        rates = self.category_rates
+        for line in lines:
+            if line.taxable:
+                rate = rates.get(line.category, self.rate)
+                cents_by_rate[rate] = cents_by_rate.get(rate, 0) + line.amount_cents
+        return sum_tax_cents(cents_by_rate)
 
 
-def calculate_tax(taxable_amount: float, tax_rate: float = DEFAULT_TAX_RATE) -> float:
+def sum_tax_cents(cents_by_rate: Dict[float, int]) -> int:
     """
-    Calculate tax for a given amount
+    Tax on amounts already grouped by rate
 
     Args:
-        taxable_amount: Amount to calculate tax on
-        tax_rate: Tax rate (default: 8.5%)
+        cents_by_rate: Taxable cents per rate
 
     Returns:
-        Tax amount
+        Tax in cents
+    """
+    return sum(round_cents(cents, rate) for rate, cents in cents_by_rate.items())
+
+
+def _parse_rates(spec: str, name: str) -> List[Tuple[str, float]]:
+    pairs = []
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        key, sep, value = entry.rpartition(":")
+        try:
+            rate = float(value)
+        except ValueError:
+            rate = -1.0
+        if not sep or not key.strip() or not 0.0 <= rate < 1.0:
+            raise ValueError(f"Invalid {name} entry: {entry!r}")
+        pairs.append((key.strip(), rate))
+    return pairs
+
+
+def _scoped(key: str) -> Tuple[Optional[str], str]:
+    # "US-CA/Holiday" applies to one jurisdiction, "Holiday" to all of them
+    jurisdiction, sep, category = key.partition("/")
+    return (jurisdiction.strip(), category.strip()) if sep else (None, key)
+
+
+def compile_tax_tables(config: Settings) -> Dict[str, TaxTable]:
+    """
+    Compile the tax settings into one lookup table per jurisdiction
+
+    Args:
+        config: Settings with tax_rate, tax_jurisdiction_rates,
+            tax_category_rates and tax_exempt_categories
+
+    Returns:
+        Table per jurisdiction name (always includes "default" and the
+        configured tax_jurisdiction)
+
+    Raises:
+        ValueError: If a rule cannot be parsed
     """
-    return round(taxable_amount * tax_rate, 2)
+    jurisdiction_rates = dict(_parse_rates(config.tax_jurisdiction_rates, "TAX_JURISDICTION_RATES"))
+    category_rules = [
+        (*_scoped(key), rate)
+        for key, rate in _parse_rates(config.tax_category_rates, "TAX_CATEGORY_RATES")
+    ]
+    exempt_rules = [
+        _scoped(entry.strip())
+        for entry in config.tax_exempt_categories.split(",") if entry.strip()
+    ]
+
+    names = {DEFAULT_JURISDICTION, config.tax_jurisdiction, *jurisdiction_rates}
+    names.update(scope for scope, _, _ in category_rules if scope)
+    names.update(scope for scope, _ in exempt_rules if scope)
+
+    tables = {}
+    for name in names:
+        category_rates: Dict[str, float] = {}
+        # Jurisdiction-specific rules override rules for all jurisdictions
+        for scoped in (False, True):
+            for scope, category, rate in category_rules:
+                if (scope is not None) == scoped and scope in (None, name):
+                    category_rates[category] = rate
+        for scope, category in exempt_rules:
+            if scope in (None, name):
+                category_rates[category] = 0.0
+        tables[name] = TaxTable(
+            jurisdiction=name,
+            rate=jurisdiction_rates.get(name, config.tax_rate),
+            category_rates=category_rates
+        )
+    return tables
+
+
+class TaxEngine:
+    """
+    Compiled tax tables with a default jurisdiction
+    """
+
+    def __init__(self, tables: Dict[str, TaxTable], default_jurisdiction: str):
+        self.tables = tables
+        self.default_jurisdiction = default_jurisdiction
+
+    @classmethod
+    def from_settings(cls, config: Settings) -> "TaxEngine":
+        """Compile an engine from the tax settings"""
+        return cls(compile_tax_tables(config), config.tax_jurisdiction)
+
+    def table(self, jurisdiction: Optional[str] = None) -> TaxTable:
+        """
+        Tax table for a jurisdiction
+
+        Args:
+            jurisdiction: Jurisdiction name (default: the store's)
+
+        Returns:
+            Compiled tax table
+
+        Raises:
+            HTTPException: If the jurisdiction is not configured
+        """
+        table = self.tables.get(jurisdiction or self.default_jurisdiction)
+        if table is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown tax jurisdiction: {jurisdiction}"
+            )
+        return table
+
+
+# Tax tables compiled from the application settings
+tax_engine = TaxEngine.from_settings(settings)
+
+
+def recompute_order_taxes(
+    db: Session,
+    table: TaxTable,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: Optional[int] = None
+) -> List[Tuple[Order, int]]:
+    """
+    Recompute the tax of stored orders under a tax table
+
+    Orders are read with one query and their lines with a second one
+    (joined to the product's current category and taxable flag), then
+    every line is bucketed by order and rate in a single pass.
+
+    Args:
+        db: Database session
+        table: Tax table to apply
+        start: Only orders created at or after this time
+        end: Only orders created before this time
+        limit: Maximum number of orders (newest first)
+
+    Returns:
+        (order, recomputed tax in cents) per order, newest first
+    """
+    query = db.query(Order).order_by(Order.created_at.desc(), Order.id.desc())
+    if start is not None:
+        query = query.filter(Order.created_at >= start)
+    if end is not None:
+        query = query.filter(Order.created_at < end)
+    if limit is not None:
+        query = query.limit(limit)
+    orders = query.all()
+    if not orders:
+        return []
+
+    lines = db.query(
+        OrderItem.order_id, OrderItem.line_total_cents, Product.category, Product.taxable
+    ).join(Product, Product.id == OrderItem.product_id).filter(
+        OrderItem.order_id.in_([order.id for order in orders])
+    ).all()
+
+    cents_by_order: Dict[int, Dict[float, int]] = {}
+    rates = table.category_rates
+    for order_id, line_total_cents, category, taxable in lines:
+        if taxable:
+            rate = rates.get(category, table.rate)
+            bucket = cents_by_order.setdefault(order_id, {})
+            bucket[rate] = bucket.get(rate, 0) + line_total_cents
+
+    return [(order, sum_tax_cents(cents_by_order.get(order.id, {}))) for order in orders]
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Bulk import products from a CSV or JSONL file
+
+Usage:
+    python import_products.py catalog.csv [--upsert] [--chunk-size N]
+"""
+import argparse
+import os
+import sys
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from app.database import SessionLocal, init_db
+from app.services.product_import import (
+    IMPORT_CHUNK_SIZE, import_products, iter_csv_rows, iter_jsonl_rows
+)
+
+
+def main():
+    """Run the import"""
+    parser = argparse.ArgumentParser(description="Bulk import products")
+    parser.add_argument("path", help="CSV (with header row) or JSONL file")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="File format (default: from extension)")
+    parser.add_argument("--upsert", action="store_true", help="Update existing products matched by SKU")
+    parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE, help="Rows per transaction")
+    args = parser.parse_args()
+
+    file_format = args.format or ("csv" if args.path.lower().endswith(".csv") else "jsonl")
+
+    print("Initializing database...")
+    init_db()
+
+    db = SessionLocal()
+    started = time.perf_counter()
+    try:
+        with open(args.path, encoding="utf-8-sig", newline="") as f:
+            rows = iter_csv_rows(f) if file_format == "csv" else iter_jsonl_rows(f)
+            result = import_products(db, rows, upsert=args.upsert, chunk_size=args.chunk_size)
+    finally:
+        db.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"Created: {result.created}, Updated: {result.updated}, Failed: {result.failed} "
+          f"({elapsed:.1f}s)")
+    for error in result.errors[:20]:
+        print(f"  Row {error['row']} ({error['sku'] or '-'}): {error['error']}")
+    if result.failed > 20:
+        print(f"  ... and {result.failed - 20} more errors")
+
+    return 1 if result.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
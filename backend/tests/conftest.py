@@ -3,13 +3,19 @@ Pytest configuration and fixtures
 """
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 
 from app.main import app
 from app.database import Base, get_db
 from app.models import User
-from app.auth import get_password_hash
+from app.auth import get_password_hash, create_access_token
+from app.services.catalog import snapshot_cache
+from app.services.product_cache import product_cache
+from app.services.order_numbers import order_number_allocator
+from app.services.idempotency import idempotency_store
+from app.services.cart_sessions import cart_store
+from app.services.reservations import reservations
 
 
 # Create test database
@@ -42,6 +48,12 @@ def client(db_session):
             pass
 
     app.dependency_overrides[get_db] = override_get_db
+    snapshot_cache.clear()
+    product_cache.clear()
+    order_number_allocator.reset()
+    idempotency_store.clear()
+    cart_store.clear()
+    reservations.clear()
     with TestClient(app) as test_client:
         yield test_client
     app.dependency_overrides.clear()
@@ -59,3 +71,44 @@ def test_user(db_session):
     db_session.commit()
     db_session.refresh(user)
     return user
+
+
+@pytest.fixture
+def manager_user(db_session):
+    """Create a test manager"""
+    user = User(
+        email="manager@example.com",
+        hashed_password=get_password_hash("testpass123"),
+        role="manager"
+    )
+    db_session.add(user)
+    db_session.commit()
+    db_session.refresh(user)
+    return user
+
+
+@pytest.fixture
+def auth_headers(test_user):
+    """Authorization headers for the test cashier"""
+    token = create_access_token(data={"sub": str(test_user.id)})
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def manager_headers(manager_user):
+    """Authorization headers for the test manager"""
+    token = create_access_token(data={"sub": str(manager_user.id)})
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def query_counter():
+    """Count SQL statements executed against the test database"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    yield statements
+    event.remove(engine, "before_cursor_execute", record)
@@ -0,0 +1,120 @@
+"""
+Tests for cart endpoints
+"""
+from app.models import Product
+from app.services.product_cache import product_cache
+
+
+def test_validate_cart_reads_fresh_stock(client, db_session, auth_headers):
+    """Test stock checks ignore the cached on_hand"""
+    card = Product(sku="BD-001", name="Birthday Card", price=5.00, on_hand=3)
+    gift = Product(sku="BL-001", name="Blank Card", price=2.00, on_hand=10, taxable=False)
+    db_session.add_all([card, gift])
+    db_session.commit()
+
+    cart = {"items": [{"product_id": card.id, "qty": 2}, {"product_id": gift.id, "qty": 1}]}
+    response = client.post("/cart/validate", json=cart, headers=auth_headers)
+    assert response.json() == {
+        "valid": True,
+        "errors": [],
+        "totals": {"subtotal": 12.0, "tax": 0.85, "total": 12.85}
+    }
+    assert product_cache.stats()["size"] == 2
+
+    # Stock sold elsewhere is seen even though the product is cached
+    card.on_hand = 1
+    db_session.commit()
+    response = client.post("/cart/validate", json=cart, headers=auth_headers)
+    assert response.json()["valid"] is False
+    assert "Available: 1" in response.json()["errors"][0]
+
+
+def test_validate_cart_counts_repeated_lines(client, db_session, auth_headers):
+    """Test stock is checked against the running quantity per product"""
+    card = Product(sku="BD-001", name="Birthday Card", price=5.00, on_hand=3)
+    db_session.add(card)
+    db_session.commit()
+
+    cart = {"items": [{"product_id": card.id, "qty": 2}, {"product_id": card.id, "qty": 2}]}
+    response = client.post("/cart/validate", json=cart, headers=auth_headers)
+    assert response.json()["errors"] == [
+        "Birthday Card: Insufficient stock. Available: 3, Requested: 4"
+    ]
+    assert response.json()["totals"]["subtotal"] == 10.0
+
+
+def test_validate_carts_batch(client, db_session, auth_headers, query_counter):
+    """Test many carts are validated with a fixed number of queries"""
+    products = [
+        Product(sku=f"BD-{i:03d}", name=f"Card {i}", price=1.00, on_hand=5) for i in range(200)
+    ]
+    db_session.add_all(products)
+    db_session.commit()
+
+    carts = {"carts": [
+        {"items": [{"product_id": p.id, "qty": 1} for p in products]},
+        {"items": [{"product_id": products[0].id, "qty": 6}]},
+        {"items": [{"product_id": 9999, "qty": 1}]},
+    ]}
+    query_counter.clear()
+    response = client.post("/cart/validate/batch", json=carts, headers=auth_headers)
+    # Auth user lookup + product cache misses + stock levels
+    assert len(query_counter) == 3
+
+    results = response.json()["results"]
+    assert [r["valid"] for r in results] == [True, False, False]
+    assert results[0]["totals"] == {"subtotal": 200.0, "tax": 17.0, "total": 217.0}
+    assert results[2]["errors"] == ["Product 9999 not found"]
+
+
+def test_cart_session_totals_and_checkout(client, db_session, auth_headers):
+    """Test a server-side cart keeps running totals and checks out by id"""
+    card = Product(sku="BD-001", name="Birthday Card", price=4.99, on_hand=5)
+    gift = Product(sku="BL-001", name="Blank Card", price=2.00, on_hand=10, taxable=False)
+    db_session.add_all([card, gift])
+    db_session.commit()
+
+    cart_id = client.post("/cart/sessions", headers=auth_headers).json()["id"]
+    lines = f"/cart/sessions/{cart_id}/lines"
+    client.post(lines, json={"product_id": card.id}, headers=auth_headers)
+    client.post(lines, json={"product_id": card.id, "qty": 2}, headers=auth_headers)
+    client.post(lines, json={"product_id": gift.id, "qty": 4}, headers=auth_headers)
+    client.put(f"{lines}/{gift.id}", json={"qty": 1}, headers=auth_headers)
+
+    response = client.post(lines, json={"product_id": card.id, "qty": 3}, headers=auth_headers)
+    assert response.status_code == 400
+    assert "Available: 5, Requested: 6" in response.json()["detail"]
+
+    cart = client.get(f"/cart/sessions/{cart_id}", headers=auth_headers).json()
+    assert [(i["product_id"], i["qty"]) for i in cart["items"]] == [(card.id, 3), (gift.id, 1)]
+    assert cart["totals"] == {"subtotal": 16.97, "tax": 1.27, "total": 18.24}
+
+    # Without a cart the client must send the totals
+    response = client.post("/orders", json={"items": [{"product_id": card.id, "qty": 1, "unit_price": 4.99}]},
+                           headers=auth_headers)
+    assert response.status_code == 422
+
+    # Totals that disagree with the cart are rejected
+    response = client.post("/orders", json={"cart_id": cart_id, "total": 1.00}, headers=auth_headers)
+    assert response.status_code == 422
+    assert "does not match the cart (18.24)" in response.json()["detail"]
+
+    response = client.post("/orders", json={"cart_id": cart_id}, headers=auth_headers)
+    assert response.status_code == 201
+    assert {k: response.json()[k] for k in ("subtotal", "tax_total", "total")} == {
+        "subtotal": 16.97, "tax_total": 1.27, "total": 18.24
+    }
+    assert [(i["product_id"], i["qty"], i["unit_price"]) for i in response.json()["items"]] == [
+        (card.id, 3, 4.99), (gift.id, 1, 2.00)
+    ]
+
+    # The cart is consumed by checkout
+    assert client.get(f"/cart/sessions/{cart_id}", headers=auth_headers).status_code == 404
+
+
+def test_cart_session_is_private(client, auth_headers, manager_headers):
+    """Test carts are only visible to the user who created them"""
+    cart_id = client.post("/cart/sessions", headers=auth_headers).json()["id"]
+    assert client.get(f"/cart/sessions/{cart_id}", headers=manager_headers).status_code == 404
+    assert client.delete(f"/cart/sessions/{cart_id}", headers=auth_headers).status_code == 204
+    assert client.get(f"/cart/sessions/{cart_id}", headers=auth_headers).status_code == 404
@@ -0,0 +1,132 @@
+"""
+Tests for the group-commit writer
+"""
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from app.models import Order, Product
+from app.routes import orders as orders_routes
+from app.services import group_commit
+from app.services.checkout import checkout
+from app.services.group_commit import CommitPending, GroupCommitWriter
+from tests.conftest import SQLALCHEMY_DATABASE_URL
+
+
+@pytest.fixture
+def writer(db_session):
+    """Group-commit writer on the test database, installed as the shared writer"""
+    writer = GroupCommitWriter(SQLALCHEMY_DATABASE_URL, max_batch=16, max_wait_ms=20, timeout=10)
+    writer.start()
+    group_commit.group_writer = writer
+    yield writer
+    group_commit.group_writer = None
+    writer.stop()
+
+
+def test_writer_commits_jobs_in_batches(db_session, writer):
+    """Test concurrent jobs share commits and a failing job only loses its own write"""
+    def add_product(i):
+        def job(session):
+            session.add(Product(sku=f"BD-{i:03d}", name=f"Card {i}", price=5.00))
+            session.flush()
+            if i == 3:
+                raise HTTPException(status_code=400, detail="rejected")
+            return i
+        return writer.submit(job)
+
+    results = []
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        for future in [pool.submit(add_product, i) for i in range(8)]:
+            try:
+                results.append(future.result())
+            except HTTPException:
+                results.append(None)
+
+    assert results == [0, 1, 2, None, 4, 5, 6, 7]
+    assert sorted(sku for (sku,) in db_session.query(Product.sku)) == [
+        f"BD-{i:03d}" for i in (0, 1, 2, 4, 5, 6, 7)
+    ]
+    assert writer.stats()["jobs"] == 7
+    assert writer.stats()["batches"] < 7
+
+
+def test_create_order_through_writer(client, db_session, auth_headers, writer):
+    """Test checkout goes through the writer and keeps stock rules"""
+    card = Product(sku="BD-001", name="Birthday Card", price=5.00, on_hand=1)
+    db_session.add(card)
+    db_session.commit()
+
+    order = {
+        "items": [{"product_id": card.id, "qty": 1, "unit_price": 5.00}],
+        "subtotal": 5.00, "tax_total": 0.0, "total": 5.00
+    }
+    response = client.post("/orders", json=order, headers=auth_headers)
+    assert response.status_code == 201
+    assert response.json()["items"][0]["product"]["on_hand"] == 0
+
+    response = client.post("/orders", json=order, headers=auth_headers)
+    assert response.status_code == 400
+    assert writer.stats()["jobs"] == 1
+    assert db_session.query(Order).count() == 1
+
+
+def test_submit_timeout_cancels_only_jobs_not_started(db_session):
+    """Test a timed-out job is cancelled if still queued and reported pending if running"""
+    writer = GroupCommitWriter(SQLALCHEMY_DATABASE_URL, max_batch=1, max_wait_ms=0, timeout=0.2)
+    writer.start()
+    started, finish = threading.Event(), threading.Event()
+
+    def slow_job(session):
+        started.set()
+        finish.wait(5)
+        return "committed"
+
+    try:
+        with pytest.raises(CommitPending) as exc_info:
+            writer.submit(slow_job)
+        assert started.is_set()
+
+        # Queued behind the running job: cancelled, never runs
+        with pytest.raises(HTTPException) as queued:
+            writer.submit(lambda session: "never")
+        assert queued.value.status_code == 503
+
+        finish.set()
+        assert exc_info.value.future.result(timeout=5) == "committed"
+    finally:
+        finish.set()
+        writer.stop()
+    assert writer.stats()["jobs"] == 1
+
+
+def test_create_order_timeout_keeps_idempotency_key(client, db_session, auth_headers, writer, monkeypatch):
+    """Test a checkout that outlives its request is reported to retries, not duplicated"""
+    card = Product(sku="BD-001", name="Birthday Card", price=5.00, on_hand=5)
+    db_session.add(card)
+    db_session.commit()
+
+    finish = threading.Event()
+
+    def slow_checkout(*args):
+        finish.wait(5)
+        return checkout(*args)
+
+    monkeypatch.setattr(writer, "timeout", 0.2)
+    monkeypatch.setattr(orders_routes, "checkout", slow_checkout)
+    order = {
+        "items": [{"product_id": card.id, "qty": 1, "unit_price": 5.00}],
+        "subtotal": 5.00, "tax_total": 0.0, "total": 5.00
+    }
+    headers = {**auth_headers, "Idempotency-Key": "register-1-sale-7"}
+    assert client.post("/orders", json=order, headers=headers).status_code == 504
+    assert client.post("/orders", json=order, headers=headers).status_code == 409
+
+    finish.set()
+    writer.stop()
+    stored = db_session.query(Order).one()
+    retry = client.post("/orders", json=order, headers=headers)
+    assert retry.status_code == 201
+    assert retry.json() == {"id": stored.id, "order_number": stored.order_number}
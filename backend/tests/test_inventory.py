@@ -0,0 +1,166 @@
+"""
+Tests for inventory services
+"""
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event, inspect
+
+from app.config import settings
+from app.migrations import upgrade_schema
+from app.models import Product
+from app.services.inventory import decrement_inventory, decrement_stock
+from app.services.stock_ledger import reconcile_stock, stock_as_of
+from tests.conftest import TestingSessionLocal, engine
+
+
+def test_decrement_inventory_rejects_stale_sale(db_session, test_user, monkeypatch):
+    """Test two registers cannot both sell the last unit"""
+    monkeypatch.setattr(settings, "inventory_mode", "atomic")
+    card = Product(sku="BD-001", name="Birthday Card", price=5.00, on_hand=1)
+    db_session.add(card)
+    db_session.commit()
+
+    other = TestingSessionLocal()
+    try:
+        # Both registers have seen one unit in stock
+        assert card.on_hand == 1
+        assert other.get(Product, card.id).on_hand == 1
+
+        decrement_inventory(other, card.id, 1, "Sale", test_user.id)
+        other.commit()
+    finally:
+        other.close()
+
+    with pytest.raises(HTTPException) as exc_info:
+        decrement_inventory(db_session, card.id, 1, "Sale", test_user.id)
+    assert exc_info.value.status_code == 400
+    assert "Available: 0" in exc_info.value.detail
+    db_session.rollback()
+    assert card.on_hand == 0
+
+
+def test_decrement_stock_batch_is_all_or_nothing(db_session):
+    """Test a short product leaves every product in the batch unchanged"""
+    products = [
+        Product(sku=f"BD-{i:03d}", name=f"Card {i}", price=5.00, on_hand=2) for i in range(3)
+    ]
+    db_session.add_all(products)
+    db_session.commit()
+
+    with pytest.raises(HTTPException) as exc_info:
+        decrement_stock(db_session, {products[0].id: 1, products[1].id: 3, products[2].id: 2})
+    assert exc_info.value.detail == "Insufficient inventory for Card 1. Available: 2, Requested: 3"
+    assert [p.on_hand for p in products] == [2, 2, 2]
+
+    decrement_stock(db_session, {products[0].id: 1, products[2].id: 2})
+    db_session.commit()
+    assert [p.on_hand for p in products] == [1, 2, 0]
+
+
+def test_checkout_in_locking_mode(client, db_session, auth_headers, monkeypatch):
+    """Test checkout still works with SELECT ... FOR UPDATE stock changes"""
+    monkeypatch.setattr(settings, "inventory_mode", "locking")
+    card = Product(sku="BD-001", name="Birthday Card", price=5.00, on_hand=2)
+    db_session.add(card)
+    db_session.commit()
+
+    order = {
+        "items": [{"product_id": card.id, "qty": 2, "unit_price": 5.00}],
+        "subtotal": 10.00, "tax_total": 0.0, "total": 10.00
+    }
+    assert client.post("/orders", json=order, headers=auth_headers).status_code == 201
+    response = client.post("/orders", json=order, headers=auth_headers)
+    assert response.status_code == 400
+    assert "Available: 0" in response.json()["detail"]
+
+
+def test_checkpoints_answer_as_of_and_reconciliation(
+    client, db_session, auth_headers, manager_headers, query_counter
+):
+    """Test stock as of a time and reconciliation read checkpoint plus ledger tail"""
+    card = Product(sku="BD-001", name="Birthday Card", price=5.00, on_hand=10)
+    blank = Product(sku="BL-001", name="Blank Card", price=2.00, on_hand=4)
+    db_session.add_all([card, blank])
+    db_session.commit()
+
+    assert client.post("/inventory/checkpoints", headers=manager_headers).json()["created"] == 2
+    before_sale = datetime.utcnow()
+    order = {
+        "items": [{"product_id": card.id, "qty": 3, "unit_price": 5.00}],
+        "subtotal": 15.00, "tax_total": 1.28, "total": 16.28
+    }
+    response = client.post("/orders", json=order, headers=auth_headers)
+    assert response.status_code == 201
+    after_sale = datetime.utcnow()
+
+    def as_of(at):
+        query_counter.clear()
+        response = client.get("/inventory/as-of", params={"at": at.isoformat()}, headers=auth_headers)
+        # Auth user lookup + one ledger query
+        assert len(query_counter) == 2
+        return [(row["product_id"], row["on_hand"]) for row in response.json()]
+
+    assert as_of(before_sale) == [(card.id, 10), (blank.id, 4)]
+    assert as_of(after_sale) == [(card.id, 7), (blank.id, 4)]
+
+    report = client.get("/inventory/reconciliation", headers=manager_headers).json()
+    assert report == {"checked": 2, "mismatches": []}
+
+    # A damaged return is written off, so it nets to zero in the ledger
+    item_id = response.json()["items"][0]["id"]
+    client.post("/returns", json={
+        "order_id": response.json()["id"],
+        "items": [{"order_item_id": item_id, "qty": 1, "damaged": True}]
+    }, headers=auth_headers)
+    report = client.get("/inventory/reconciliation", headers=manager_headers).json()
+    assert report == {"checked": 2, "mismatches": []}
+    assert as_of(datetime.utcnow()) == [(card.id, 7), (blank.id, 4)]
+
+    # A stock change that bypassed the ledger shows up as drift
+    blank.on_hand = 6
+    db_session.commit()
+    report = client.get("/inventory/reconciliation", headers=manager_headers).json()
+    assert report["mismatches"] == [{
+        "product_id": blank.id, "sku": "BL-001", "on_hand": 6, "ledger_on_hand": 4, "difference": 2
+    }]
+
+    # Only products that moved get a new checkpoint
+    assert client.post("/inventory/checkpoints", headers=manager_headers).json()["created"] == 1
+    assert client.post("/inventory/checkpoints", headers=manager_headers).json()["created"] == 0
+    assert as_of(datetime.utcnow()) == [(card.id, 7), (blank.id, 4)]
+
+
+def test_ledger_tail_is_bounded_by_the_checkpoint_index(db_session):
+    """Test as-of and reconciliation seek each product's tail by movement id"""
+    # The retired (product_id, created_at) index is dropped on upgrade
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            "CREATE INDEX ix_inventory_movements_product_created "
+            "ON inventory_movements (product_id, created_at)"
+        )
+    upgrade_schema(engine)
+    assert sorted(index["name"] for index in inspect(engine).get_indexes("inventory_movements")) == [
+        "ix_inventory_movements_id", "ix_inventory_movements_product_id_id"
+    ]
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        reconcile_stock(db_session)
+        stock_as_of(db_session, datetime.utcnow())
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    for statement, parameters in statements:
+        plan = " ".join(
+            row[-1] for row in db_session.connection().exec_driver_sql(
+                f"EXPLAIN QUERY PLAN {statement}", parameters
+            )
+        )
+        assert "ix_inventory_movements_product_id_id (product_id=? AND id>?)" in plan
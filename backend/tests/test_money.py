@@ -0,0 +1,87 @@
+"""
+Integer cents money tests
+"""
+from fractions import Fraction
+
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.migrations import upgrade_schema
+from app.models import Order, Product
+from app.money import cents_values, round_cents, to_cents
+
+
+def test_to_cents_rounds_half_up():
+    """Test currency amounts convert to exact cents"""
+    assert [to_cents(a) for a in (4.99, 0.1 + 0.2, 1.005, 2.675, 19.999)] == [499, 30, 101, 268, 2000]
+    # Exact half cents round up, whatever their binary float product
+    # (200 * 0.0725 is 14.499999999999998 in floats)
+    assert [round_cents(200, 0.0725), round_cents(10, 0.05), round_cents(2999, Fraction(1, 3))] == [
+        15, 1, 1000
+    ]
+    assert cents_values(Product, {"sku": "A", "price": 4.99, "cost": None}) == {
+        "sku": "A", "price_cents": 499, "cost_cents": None
+    }
+
+
+def test_upgrade_converts_float_money_columns(tmp_path):
+    """Test legacy float money columns move to cents once, keeping the data"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            "CREATE TABLE products (id INTEGER PRIMARY KEY, sku VARCHAR(100) NOT NULL, "
+            "barcode VARCHAR(100), name VARCHAR(255) NOT NULL, description TEXT, "
+            "category VARCHAR(100), price FLOAT NOT NULL, cost FLOAT NOT NULL, "
+            "taxable BOOLEAN NOT NULL, reorder_threshold INTEGER NOT NULL, "
+            "reorder_qty INTEGER NOT NULL, location VARCHAR(100), status VARCHAR(8) NOT NULL, "
+            "on_hand INTEGER NOT NULL, created_at DATETIME NOT NULL)"
+        )
+        connection.exec_driver_sql(
+            "INSERT INTO products VALUES (1, 'BD-001', NULL, 'Birthday Card', NULL, NULL, "
+            "4.99, 1.2049999, 1, 10, 50, NULL, 'ACTIVE', 3, '2024-01-01 00:00:00')"
+        )
+
+    Base.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
+    upgrade_schema(engine)
+
+    columns = {c["name"] for c in inspect(engine).get_columns("products")}
+    assert {"price_cents", "cost_cents"} <= columns
+    assert not {"price", "cost"} & columns
+    with engine.connect() as connection:
+        row = connection.execute(text("SELECT price_cents, cost_cents FROM products")).one()
+    assert tuple(row) == (499, 120)
+
+    session = sessionmaker(bind=engine)()
+    product = session.get(Product, 1)
+    assert (product.price, product.cost) == (4.99, 1.2)
+    session.add(Product(sku="BL-001", name="Blank Card", price=2.5))
+    session.commit()
+    assert session.query(Product.sku).filter(Product.price > 4).all() == [("BD-001",)]
+    session.close()
+    engine.dispose()
+
+
+def test_order_money_is_stored_in_cents(client, db_session, auth_headers):
+    """Test checkout stores exact cents and returns refund exact fractions"""
+    card = Product(sku="BD-001", name="Birthday Card", price=0.10, on_hand=10)
+    db_session.add(card)
+    db_session.commit()
+
+    order = {
+        "items": [{"product_id": card.id, "qty": 3, "unit_price": 0.10}],
+        "subtotal": 0.30, "tax_total": 0.03, "total": 0.33
+    }
+    response = client.post("/orders", json=order, headers=auth_headers)
+    assert response.json()["items"][0]["line_total"] == 0.3
+
+    stored = db_session.query(Order).one()
+    assert (stored.subtotal_cents, stored.total_cents, stored.items[0].line_total_cents) == (30, 33, 30)
+
+    response = client.post("/returns", json={
+        "order_id": stored.id,
+        "items": [{"order_item_id": stored.items[0].id, "qty": 2}],
+        "reason": "Changed mind"
+    }, headers=auth_headers)
+    assert response.json()["refund_amount"] == 0.2
@@ -0,0 +1,378 @@
+"""
+Tests for order endpoints
+"""
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from app.config import settings
+from app.models import Order, OrderItem, Product
+from app.schemas import OrderCreate
+from app.services.checkout import checkout_batch
+from app.services.idempotency import IdempotencyStore
+from app.services.order_numbers import OrderNumberAllocator
+
+
+def test_list_orders_cursor_pagination(client, db_session, test_user, auth_headers):
+    """Test cursor pages are newest first and break created_at ties by id"""
+    created_at = datetime(2024, 1, 1, 12, 0, 0)
+    for i in range(5):
+        db_session.add(Order(
+            order_number=f"ORD-20240101-{i + 1:04d}",
+            cashier_id=test_user.id,
+            # Two orders share a timestamp
+            created_at=created_at + timedelta(minutes=min(i, 3)),
+            total=1.0
+        ))
+    db_session.commit()
+
+    seen = []
+    response = client.get("/orders", params={"limit": 2}, headers=auth_headers)
+    while True:
+        seen.extend(o["order_number"] for o in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+        response = client.get("/orders", params={"limit": 2, "cursor": cursor},
+                              headers=auth_headers)
+
+    assert seen == [f"ORD-20240101-{i:04d}" for i in (5, 4, 3, 2, 1)]
+
+
+def test_create_order_numbers_are_sequential(client, db_session, auth_headers):
+    """Test checkout numbers orders from the per-day sequence"""
+    card = Product(sku="BD-001", name="Birthday Card", price=5.00, on_hand=10)
+    db_session.add(card)
+    db_session.commit()
+
+    order = {
+        "items": [{"product_id": card.id, "qty": 1, "unit_price": 5.00}],
+        "subtotal": 5.00, "tax_total": 0.0, "total": 5.00
+    }
+    numbers = []
+    for _ in range(3):
+        response = client.post("/orders", json=order, headers=auth_headers)
+        assert response.status_code == 201
+        numbers.append(response.json()["order_number"])
+
+    day = datetime.utcnow().strftime("%Y%m%d")
+    assert numbers == [f"ORD-{day}-{i:04d}" for i in (1, 2, 3)]
+
+
+def test_order_number_blocks_do_not_collide(db_session):
+    """Test workers reserving blocks from the same day never share a number"""
+    first = OrderNumberAllocator(block_size=3)
+    second = OrderNumberAllocator(block_size=3)
+    now = datetime(2024, 1, 1, 12, 0, 0)
+
+    numbers = [
+        allocator.next_order_number(db_session, now)
+        for allocator in (first, second, first, first, first, second)
+    ]
+
+    assert numbers == [
+        "ORD-20240101-0001", "ORD-20240101-0004", "ORD-20240101-0002",
+        "ORD-20240101-0003", "ORD-20240101-0007", "ORD-20240101-0005",
+    ]
+    # The next day starts over
+    assert first.next_order_number(db_session, now + timedelta(days=1)) == "ORD-20240102-0001"
+
+
+def test_order_number_sequence_starts_after_existing_orders(db_session, test_user):
+    """Test a day's first block continues after orders numbered before the sequence existed"""
+    for suffix in ("0002", "10000", "0999"):
+        db_session.add(Order(order_number=f"ORD-20240101-{suffix}", cashier_id=test_user.id, total=1.0))
+    db_session.add(Order(order_number="ORD-20240102-0500", cashier_id=test_user.id, total=1.0))
+    db_session.commit()
+
+    allocator = OrderNumberAllocator(block_size=3)
+    now = datetime(2024, 1, 1, 12, 0, 0)
+    assert [allocator.next_order_number(db_session, now) for _ in range(4)] == [
+        "ORD-20240101-10001", "ORD-20240101-10002", "ORD-20240101-10003", "ORD-20240101-10004"
+    ]
+    assert allocator.next_order_number(db_session, now + timedelta(days=2)) == "ORD-20240103-0001"
+
+
+def _checkout_statements(client, auth_headers, query_counter, products, qty):
+    order = {
+        "items": [{"product_id": p.id, "qty": qty, "unit_price": 5.00} for p in products],
+        "subtotal": 5.00 * qty * len(products), "tax_total": 0.0,
+        "total": 5.00 * qty * len(products)
+    }
+    query_counter.clear()
+    response = client.post("/orders", json=order, headers=auth_headers)
+    assert response.status_code == 201
+    return len(query_counter)
+
+
+def test_create_order_writes_are_constant_per_order(client, db_session, auth_headers, query_counter):
+    """Test checkout issues the same number of statements for any basket size"""
+    products = [
+        Product(sku=f"BD-{i:03d}", name=f"Card {i}", price=5.00, on_hand=10) for i in range(6)
+    ]
+    db_session.add_all(products)
+    db_session.commit()
+
+    # First checkout also reserves a block of order numbers
+    _checkout_statements(client, auth_headers, query_counter, products[:2], 1)
+    small = _checkout_statements(client, auth_headers, query_counter, products[:2], 1)
+    large = _checkout_statements(client, auth_headers, query_counter, products, 1)
+    assert small == large
+
+    db_session.expire_all()
+    assert [p.on_hand for p in products] == [7, 7, 9, 9, 9, 9]
+
+
+def test_create_order_combines_repeated_lines(client, db_session, auth_headers):
+    """Test stock is checked against the total quantity per product"""
+    card = Product(sku="BD-001", name="Birthday Card", price=5.00, on_hand=3)
+    db_session.add(card)
+    db_session.commit()
+
+    order = {
+        "items": [{"product_id": card.id, "qty": 2, "unit_price": 5.00}] * 2,
+        "subtotal": 20.00, "tax_total": 0.0, "total": 20.00
+    }
+    response = client.post("/orders", json=order, headers=auth_headers)
+    assert response.status_code == 400
+    assert "Available: 3, Requested: 4" in response.json()["detail"]
+
+    db_session.expire_all()
+    assert card.on_hand == 3
+    assert db_session.query(Order).count() == 0
+
+
+def test_create_orders_batch_reports_each_order(client, db_session, auth_headers):
+    """Test a batch upload applies orders in sequence and isolates failures"""
+    cards = [Product(sku=f"BD-{i:03d}", name=f"Card {i}", price=5.00, on_hand=2) for i in range(2)]
+    db_session.add_all(cards)
+    db_session.commit()
+
+    def order(product, qty):
+        return {
+            "items": [{"product_id": product.id, "qty": qty, "unit_price": 5.00}],
+            "subtotal": 5.00 * qty, "tax_total": 0.0, "total": 5.00 * qty
+        }
+
+    batch = {"orders": [
+        order(cards[0], 2),
+        order(cards[0], 1),  # Sold out by the first order
+        order(cards[1], 1),
+        {**order(cards[1], 1), "items": [{"product_id": 999, "qty": 1, "unit_price": 5.00}]},
+    ]}
+    response = client.post("/orders/batch", json=batch, headers=auth_headers)
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["created"], body["failed"]) == (2, 2)
+    assert [r["status_code"] for r in body["results"]] == [201, 400, 201, 404]
+    assert body["results"][2]["order"]["items"][0]["product"]["on_hand"] == 1
+    assert "Available: 0" in body["results"][1]["error"]
+
+    db_session.expire_all()
+    assert [c.on_hand for c in cards] == [0, 1]
+    assert db_session.query(Order).count() == 2
+
+
+def test_checkout_batch_rolls_back_as_one_transaction(client, db_session, test_user):
+    """Test rolling back after a batch undoes every order, not just the failed ones"""
+    card = Product(sku="BD-001", name="Birthday Card", price=5.00, on_hand=3)
+    db_session.add(card)
+    db_session.commit()
+
+    def order(qty):
+        return OrderCreate(
+            items=[{"product_id": card.id, "qty": qty, "unit_price": 5.00}],
+            subtotal=5.00 * qty, tax_total=0.0, total=5.00 * qty
+        )
+
+    outcomes = checkout_batch(
+        db_session, [order(1), order(1)], ["ORD-TEST-0001", "ORD-TEST-0002"],
+        test_user.id, test_user.email
+    )
+    assert all(isinstance(outcome, int) for outcome in outcomes)
+    db_session.rollback()
+
+    assert db_session.query(Order).count() == 0
+    assert db_session.get(Product, card.id).on_hand == 3
+
+
+@pytest.mark.parametrize("mode", ["atomic", "locking"])
+def test_checkout_batch_isolates_database_errors(client, db_session, test_user, monkeypatch, mode):
+    """Test an order the database rejects fails alone instead of aborting the batch"""
+    monkeypatch.setattr(settings, "inventory_mode", mode)
+    card = Product(sku="BD-001", name="Birthday Card", price=5.00, on_hand=3)
+    db_session.add(card)
+    db_session.commit()
+
+    order = OrderCreate(
+        items=[{"product_id": card.id, "qty": 1, "unit_price": 5.00}],
+        subtotal=5.00, tax_total=0.0, total=5.00
+    )
+    # The second order reuses the first one's number
+    outcomes = checkout_batch(
+        db_session, [order, order, order], ["ORD-TEST-0001", "ORD-TEST-0001", "ORD-TEST-0002"],
+        test_user.id, test_user.email
+    )
+    db_session.commit()
+
+    assert isinstance(outcomes[1], HTTPException) and outcomes[1].status_code == 500
+    assert all(isinstance(outcome, int) for outcome in (outcomes[0], outcomes[2]))
+    db_session.expire_all()
+    assert db_session.get(Product, card.id).on_hand == 1
+    assert db_session.query(Order).count() == 2
+
+
+def test_create_order_idempotency_key_replays_response(client, db_session, auth_headers):
+    """Test a retried checkout returns the first order without selling again"""
+    card = Product(sku="BD-001", name="Birthday Card", price=5.00, on_hand=1)
+    db_session.add(card)
+    db_session.commit()
+
+    order = {
+        "items": [{"product_id": card.id, "qty": 1, "unit_price": 5.00}],
+        "subtotal": 5.00, "tax_total": 0.0, "total": 5.00
+    }
+    headers = {**auth_headers, "Idempotency-Key": "register-1-sale-42"}
+    first = client.post("/orders", json=order, headers=headers)
+    retry = client.post("/orders", json=order, headers=headers)
+
+    assert first.status_code == retry.status_code == 201
+    assert retry.json() == first.json()
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert db_session.query(Order).count() == 1
+
+    # Same key with a different basket is rejected
+    response = client.post("/orders", json={**order, "total": 6.00}, headers=headers)
+    assert response.status_code == 422
+
+
+def test_create_order_idempotency_key_not_stored_on_failure(client, db_session, auth_headers):
+    """Test a failed checkout can be retried with the same key"""
+    card = Product(sku="BD-001", name="Birthday Card", price=5.00, on_hand=0)
+    db_session.add(card)
+    db_session.commit()
+
+    order = {
+        "items": [{"product_id": card.id, "qty": 1, "unit_price": 5.00}],
+        "subtotal": 5.00, "tax_total": 0.0, "total": 5.00
+    }
+    headers = {**auth_headers, "Idempotency-Key": "register-1-sale-43"}
+    assert client.post("/orders", json=order, headers=headers).status_code == 400
+
+    card.on_hand = 1
+    db_session.commit()
+    response = client.post("/orders", json=order, headers=headers)
+    assert response.status_code == 201
+    assert "Idempotent-Replayed" not in response.headers
+
+
+def test_idempotency_key_in_progress_conflicts():
+    """Test a key cannot be claimed twice while the first request runs"""
+    store = IdempotencyStore(max_size=10, ttl_seconds=60)
+    payload = OrderCreate(cart_id="cart", subtotal=0, tax_total=0, total=1)
+
+    with store.claim("orders", 1, "key", payload):
+        with pytest.raises(HTTPException) as exc_info:
+            store.claim("orders", 1, "key", payload)
+        assert exc_info.value.status_code == 409
+        # Keys are scoped per user
+        assert store.claim("orders", 2, "key", payload).replay is None
+
+    # Released without a stored response
+    assert store.claim("orders", 1, "key", payload).replay is None
+
+
+def test_idempotency_key_deferred_until_pending_write_ends():
+    """Test a key whose write outlived the request is settled by the write's outcome"""
+    store = IdempotencyStore(max_size=10, ttl_seconds=60)
+    payload = OrderCreate(cart_id="cart")
+
+    for key, outcome in (("failed", RuntimeError("commit failed")), ("committed", 7)):
+        pending = Future()
+        with store.claim("orders", 1, key, payload) as claim:
+            claim.defer(pending, 201, lambda order_id: {"id": order_id})
+        with pytest.raises(HTTPException) as exc_info:
+            store.claim("orders", 1, key, payload)
+        assert exc_info.value.status_code == 409
+
+        if isinstance(outcome, Exception):
+            pending.set_exception(outcome)
+            assert store.claim("orders", 1, key, payload).replay is None
+        else:
+            pending.set_result(outcome)
+            replay = store.claim("orders", 1, key, payload).replay
+            assert (replay.status_code, json.loads(replay.body)) == (201, {"id": 7})
+
+
+def _create_orders(client, db_session, auth_headers, count, lines):
+    products = [
+        Product(sku=f"BD-{i:03d}", name=f"Card {i}", price=5.00, on_hand=100) for i in range(lines)
+    ]
+    db_session.add_all(products)
+    db_session.commit()
+    order = {
+        "items": [{"product_id": p.id, "qty": 1, "unit_price": 5.00} for p in products],
+        "subtotal": 5.00 * lines, "tax_total": 0.0, "total": 5.00 * lines,
+        "payment_details": {"method": "cash"}
+    }
+    return [
+        client.post("/orders", json=order, headers=auth_headers).json() for _ in range(count)
+    ]
+
+
+def test_order_reads_use_fixed_query_count(client, db_session, auth_headers, query_counter):
+    """Test order endpoints eager-load lines and products"""
+    orders = _create_orders(client, db_session, auth_headers, count=5, lines=4)
+    order_id, order_number = orders[0]["id"], orders[0]["order_number"]
+
+    def statements(method, url, **kwargs):
+        # Start from an expired identity map, as a new request would
+        db_session.expire_all()
+        query_counter.clear()
+        response = client.request(method, url, headers=auth_headers, **kwargs)
+        assert response.status_code == 200
+        return len(query_counter)
+
+    # Auth user lookup + orders + items + products
+    assert statements("GET", "/orders") == 4
+    assert statements("GET", f"/orders/{order_id}") == 4
+    # Auth user lookup + stored receipt by primary key
+    assert statements("POST", f"/orders/{order_id}/receipt") == 2
+    assert statements("GET", "/returns/lookup", params={"search": order_number}) == 4
+
+
+def test_receipt_keeps_names_at_time_of_sale(client, db_session, auth_headers, test_user):
+    """Test reprints return the receipt rendered at checkout"""
+    order = _create_orders(client, db_session, auth_headers, count=1, lines=2)[0]
+    product = db_session.get(Product, order["items"][0]["product_id"])
+    product.name = "Renamed Card"
+    db_session.commit()
+
+    receipt = client.post(f"/orders/{order['id']}/receipt", headers=auth_headers).json()
+    assert receipt["order_number"] == order["order_number"]
+    assert [item["name"] for item in receipt["items"]] == ["Card 0", "Card 1"]
+    assert receipt["payment_method"] == "cash"
+    assert receipt["cashier"] == test_user.email
+    assert receipt["total"] == 10.0
+
+
+def test_receipt_for_order_without_snapshot(client, db_session, auth_headers, test_user):
+    """Test orders created before receipt snapshots get one on first reprint"""
+    card = Product(sku="BD-001", name="Birthday Card", price=5.00, on_hand=1)
+    order = Order(order_number="ORD-20240101-0001", cashier_id=test_user.id, total=5.0)
+    db_session.add_all([card, order])
+    db_session.flush()
+    db_session.add(OrderItem(order_id=order.id, product_id=card.id, qty=1, unit_price=5.0, line_total=5.0))
+    db_session.commit()
+
+    response = client.post(f"/orders/{order.id}/receipt", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["items"][0]["name"] == "Birthday Card"
+    assert response.json()["payment_method"] == "Unknown"
+    db_session.expire_all()
+    assert order.receipt_json is not None
+
+    assert client.post("/orders/999/receipt", headers=auth_headers).status_code == 404
@@ -0,0 +1,328 @@
+"""
+Tests for product endpoints
+"""
+from fastapi import status
+from sqlalchemy import event
+
+from app.services.search_index import ProductSearchIndex
+from app.services.fuzzy import DeletionIndex
+from app.services.product_cache import ProductCache
+from app.models import AuditLog, Product, ProductStatus
+from tests.conftest import engine
+
+
+def create_product(client, headers, **overrides):
+    """Create a product through the API"""
+    data = {
+        "sku": "BD-001",
+        "barcode": "100000000001",
+        "name": "Happy Birthday Card",
+        "category": "Birthday",
+        "price": 4.99,
+    }
+    data.update(overrides)
+    response = client.post("/products", json=data, headers=headers)
+    assert response.status_code == status.HTTP_201_CREATED
+    return response.json()
+
+
+def test_index_prefix_search():
+    """Test every query token must prefix-match a product token"""
+    index = ProductSearchIndex()
+    index.upsert(Product(id=1, sku="BD-001", barcode="111", name="Happy Birthday Card",
+                         status=ProductStatus.ACTIVE))
+    index.upsert(Product(id=2, sku="AN-001", barcode="222", name="Happy Anniversary Card",
+                         status=ProductStatus.ACTIVE))
+
+    assert index.search("happy", 10) == [1, 2]
+    assert index.search("hap birth", 10) == [1]
+    assert index.search("an-001", 10) == [2]
+    assert index.search("sympathy", 10) == []
+
+    index.upsert(Product(id=1, sku="BD-001", barcode="111", name="Happy Birthday Card",
+                         status=ProductStatus.DISCONTINUED))
+    assert index.search("happy", 10) == [2]
+
+
+def test_search_uses_index_and_stays_in_sync(client, manager_headers):
+    """Test search reflects product create, update and delete"""
+    product = create_product(client, manager_headers)
+
+    response = client.get("/products/search", params={"q": "birth"})
+    assert [p["id"] for p in response.json()] == [product["id"]]
+
+    client.patch(f"/products/{product['id']}", json={"name": "Warm Wishes Card"},
+                 headers=manager_headers)
+    assert client.get("/products/search", params={"q": "birth"}).json() == []
+    assert len(client.get("/products/search", params={"q": "wishes"}).json()) == 1
+
+    client.delete(f"/products/{product['id']}", headers=manager_headers)
+    assert client.get("/products/search", params={"q": "wishes"}).json() == []
+
+
+def test_search_falls_back_to_substring(client, manager_headers):
+    """Test substring matches still work through the SQL fallback"""
+    create_product(client, manager_headers)
+
+    response = client.get("/products/search", params={"q": "irthda"})
+    assert len(response.json()) == 1
+
+
+def test_fts_search_ranks_by_relevance(client, manager_headers):
+    """Test full-text search matches description and ranks name hits first"""
+    create_product(client, manager_headers, sku="BD-001", barcode=None,
+                   name="Floral Card", description="Birthday flowers")
+    create_product(client, manager_headers, sku="BD-002", barcode=None,
+                   name="Birthday Balloons Card", description="Bright balloons")
+
+    response = client.get("/products/search", params={"q": "birthday", "mode": "fts"})
+    assert [p["sku"] for p in response.json()] == ["BD-002", "BD-001"]
+
+    response = client.get("/products", params={"search": "balloon", "mode": "fts"})
+    assert [p["sku"] for p in response.json()] == ["BD-002"]
+
+
+def test_fts_index_follows_updates(client, manager_headers):
+    """Test triggers keep the FTS table current"""
+    product = create_product(client, manager_headers)
+    client.patch(f"/products/{product['id']}", json={"name": "Sympathy Lilies"},
+                 headers=manager_headers)
+
+    assert client.get("/products/search", params={"q": "happy", "mode": "fts"}).json() == []
+    response = client.get("/products/search", params={"q": "lilies", "mode": "fts"})
+    assert len(response.json()) == 1
+
+
+def test_scan_resolves_barcode_and_sku(client, manager_headers, db_session):
+    """Test scanning resolves exact codes from the index and the database"""
+    product = create_product(client, manager_headers)
+
+    response = client.get("/products/scan", params={"code": "100000000001"})
+    assert response.json()["id"] == product["id"]
+    response = client.get("/products/scan", params={"code": "BD-001"})
+    assert response.json()["id"] == product["id"]
+    assert client.get("/products/scan", params={"code": "1000"}).status_code == 404
+
+    # Products written outside this process are found by the fallback query
+    db_session.add(Product(sku="HO-001", barcode="200000000001", name="Holiday Card", price=3.5))
+    db_session.commit()
+    response = client.get("/products/scan", params={"code": "200000000001"})
+    assert response.json()["sku"] == "HO-001"
+
+
+def test_fuzzy_search_tolerates_typos(client, manager_headers):
+    """Test misspelled names still find products"""
+    anniversary = create_product(client, manager_headers, sku="AN-001", barcode=None,
+                                 name="Happy Anniversary Card", category="Anniversary")
+    sympathy = create_product(client, manager_headers, sku="SY-001", barcode=None,
+                              name="With Sympathy Card", category="Sympathy")
+
+    response = client.get("/products/search", params={"q": "annivesary", "mode": "fuzzy"})
+    assert [p["id"] for p in response.json()] == [anniversary["id"]]
+    response = client.get("/products/search", params={"q": "sympthy crd", "mode": "fuzzy"})
+    assert [p["id"] for p in response.json()] == [sympathy["id"]]
+
+    # Renamed products drop their old tokens from the deletion dictionary
+    client.patch(f"/products/{sympathy['id']}", json={"name": "Thinking of You"},
+                 headers=manager_headers)
+    response = client.get("/products/search", params={"q": "sympthy", "mode": "fuzzy"})
+    assert response.json() == []
+
+
+def test_deletion_index_distances():
+    """Test the deletion dictionary respects per-length edit distances"""
+    index = DeletionIndex()
+    for token in ("birthday", "card", "cat"):
+        index.add(token)
+
+    assert index.lookup("brithday") == {"birthday": 1}
+    assert index.lookup("bithdy") == {"birthday": 2}
+    assert index.lookup("crd") == {"card": 1}
+    assert index.lookup("cta") == {"cat": 1}
+    assert index.lookup("ca") == {}
+
+    index.remove("card")
+    assert index.lookup("crd") == {}
+
+
+def test_list_products_cursor_pagination(client, db_session):
+    """Test following X-Next-Cursor walks every product exactly once"""
+    for i in range(5):
+        db_session.add(Product(sku=f"BL-{i:03d}", name=f"Blank Card {i}", price=2.0))
+    db_session.commit()
+
+    seen = []
+    response = client.get("/products", params={"limit": 2})
+    while True:
+        seen.extend(p["sku"] for p in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+        response = client.get("/products", params={"limit": 2, "cursor": cursor})
+
+    assert seen == [f"BL-{i:03d}" for i in range(5)]
+    assert client.get("/products", params={"cursor": "not-a-cursor"}).status_code == 400
+
+
+def test_catalog_version_and_changes_feed(client, manager_headers):
+    """Test every product mutation advances the catalog version"""
+    first = create_product(client, manager_headers)
+    second = create_product(client, manager_headers, sku="BD-002", barcode=None)
+    version = client.get("/products/catalog/version").json()["version"]
+    assert version == 2
+
+    client.patch(f"/products/{first['id']}", json={"price": 5.99}, headers=manager_headers)
+    client.delete(f"/products/{second['id']}", headers=manager_headers)
+
+    changes = client.get("/products/catalog/changes", params={"since": version}).json()
+    assert [p["id"] for p in changes["products"]] == [first["id"], second["id"]]
+    assert changes["products"][1]["status"] == "discontinued"
+    assert changes["version"] == 4
+    assert not changes["has_more"]
+
+    page = client.get("/products/catalog/changes", params={"since": 0, "limit": 1}).json()
+    assert page["has_more"]
+    rest = client.get("/products/catalog/changes", params={
+        "since": page["version"], "after_id": page["after_id"]
+    }).json()
+    assert len(page["products"]) + len(rest["products"]) == 2
+
+
+def test_catalog_snapshot(client, manager_headers):
+    """Test the snapshot is gzipped, versioned and supports ETags"""
+    create_product(client, manager_headers)
+
+    response = client.get("/products/catalog/snapshot")
+    assert response.headers["content-encoding"] == "gzip"
+    snapshot = response.json()
+    assert snapshot["version"] == 1
+    assert [p["sku"] for p in snapshot["products"]] == ["BD-001"]
+
+    etag = response.headers["etag"]
+    response = client.get("/products/catalog/snapshot", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+
+def test_bulk_import_csv_reports_row_errors(client, manager_headers):
+    """Test CSV import creates valid rows and reports the rest"""
+    create_product(client, manager_headers, sku="EX-001", barcode="300000000001")
+    csv_data = (
+        "sku,barcode,name,category,price,taxable\n"
+        "IM-001,400000000001,Imported Birthday Card,Birthday,3.99,true\n"
+        "IM-002,,Imported Blank Card,Blank,2.49,false\n"
+        "IM-001,,Duplicate Row,Blank,1.00,true\n"
+        "EX-001,,Existing Sku,Blank,1.00,true\n"
+        "IM-003,300000000001,Barcode Clash,Blank,1.00,true\n"
+        "IM-004,,Bad Price,Blank,free,true\n"
+        "IM-005,,Bad Category,Toys,1.00,true\n"
+    )
+    response = client.post(
+        "/products/import",
+        files={"file": ("catalog.csv", csv_data, "text/csv")},
+        headers=manager_headers
+    )
+    assert response.status_code == 200
+    result = response.json()
+    assert (result["created"], result["updated"], result["failed"]) == (2, 0, 5)
+    assert [e["row"] for e in result["errors"]] == [3, 6, 7, 4, 5]
+
+    # Imported products are searchable and scannable right away
+    assert len(client.get("/products/search", params={"q": "imported"}).json()) == 2
+    response = client.get("/products/scan", params={"code": "400000000001"})
+    assert response.json()["taxable"] is True
+
+
+def test_bulk_import_jsonl_upsert(client, manager_headers):
+    """Test JSONL upsert updates existing SKUs in place"""
+    existing = create_product(client, manager_headers)
+    jsonl_data = (
+        '{"sku": "BD-001", "name": "Happy Birthday Card", "price": 5.49}\n'
+        '{"sku": "BD-002", "name": "Birthday Wishes Card", "price": 3.99}\n'
+        'not json\n'
+    )
+    response = client.post(
+        "/products/import",
+        params={"upsert": True},
+        files={"file": ("catalog.jsonl", jsonl_data, "application/x-ndjson")},
+        headers=manager_headers
+    )
+    result = response.json()
+    assert (result["created"], result["updated"], result["failed"]) == (1, 1, 1)
+
+    product = client.get(f"/products/{existing['id']}").json()
+    assert product["price"] == 5.49
+    assert product["barcode"] == existing["barcode"]
+
+
+def test_bulk_update_reprices_by_filter(client, manager_headers, db_session):
+    """Test a percentage price change hits only matching products, once"""
+    create_product(client, manager_headers, sku="BD-001", barcode=None, price=10.00)
+    create_product(client, manager_headers, sku="BD-002", barcode=None, price=4.99)
+    other = create_product(client, manager_headers, sku="HO-001", barcode=None,
+                           category="Holiday", price=10.00)
+
+    response = client.post("/products/bulk-update", json={
+        "filter": {"category": "Birthday", "sku_prefix": "BD-"},
+        "changes": {"price_adjust_percent": -10, "location": "Aisle 9"}
+    }, headers=manager_headers)
+    assert response.status_code == 200
+    assert response.json() == {"affected": 2, "catalog_version": 4}
+
+    products = {p["sku"]: p for p in client.get("/products").json()}
+    assert products["BD-001"]["price"] == 9.00
+    assert products["BD-002"]["price"] == 4.49
+    assert products["BD-002"]["location"] == "Aisle 9"
+    assert products["HO-001"]["price"] == other["price"]
+
+    changes = client.get("/products/catalog/changes", params={"since": 3}).json()
+    assert [p["sku"] for p in changes["products"]] == ["BD-001", "BD-002"]
+
+    audit = db_session.query(AuditLog).filter(AuditLog.action == "bulk_update").one()
+    assert audit.entity_id == 4
+
+
+def test_bulk_update_requires_filter_and_changes(client, manager_headers):
+    """Test empty filters or changes are rejected"""
+    response = client.post("/products/bulk-update", json={
+        "filter": {}, "changes": {"price": 1.0}
+    }, headers=manager_headers)
+    assert response.status_code == 400
+
+    response = client.post("/products/bulk-update", json={
+        "filter": {"ids": [1]}, "changes": {}
+    }, headers=manager_headers)
+    assert response.status_code == 400
+
+
+def test_product_cache_hits_and_invalidation(client, manager_headers):
+    """Test get_product is served from cache until the product changes"""
+    product = create_product(client, manager_headers)
+
+    client.get(f"/products/{product['id']}")
+    client.get(f"/products/{product['id']}")
+    stats = client.get("/products/cache/stats", headers=manager_headers).json()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+
+    client.patch(f"/products/{product['id']}", json={"price": 6.49}, headers=manager_headers)
+    assert client.get(f"/products/{product['id']}").json()["price"] == 6.49
+    stats = client.get("/products/cache/stats", headers=manager_headers).json()
+    assert stats["misses"] == 2
+
+
+def test_product_cache_skips_rows_invalidated_while_loading(db_session):
+    """Test a snapshot read before a concurrent invalidation is not cached"""
+    product = Product(sku="BD-001", name="Birthday Card", price=4.99)
+    db_session.add(product)
+    db_session.commit()
+    product_id = product.id
+    cache = ProductCache(max_size=10, ttl_seconds=60)
+
+    # Another request commits a change between the cache's read and its store
+    event.listen(
+        engine, "before_cursor_execute", lambda *args: cache.invalidate(product_id), once=True
+    )
+    assert cache.get(db_session, product_id).price == 4.99
+    assert cache.stats()["size"] == 0
+
+    cache.get(db_session, product_id)
+    assert cache.stats()["size"] == 1
@@ -0,0 +1,116 @@
+"""
+Stock reservation tests
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from app.config import settings
+from app.models import Product
+from app.services import cart_sessions, reservations as reservations_module
+from app.services.cart_sessions import CartStore
+from app.services.reservations import ReservationBook
+
+
+def test_reservations_expire_after_ttl(monkeypatch):
+    """Test holds count toward reserved stock until their TTL passes"""
+    now = [100.0]
+    monkeypatch.setattr(reservations_module.time, "monotonic", lambda: now[0])
+    book = ReservationBook(ttl_seconds=10)
+
+    book.hold("a", 1, 3)
+    book.hold("b", 1, 2)
+    assert book.reserved(1) == 5
+    assert book.reserved(1, exclude="a") == 2
+    assert book.available(1, on_hand=6, exclude="b") == 3
+
+    # Renewing a hold pushes its deadline back; the stale heap entry is skipped
+    now[0] = 105.0
+    book.hold("a", 1, 4)
+    now[0] = 111.0
+    assert book.reserved_many([1, 2]) == {1: 4}
+
+    now[0] = 116.0
+    assert book.reserved(1) == 0
+
+    book.hold("c", 2, 1)
+    book.release("c")
+    assert book.reserved_many([2]) == {}
+
+
+def test_cart_access_renews_its_reservations(monkeypatch):
+    """Test a live cart's holds do not lapse before the cart itself"""
+    now = [100.0]
+    monkeypatch.setattr(reservations_module.time, "monotonic", lambda: now[0])
+    book = ReservationBook(ttl_seconds=10)
+    monkeypatch.setattr(cart_sessions, "reservations", book)
+    store = CartStore(max_size=10, ttl_seconds=10)
+
+    cart = store.create(user_id=1)
+    book.hold(cart.id, 1, 2)
+    now[0] = 108.0
+    store.get(cart.id, 1)
+    now[0] = 116.0
+    assert book.reserved(1) == 2
+
+    # A shorter reservation TTL is raised to the cart session TTL
+    config = settings.model_copy(update={"cart_session_ttl_seconds": 1800.0, "reservation_ttl_seconds": 60.0})
+    assert config.reservation_ttl == 1800.0
+
+
+def test_try_hold_checks_and_reserves_atomically():
+    """Test concurrent holders can never reserve more than is on hand"""
+    book = ReservationBook(ttl_seconds=60)
+    holders = [f"cart-{i}" for i in range(20)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        available = list(pool.map(lambda holder: book.try_hold(holder, 1, 2, on_hand=9), holders))
+
+    assert sum(1 for units in available if units >= 2) == 4
+    assert book.reserved(1) == 8
+    # A holder's own units count as available when it changes its hold
+    winner = holders[available.index(max(available))]
+    assert book.try_hold(winner, 1, 3, on_hand=9) == 3
+    assert book.reserved(1) == 9
+
+
+def test_cart_reservations_limit_other_sales(client, db_session, auth_headers):
+    """Test units held by one cart cannot be sold through another"""
+    card = Product(sku="BD-001", name="Birthday Card", price=4.99, on_hand=5)
+    db_session.add(card)
+    db_session.commit()
+
+    first = client.post("/cart/sessions", headers=auth_headers).json()["id"]
+    second = client.post("/cart/sessions", headers=auth_headers).json()["id"]
+    response = client.post(
+        f"/cart/sessions/{first}/lines", json={"product_id": card.id, "qty": 3}, headers=auth_headers
+    )
+    assert response.status_code == 200
+
+    response = client.post(
+        f"/cart/sessions/{second}/lines", json={"product_id": card.id, "qty": 3}, headers=auth_headers
+    )
+    assert response.status_code == 400
+    assert "Available: 2, Requested: 3" in response.json()["detail"]
+
+    response = client.post(
+        "/cart/validate", json={"items": [{"product_id": card.id, "qty": 3}]}, headers=auth_headers
+    )
+    assert response.json()["errors"] == ["Birthday Card: Insufficient stock. Available: 2, Requested: 3"]
+
+    response = client.get("/products/search", params={"q": "BD-001", "mode": "like"}, headers=auth_headers)
+    assert [(p["on_hand"], p["available"]) for p in response.json()] == [(5, 2)]
+
+    order = {
+        "items": [{"product_id": card.id, "qty": 3, "unit_price": 4.99}],
+        "subtotal": 14.97, "tax_total": 1.27, "total": 16.24
+    }
+    response = client.post("/orders", json=order, headers=auth_headers)
+    assert response.status_code == 400
+    assert "Available: 2, Requested: 3" in response.json()["detail"]
+
+    # The holding cart can use its own reservation, which checkout releases
+    response = client.post(
+        "/orders", json={"cart_id": first, "subtotal": 14.97, "tax_total": 1.27, "total": 16.24},
+        headers=auth_headers
+    )
+    assert response.status_code == 201
+    response = client.get("/products/search", params={"q": "BD-001", "mode": "like"}, headers=auth_headers)
+    assert [(p["on_hand"], p["available"]) for p in response.json()] == [(2, 2)]
@@ -0,0 +1,149 @@
+"""
+Return tests
+"""
+import json
+
+from app.migrations import backfill_return_lines, relabel_return_movements
+from app.models import (
+    AuditLog, InventoryMovement, InventoryMovementType, OrderItem, Product, ReturnLine
+)
+
+
+def _sell(client, db_session, auth_headers, qty=3, unit_price=10.00, discount=0.0):
+    card = Product(sku="BD-001", name="Birthday Card", price=unit_price, on_hand=10)
+    db_session.add(card)
+    db_session.commit()
+    total = unit_price * qty - discount
+    order = client.post("/orders", json={
+        "items": [{"product_id": card.id, "qty": qty, "unit_price": unit_price, "discount": discount}],
+        "subtotal": total, "tax_total": 0.0, "total": total
+    }, headers=auth_headers).json()
+    return card, order
+
+
+def test_partial_returns_use_returned_quantity(client, db_session, auth_headers, manager_headers):
+    """Test repeated partial returns are capped and refund exactly the line total"""
+    card, order = _sell(client, db_session, auth_headers, qty=3, discount=0.01)
+    item_id = order["items"][0]["id"]
+
+    def return_units(qty, damaged=False):
+        return client.post("/returns", json={
+            "order_id": order["id"],
+            "items": [{"order_item_id": item_id, "qty": qty, "damaged": damaged}]
+        }, headers=auth_headers)
+
+    refunds = [return_units(1).json()["refund_amount"], return_units(1, damaged=True).json()["refund_amount"]]
+
+    response = return_units(2)
+    assert response.status_code == 400
+    assert "remaining quantity (1); 2 already returned" in response.json()["detail"]
+
+    refunds.append(return_units(1).json()["refund_amount"])
+    # 29.99 split over three single-unit returns
+    assert refunds == [10.0, 9.99, 10.0]
+
+    lookup = client.get(
+        "/returns/lookup", params={"search": order["order_number"]}, headers=auth_headers
+    ).json()
+    assert lookup["items"][0]["returned_qty"] == 3
+
+    report = client.get("/returns/report", headers=manager_headers).json()
+    assert report == {
+        "units": 3,
+        "damaged_units": 1,
+        "refund_total": 29.99,
+        "products": [{"product_id": card.id, "units": 3, "damaged_units": 1, "refund_total": 29.99}]
+    }
+    db_session.expire_all()
+    assert db_session.get(Product, card.id).on_hand == 9
+    movements = db_session.query(InventoryMovement.type, InventoryMovement.delta_qty).filter(
+        InventoryMovement.type != InventoryMovementType.SALE
+    ).order_by(InventoryMovement.id).all()
+    assert movements == [
+        (InventoryMovementType.RETURN, 1),
+        (InventoryMovementType.RETURN, 1), (InventoryMovementType.DAMAGE, -1),
+        (InventoryMovementType.RETURN, 1),
+    ]
+
+
+def test_backfill_return_lines_from_audit_log(client, db_session, auth_headers, test_user):
+    """Test returns recorded only in the audit log are loaded into the ledger once"""
+    card, order = _sell(client, db_session, auth_headers, qty=3)
+    item_id = order["items"][0]["id"]
+    db_session.add(AuditLog(
+        actor_id=test_user.id,
+        action="return_processed",
+        entity_type="order",
+        entity_id=order["id"],
+        metadata_json=json.dumps({
+            "order_number": order["order_number"],
+            "items": [{
+                "order_item_id": item_id, "product_id": card.id, "qty": 2,
+                "damaged": False, "refund_amount": 20.0
+            }],
+            "total_refund": 20.0,
+            "refund_method": "cash",
+            "reason": None
+        })
+    ))
+    db_session.commit()
+
+    backfill_return_lines(db_session.get_bind())
+    backfill_return_lines(db_session.get_bind())
+
+    lines = db_session.query(ReturnLine).all()
+    assert [(line.order_item_id, line.qty, line.refund) for line in lines] == [(item_id, 2, 20.0)]
+    assert db_session.get(OrderItem, item_id).returned_qty == 2
+
+    response = client.post("/returns", json={
+        "order_id": order["id"], "items": [{"order_item_id": item_id, "qty": 2}]
+    }, headers=auth_headers)
+    assert response.status_code == 400
+
+
+def test_relabel_return_movements(db_session, test_user):
+    """Test restocks recorded as purchases by older returns are relabelled once"""
+    card = Product(sku="BD-001", name="Birthday Card", price=5.00, on_hand=10)
+    db_session.add(card)
+    db_session.commit()
+    for reason in ("Return - Order ORD-20240101-0001 (non-damaged)", "Supplier delivery"):
+        db_session.add(InventoryMovement(
+            product_id=card.id, type=InventoryMovementType.PURCHASE, delta_qty=1,
+            reason=reason, created_by_id=test_user.id
+        ))
+    db_session.commit()
+
+    relabel_return_movements(db_session.get_bind())
+    relabel_return_movements(db_session.get_bind())
+
+    db_session.expire_all()
+    assert [m.type for m in db_session.query(InventoryMovement).order_by(InventoryMovement.id)] == [
+        InventoryMovementType.RETURN, InventoryMovementType.PURCHASE
+    ]
+
+
+def test_return_query_count_is_independent_of_lines(client, db_session, auth_headers, query_counter):
+    """Test a return loads items in one query and writes in batches"""
+    products = [Product(sku=f"BD-{i:03}", name=f"Card {i}", price=2.00, on_hand=5) for i in range(6)]
+    db_session.add_all(products)
+    db_session.commit()
+
+    def return_lines(count):
+        order = client.post("/orders", json={
+            "items": [{"product_id": p.id, "qty": 2, "unit_price": 2.00} for p in products[:count]],
+            "subtotal": 4.0 * count, "tax_total": 0.0, "total": 4.0 * count
+        }, headers=auth_headers).json()
+        query_counter.clear()
+        response = client.post("/returns", json={
+            "order_id": order["id"],
+            "items": [
+                {"order_item_id": item["id"], "qty": 1, "damaged": index % 2 == 1}
+                for index, item in enumerate(order["items"])
+            ]
+        }, headers=auth_headers)
+        assert response.status_code == 201
+        return len(query_counter)
+
+    assert return_lines(2) == return_lines(6)
+    db_session.expire_all()
+    assert [p.on_hand for p in db_session.query(Product).order_by(Product.id)] == [3, 1, 4, 3, 4, 3]
@@ -0,0 +1,104 @@
+"""
+Tax engine tests
+"""
+import pytest
+
+from app.config import settings
+from app.models import Product
+from app.services.tax import TaxLine, compile_tax_tables, tax_engine
+
+
+@pytest.fixture
+def tax_rules(monkeypatch):
+    """Install tax rules for the duration of a test"""
+    def install(**rules):
+        config = settings.model_copy(update=rules)
+        monkeypatch.setattr(tax_engine, "tables", compile_tax_tables(config))
+        monkeypatch.setattr(tax_engine, "default_jurisdiction", config.tax_jurisdiction)
+    return install
+
+
+def test_compile_tax_tables():
+    """Test jurisdiction, category and exemption rules compile into lookups"""
+    config = settings.model_copy(update={
+        "tax_rate": 0.08,
+        "tax_jurisdiction_rates": "US-CA:0.0725, US-OR:0",
+        "tax_category_rates": "Holiday:0.05,US-CA/Holiday:0.06",
+        "tax_exempt_categories": "US-CA/Sympathy"
+    })
+    tables = compile_tax_tables(config)
+
+    assert tables["default"].rate == 0.08
+    assert tables["default"].category_rates == {"Holiday": 0.05}
+    assert tables["US-OR"].rate == 0.0
+    ca = tables["US-CA"]
+    assert (ca.rate_for("Holiday"), ca.rate_for("Sympathy"), ca.rate_for("Blank")) == (0.06, 0.0, 0.0725)
+    assert ca.rate_for("Blank", taxable=False) == 0.0
+
+    lines = [
+        TaxLine("Holiday", True, 1000),
+        TaxLine("Holiday", True, 500),
+        TaxLine("Blank", True, 499),
+        TaxLine("Blank", False, 300)
+    ]
+    # Rounded once per rate: 15.00 * 0.06 + 4.99 * 0.0725
+    assert ca.tax_cents(lines) == 126
+
+    with pytest.raises(ValueError):
+        compile_tax_tables(settings.model_copy(update={"tax_category_rates": "Holiday"}))
+
+
+def test_cart_tax_uses_category_rates(client, db_session, auth_headers, tax_rules):
+    """Test cart validation and sessions tax each category at its rate"""
+    tax_rules(tax_category_rates="Holiday:0.05", tax_exempt_categories="Sympathy")
+    holiday = Product(sku="HO-001", name="Holiday Card", price=10.00, on_hand=5, category="Holiday")
+    sympathy = Product(sku="SY-001", name="Sympathy Card", price=4.00, on_hand=5, category="Sympathy")
+    blank = Product(sku="BL-001", name="Blank Card", price=2.00, on_hand=5, category="Blank")
+    db_session.add_all([holiday, sympathy, blank])
+    db_session.commit()
+
+    items = [{"product_id": p.id, "qty": 1} for p in (holiday, sympathy, blank)]
+    response = client.post("/cart/validate", json={"items": items}, headers=auth_headers)
+    assert response.json()["totals"] == {"subtotal": 16.0, "tax": 0.67, "total": 16.67}
+
+    cart_id = client.post("/cart/sessions", headers=auth_headers).json()["id"]
+    for item in items:
+        client.post(f"/cart/sessions/{cart_id}/lines", json=item, headers=auth_headers)
+    cart = client.get(f"/cart/sessions/{cart_id}", headers=auth_headers).json()
+    assert cart["totals"] == {"subtotal": 16.0, "tax": 0.67, "total": 16.67}
+
+    config = client.get("/config/tax").json()
+    assert config["category_rates"] == {"Holiday": 0.05, "Sympathy": 0.0}
+
+
+def test_order_tax_audit(client, db_session, auth_headers, manager_headers, tax_rules, query_counter):
+    """Test stored orders are re-taxed under the current or another jurisdiction"""
+    tax_rules(tax_jurisdiction_rates="US-OR:0")
+    card = Product(sku="BD-001", name="Birthday Card", price=10.00, on_hand=10, category="Birthday")
+    db_session.add(card)
+    db_session.commit()
+
+    for qty, tax in ((1, 0.85), (2, 1.50)):
+        order = {
+            "items": [{"product_id": card.id, "qty": qty, "unit_price": 10.00}],
+            "subtotal": 10.00 * qty, "tax_total": tax, "total": 10.00 * qty + tax
+        }
+        assert client.post("/orders", json=order, headers=auth_headers).status_code == 201
+
+    query_counter.clear()
+    report = client.get("/orders/tax-audit", headers=manager_headers).json()
+    # Auth user lookup + orders + lines
+    assert len(query_counter) == 3
+    assert report["mismatched"] == 1
+    assert [(o["recorded_tax"], o["computed_tax"], o["difference"]) for o in report["orders"]] == [
+        (1.50, 1.70, -0.2), (0.85, 0.85, 0.0)
+    ]
+
+    report = client.get(
+        "/orders/tax-audit", params={"jurisdiction": "US-OR"}, headers=manager_headers
+    ).json()
+    assert [o["computed_tax"] for o in report["orders"]] == [0.0, 0.0]
+
+    response = client.get("/orders/tax-audit", params={"jurisdiction": "XX"}, headers=manager_headers)
+    assert response.status_code == 400
+    assert client.get("/orders/tax-audit", headers=auth_headers).status_code == 403